@@ -0,0 +1,78 @@
+import imdb_to_neo4j as i2n
+import profiling
+
+# Seasons whose pairs are refreshed in one transaction
+SEASON_BATCH_SIZE = 100
+
+
+def refresh_collaboration_years(tx, imdb_season_ids):
+    """
+    Recomputes the WORKED_WITH_YEAR relationships of every pair of people who worked on
+    one of the seasons, over all the seasons the pair shares. A season counts towards
+    every year from its roughStart to its roughEnd; seasons without a roughStart are
+    left out. The pair's existing relationships are replaced.
+
+    :param imdb_season_ids:     list of imdbSeasonIDs
+    :return:                    result with the imdbNameIDs of each pair and its number of
+                                years
+    """
+    return tx.run("UNWIND $imdbSeasonIDs AS imdbSeasonID "
+                  "MATCH (p1:Person)-[:WORKED_ON]->(:Season {imdbSeasonID: imdbSeasonID})"
+                  "<-[:WORKED_ON]-(p2:Person) "
+                  "WHERE p1.imdbNameID < p2.imdbNameID "
+                  "WITH DISTINCT p1, p2 "
+                  "OPTIONAL MATCH (p1)-[old:WORKED_WITH_YEAR]->(p2) "
+                  "DELETE old "
+                  "WITH DISTINCT p1, p2 "
+                  "MATCH (p1)-[:WORKED_ON]->(se:Season)<-[:WORKED_ON]-(p2) "
+                  "WHERE se.roughStart IS NOT null "
+                  "WITH p1, p2, collect(DISTINCT se) AS seasons "
+                  "UNWIND seasons AS se "
+                  "UNWIND range(se.roughStart.year, "
+                  "     coalesce(se.roughEnd, se.roughStart).year) AS year "
+                  "WITH p1, p2, year, count(DISTINCT se) AS seasons_in_common "
+                  "CREATE (p1)-[r:WORKED_WITH_YEAR {year: year}]->(p2) "
+                  "SET r.seasons_in_common = seasons_in_common, r.createdDate = datetime() "
+                  "RETURN p1.imdbNameID AS imdbNameID1, p2.imdbNameID AS imdbNameID2, "
+                  "     count(r) AS years ",
+                  imdbSeasonIDs=imdb_season_ids)
+
+
+def main():
+    profiling.start()
+    neo_driver = i2n.open_neo4j_session()
+    watermark_path = input("File path of the collaboration years watermark: ")
+    since = i2n.read_watermark(watermark_path)
+    with neo_driver.session() as session:
+        with profiling.stage(profiling.RESOLVE):
+            results = list(session.read_transaction(i2n.get_seasons_worked_on_since, since))
+        if not results:
+            print("No WORKED_ON relationships created since", since)
+            return
+        imdb_season_ids = sorted(result['imdbSeasonID'] for result in results)
+        watermark = results[0]['watermark']
+        if since is None:
+            print("Building the collaboration years of the pairs on", len(imdb_season_ids),
+                  "seasons")
+        else:
+            print("Refreshing the collaboration years of the pairs on",
+                  len(imdb_season_ids), "seasons changed since", since)
+        # Pairs on seasons in different batches are refreshed once per batch
+        pair_years = {}
+        for i in range(0, len(imdb_season_ids), SEASON_BATCH_SIZE):
+            batch = imdb_season_ids[i:i + SEASON_BATCH_SIZE]
+            with profiling.stage(profiling.WRITE):
+                results = list(session.write_transaction(refresh_collaboration_years, batch))
+                session.write_transaction(i2n.bump_graph_version)
+            for result in results:
+                pair_years[(result['imdbNameID1'], result['imdbNameID2'])] = result['years']
+            print("Refreshed", min(i + SEASON_BATCH_SIZE, len(imdb_season_ids)), "of",
+                  len(imdb_season_ids), "seasons")
+        print("Wrote", sum(pair_years.values()), "WORKED_WITH_YEAR relationships for",
+              len(pair_years), "pairs")
+    session.close()
+    # Only moved on once every batch is written, so an interrupted update is redone
+    i2n.write_watermark(watermark_path, watermark)
+
+
+main()
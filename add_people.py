@@ -1,8 +1,10 @@
 import imdb_to_neo4j as i2n
+import profiling
 import csv
 
 
 def main():
+    profiling.start()
     neo_driver = i2n.open_neo4j_session()
 
     while True:
@@ -16,8 +18,9 @@ def main():
                     for imdb_name_id, full_name in reader:
                         if imdb_name_id:
                             print(f"Adding IMDb name ID: {imdb_name_id}, Full name: {full_name}")
-                            session.write_transaction(i2n.add_person,
-                                                      i2n.Person(imdb_name_id, full_name))
+                            with profiling.stage(profiling.WRITE):
+                                session.write_transaction(i2n.add_person,
+                                                          i2n.Person(imdb_name_id, full_name))
             session.close()
             break
         except FileNotFoundError:
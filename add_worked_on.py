@@ -1,144 +1,227 @@
 import csv
+from collections import OrderedDict
 import imdb_to_neo4j as i2n
+from write_behind import WriteBehindBuffer
+import credit_records
+import profiling
+import itertools
 import config
 
-
-def get_seasons_and_year_set(session, show, first_year, last_year):
-    results = session.read_transaction(i2n.check_neo4j_for_season_years,
-                                       show, first_year, last_year)
-    if results.peek() is None:
-        return [], set()
-    else:
-        season_ids = []
-        season_years = set()
+# Shows looked up in neo4j per query while planning
+PLAN_BATCH_SIZE = 500
+
+
+class ShowPlan(object):
+    """ The rows of a Person-Season List for one show, and what loading them will take
+
+        DATA MEMBERS
+        show            Show object
+        rows            [list]      rows of the list for the show, in file order
+        in_neo4j        [bool]      True if the show was in neo4j when the plan was made
+        season_index    SeasonIntervalIndex of the show's seasons in neo4j
+        needs_scrape    [bool]      True if the show's seasons have to be scraped first
+        pages           [int]       estimated number of pages the scrape will load
+        writes          [int]       estimated number of neo4j writes
+        """
+    __slots__ = ('show', 'rows', 'in_neo4j', 'season_index', 'needs_scrape', 'pages',
+                 'writes')
+
+    def __init__(self, show):
+        self.show = show
+        self.rows = []
+        self.in_neo4j = False
+        self.season_index = i2n.SeasonIntervalIndex(show.imdb_title_id)
+        self.needs_scrape = False
+        self.pages = 0
+        self.writes = 0
+
+
+def read_rows(person_season_csv, skip):
+    """Reads a Person-Season List (csv or credit records file), leaving out blacklisted
+    shows, and groups its rows by show in the order the shows first appear.
+    :return:    OrderedDict of imdbTitleID -> ShowPlan"""
+    # Credit records files are typed, so there's no string parsing to do
+    if person_season_csv.endswith(credit_records.EXTENSION):
+        return plan_rows(credit_records.read_credit_records(person_season_csv), skip)
+    with open(person_season_csv) as f:
+        return plan_rows(csv.reader(f), skip)
+
+
+def plan_rows(reader, skip):
+    """:param reader:    iterable of Person-Season List rows"""
+    plans = OrderedDict()
+    for row in itertools.islice(reader, skip, None):
+        imdb_title_id = row[7]
+        if imdb_title_id in config.blacklist:
+            continue
+        if imdb_title_id not in plans:
+            plans[imdb_title_id] = ShowPlan(i2n.Show(imdb_title_id, row[6], row[10]))
+        plans[imdb_title_id].rows.append(row)
+    return plans
+
+
+def load_season_indexes(session, plans):
+    """Fills in which shows are in neo4j and their seasons, a batch of shows per query"""
+    imdb_title_ids = list(plans)
+    for i in range(0, len(imdb_title_ids), PLAN_BATCH_SIZE):
+        results = session.read_transaction(i2n.get_shows_with_seasons,
+                                           imdb_title_ids[i:i + PLAN_BATCH_SIZE])
         for result in results:
-            imdb_season_id = result['imdbSeasonID']
+            plan = plans[result['imdbTitleID']]
+            plan.in_neo4j = True
+            if result['imdbSeasonID'] is None:
+                continue
             rough_start = result['roughStart']
             rough_end = result['roughEnd']
-            season_years.add(range(int(rough_start[:4]),
-                                   int(rough_end[:4]) + 1))
-            season_ids.append(imdb_season_id)
-        return season_ids, season_years
-
-
-def process_imdb_title_id(driver, session, show):
-    episode_page = i2n.EpisodeListPage(driver, show)
-    episode_page.get_all_episodes_by_year_or_season()
-    episode_page.get_seasons_from_episodes()
-    session.write_transaction(i2n.add_show, show, 'imdb_p')
-    for season in episode_page.season_list:
-        print("Adding season", season.season_title, "from new process")
-        session.write_transaction(i2n.add_season, season, 'imdb_p')
-        session.write_transaction(i2n.add_season_of, season, show)
-    return episode_page.season_list
+            if rough_start is not None and rough_end is not None:
+                plan.season_index.add(result['imdbSeasonID'], rough_start.year, rough_end.year)
+            else:
+                plan.season_index.add(result['imdbSeasonID'])
+
+
+def needs_scrape(plan):
+    """A show has to be scraped if any of its rows refers to a season, to years or (for
+    rows with neither) to the show itself that isn't in neo4j"""
+    season_index = plan.season_index
+    for row in plan.rows:
+        first_year, last_year, season_num = row[4], row[5], row[8]
+        if season_num:
+            season = i2n.Season(plan.show.imdb_title_id, season_num)
+            if season.imdb_season_id not in season_index.season_ids:
+                return True
+        elif first_year or last_year:
+            if not season_index.covers(int(first_year), int(last_year)):
+                return True
+        elif not plan.in_neo4j:
+            return True
+    return False
+
+
+def estimate(plan, episode_lookup):
+    """Estimates the pages and neo4j writes loading a show's rows will take. Until a show
+    is scraped its number of seasons isn't known, so the highest season number in its
+    rows (or its number of seasons in neo4j, if more) stands in for it"""
+    seasons = max([len(plan.season_index.season_ids)] +
+                  [int(row[8]) for row in plan.rows if row[8]])
+    plan.pages = 0
+    plan.writes = 0
+    if plan.needs_scrape:
+        if not (episode_lookup and episode_lookup.episodes_of(plan.show.imdb_title_id)):
+            # The episode list page, then one page per season
+            plan.pages = 1 + max(seasons, 1)
+        # The show, and each season with its SEASON_OF relationship
+        plan.writes += 1 + 2 * seasons
+    for row in plan.rows:
+        first_year, last_year, season_num = row[4], row[5], row[8]
+        plan.writes += 1
+        if season_num:
+            plan.writes += 1
+        elif first_year or last_year:
+            plan.writes += len(plan.season_index.overlapping(int(first_year), int(last_year)))
+
+
+def print_plan(plans):
+    print("\n%-12s %-30s %6s  %-9s %6s %7s" % ("imdbTitleID", "show", "rows", "status",
+                                               "pages", "writes"))
+    for plan in plans.values():
+        status = 'scrape' if plan.needs_scrape else 'in neo4j'
+        print("%-12s %-30s %6d  %-9s %6d %7d" % (plan.show.imdb_title_id,
+                                                 (plan.show.show_title or '')[:30],
+                                                 len(plan.rows), status, plan.pages,
+                                                 plan.writes))
+    print("\n%d shows, %d rows: %d shows to scrape, about %d pages and %d neo4j writes"
+          % (len(plans), sum(len(plan.rows) for plan in plans.values()),
+             sum(plan.needs_scrape for plan in plans.values()),
+             sum(plan.pages for plan in plans.values()),
+             sum(plan.writes for plan in plans.values())))
+
+
+def worked_on_writes(plan):
+    """The WORKED_ON writes for a show's rows, once its seasons are in neo4j"""
+    show = plan.show
+    season_index = plan.season_index
+    writes = []
+    for (full_name, imdb_name_id, job_class, job_title, first_year, last_year,
+         show_title, imdb_title_id, season_num, show_type, genres) in plan.rows:
+        # Season information
+        if season_num:
+            season = i2n.Season(imdb_title_id, season_num, show_title)
+            # Add WORKED_ON relationships between crew and season, and crew and show
+            writes.append((i2n.add_worked_on_season, imdb_name_id, job_title,
+                           season.imdb_season_id, 'imdb_p'))
+            writes.append((i2n.add_worked_on_show, imdb_name_id, job_title,
+                           show.imdb_title_id, 'imdb_p'))
+        # Years worked information
+        elif first_year or last_year:
+            # Add WORKED_ON relationships between crew and all seasons aired in those years
+            for imdb_season_id in season_index.overlapping(int(first_year), int(last_year)):
+                writes.append((i2n.add_worked_on_season, imdb_name_id, job_title,
+                               imdb_season_id, 'imdb_i'))
+            writes.append((i2n.add_worked_on_show, imdb_name_id, job_title,
+                           show.imdb_title_id, 'imdb_i'))
+        # Neither, so only the show is known
+        else:
+            writes.append((i2n.add_worked_on_show, imdb_name_id, job_title,
+                           show.imdb_title_id, 'imdb_i'))
+    return writes
 
 
 def main():
+    profiling.start()
     # Instantiate neo4j driver
     neo_driver = i2n.open_neo4j_session()
-
-    # Instantiate webdriver and navigate to IMDB login page
-    driver = i2n.open_imdb_browser()
+    episode_lookup = i2n.open_episode_lookup()
 
     while True:
         try:
             person_season_csv = input("File path of the Person-Season List: ")
             skip = int(input("Number of rows to skip: "))
-
-            # Load person-season data from the CSV file
-            with neo_driver.session() as session:
-                with open(person_season_csv) as f:
-                    reader = csv.reader(f)
-                    for _ in range(skip):
-                        next(reader)
-                    for (full_name, imdb_name_id, job_class, job_title, first_year, last_year,
-                         show_title, imdb_title_id, season_num, show_type, genres) in reader:
-
-                        if imdb_title_id in config.blacklist:
-                            continue
-
-                        show = i2n.Show(imdb_title_id, show_title, genres)
-                        crew = i2n.Person(imdb_name_id, full_name)
-                        season = None
-
-                        if season_num:
-                            season = i2n.Season(imdb_title_id, season_num, show_title)
-
-                        print(f"Now processing {imdb_title_id} {show_title} {full_name}")
-
-                        # No season information
-                        if not season:
-
-                            # No years worked information
-                            if not first_year and not last_year:
-
-                                # Check to see if show is in neo4j
-                                results = session.read_transaction(i2n.check_neo4j_for_show, show)
-
-                                # If show isn't in neo4j
-                                if results.peek() is None:
-                                    # Scrape IMDb for the show and all its seasons and add to neo4j
-                                    process_imdb_title_id(driver, session, show)
-
-                                # Add WORKED_ON relationship between crew and show
-                                session.write_transaction(i2n.add_worked_on_show,
-                                                          crew.imdb_name_id,
-                                                          job_title, show.imdb_title_id,
-                                                          'imdb_i')
-                                continue
-
-                            # Has years worked information
-                            else:
-                                # Search neo4j for seasons corresponding to years
-                                worked_years = set(range(int(first_year), int(last_year) + 1))
-                                season_ids, season_years = get_seasons_and_year_set(session, show,
-                                                                                    first_year,
-                                                                                    last_year)
-                                # If no results or incomplete results
-                                if not season_ids or not worked_years.issubset(season_years):
-                                    # Scrape IMDb for show and all seasons, add to neo4j
-                                    process_imdb_title_id(driver, session, show)
-                                    season_ids, season_years = get_seasons_and_year_set(session,
-                                                                                        show,
-                                                                                        first_year,
-                                                                                        last_year)
-                                # Add WORKED_ON relationships between crew and all seasons found
-                                for imdb_season_id in season_ids:
-                                    session.write_transaction(i2n.add_worked_on_season,
-                                                                  crew.imdb_name_id, job_title,
-                                                                  imdb_season_id, 'imdb_i')
-                                # Add WORKED_ON relationship between crew and show
-                                session.write_transaction(i2n.add_worked_on_show, crew.imdb_name_id,
-                                                          job_title, show.imdb_title_id, 'imdb_i')
-                        # Season information
-                        else:
-                            # Check neo4j for season
-                            results = session.read_transaction(i2n.check_neo4j_for_season, season)
-
-                            # Season is in neo4j
-                            if results.peek() is not None:
-                                # Add WORKED_ON relationship between crew and season
-                                session.write_transaction(i2n.add_worked_on_season, imdb_name_id,
-                                                          job_title, season.imdb_season_id,
-                                                          'imdb_p')
-                            # Season not in neo4j
-                            else:
-                                # Scrape IMDb for show and all seasons, add to neo4j
-                                process_imdb_title_id(driver, session, show)
-                                # Add WORKED_ON relationship between crew and season
-                                session.write_transaction(i2n.add_worked_on_season, imdb_name_id,
-                                                          job_title, season.imdb_season_id,
-                                                          'imdb_p')
-
-                            # Add WORKED_ON relationship between crew and show
-                            session.write_transaction(i2n.add_worked_on_show, crew.imdb_name_id,
-                                                      job_title, show.imdb_title_id, 'imdb_p')
-
-            session.close()
+            plans = read_rows(person_season_csv, skip)
             break
-
         except FileNotFoundError:
             print("File not found")
+
+    # Plan the whole list before scraping anything
+    with neo_driver.session() as session, profiling.stage(profiling.RESOLVE):
+        load_season_indexes(session, plans)
+        for plan in plans.values():
+            plan.needs_scrape = needs_scrape(plan)
+            estimate(plan, episode_lookup)
+    session.close()
+    print_plan(plans)
+
+    if input("\nOnly print the plan, without scraping or writing anything? (y/n): ") == 'y':
+        if episode_lookup:
+            episode_lookup.close()
+        return
+
+    # Instantiate webdriver and navigate to IMDB login page
+    driver = i2n.open_imdb_browser()
+
+    # Show by show, so each show is scraped at most once and its rows are written together
+    with WriteBehindBuffer(neo_driver) as writer:
+        for plan in plans.values():
+            print(f"Now processing {plan.show.imdb_title_id} {plan.show.show_title} "
+                  f"({len(plan.rows)} rows)")
+            if plan.needs_scrape:
+                # Scrape IMDb for the show and all its seasons and add to neo4j
+                i2n.process_imdb_title_id(driver, writer, plan.show, episode_lookup,
+                                          plan.season_index)
+            writes = worked_on_writes(plan)
+            if writes:
+                writer.write(*writes, (i2n.bump_graph_version,))
+        # Only once every row is written, so people whose rows didn't all make it into
+        # neo4j are scraped again by the next refresh run
+        fingerprints = credit_records.read_fingerprints(
+            credit_records.fingerprints_path(person_season_csv))
+        for person, filmography_fingerprint, credit_fingerprints in fingerprints:
+            writer.write((i2n.set_filmography_fingerprint, person, filmography_fingerprint,
+                          credit_fingerprints))
+        if fingerprints:
+            print("Stored the filmography fingerprints of", len(fingerprints), "people")
+
+    if episode_lookup:
+        episode_lookup.close()
     driver.quit()
 
 
@@ -1,8 +1,12 @@
 import imdb_to_neo4j as i2n
+import profiling
+
+# Seasons whose pairs are refreshed in one transaction by an incremental update
+SEASON_BATCH_SIZE = 100
 
 
 def update_worked_with(tx, person):
-    imdb_name_id = person.get_imdb_name_id()
+    imdb_name_id = person.imdb_name_id
     return tx.run("MATCH(p1:Person {imdbNameID: $imdb_name_id}) "
                   "MATCH(p1)-[:WORKED_ON]->(se:Season)<-[:WORKED_ON]-(p2) "
                   "WHERE p1 <> p2 AND NOT (p1)-[:WORKED_WITH]-(p2) "
@@ -26,8 +30,90 @@ def update_worked_with(tx, person):
                   imdb_name_id=imdb_name_id)
 
 
+def refresh_worked_with(tx, imdb_season_ids):
+    """Recomputes WORKED_WITH for every pair of people who worked on one of the seasons,
+    over all the seasons the pair shares. Existing relationships in either direction are
+    updated in place, missing ones are created."""
+    return tx.run("UNWIND $imdbSeasonIDs AS imdbSeasonID "
+                  "MATCH (p1:Person)-[:WORKED_ON]->(:Season {imdbSeasonID: imdbSeasonID})"
+                  "<-[:WORKED_ON]-(p2:Person) "
+                  "WHERE p1.imdbNameID < p2.imdbNameID "
+                  "WITH DISTINCT p1, p2 "
+                  "MATCH (p1)-[:WORKED_ON]->(se:Season)<-[:WORKED_ON]-(p2) "
+                  "WITH p1, p2, se "
+                  "ORDER BY se.roughStart DESC "
+                  "WITH p1, p2, min(se.roughStart) AS startDate, "
+                  "     max(se.roughEnd) AS endDate, "
+                  "     count(distinct se) AS seasons_in_common, "
+                  "     collect(distinct se.seasonTitle + ' (' + "
+                  "    toString(se.roughStart.year) + ')')[..5] AS season_list "
+                  "WHERE startDate IS NOT null AND endDate IS NOT null  "
+                  "OPTIONAL MATCH (p1)-[existing:WORKED_WITH]-(p2) "
+                  "WITH p1, p2, startDate, endDate, seasons_in_common, season_list, "
+                  "     collect(existing) AS existing "
+                  "FOREACH (r IN existing | "
+                  "     SET r.startDate = startDate, r.endDate = endDate, "
+                  "     r.seasons_in_common = seasons_in_common, r.season_list = season_list, "
+                  "     r.updatedDate = datetime()) "
+                  "FOREACH (_ IN CASE WHEN size(existing) = 0 THEN [1] ELSE [] END | "
+                  "     CREATE (p1)-[r:WORKED_WITH]->(p2) "
+                  "     SET r.createdDate = datetime(), "
+                  "     r.startDate = startDate, r.endDate = endDate, "
+                  "     r.seasons_in_common = seasons_in_common, "
+                  "     r.season_list = season_list, "
+                  "     r.uuid = apoc.create.uuid()) "
+                  "RETURN p1.fullName AS name1, p2.fullName AS name2, "
+                  "     startDate AS startDate, endDate AS endDate, "
+                  "     seasons_in_common AS seasons_in_common, season_list, "
+                  "     size(existing) = 0 AS created ",
+                  imdbSeasonIDs=imdb_season_ids)
+
+
+def update_incrementally(neo_driver, watermark_path):
+    """
+    Refreshes WORKED_WITH for the pairs of people on the seasons that got new WORKED_ON
+    relationships since the last incremental update, so the cost follows the number of
+    new credits rather than the size of the graph. The first update covers every season.
+
+    :param neo_driver:      neo4j driver
+    :param watermark_path:  file the createdDate of the latest WORKED_ON seen is kept in
+    """
+    since = i2n.read_watermark(watermark_path)
+    with neo_driver.session() as session:
+        with profiling.stage(profiling.RESOLVE):
+            results = list(session.read_transaction(i2n.get_seasons_worked_on_since, since))
+        if not results:
+            print("No WORKED_ON relationships created since", since)
+            return
+        imdb_season_ids = sorted(result['imdbSeasonID'] for result in results)
+        watermark = results[0]['watermark']
+        print("Refreshing the pairs on", len(imdb_season_ids), "seasons changed since", since)
+        created = updated = 0
+        for i in range(0, len(imdb_season_ids), SEASON_BATCH_SIZE):
+            batch = imdb_season_ids[i:i + SEASON_BATCH_SIZE]
+            with profiling.stage(profiling.WRITE):
+                results = list(session.write_transaction(refresh_worked_with, batch))
+                session.write_transaction(i2n.bump_graph_version)
+            for result in results:
+                if result['created']:
+                    created += 1
+                    print("Updated: ", result['name1'], " - ", result['name2'],
+                          " - ", result['startDate'], " - ", result['endDate'],
+                          " - ", result['seasons_in_common'])
+                else:
+                    updated += 1
+        print("Created", created, "and refreshed", updated, "WORKED_WITH relationships")
+    # Only moved on once every batch is written, so an interrupted update is redone
+    i2n.write_watermark(watermark_path, watermark)
+
+
 def main():
+    profiling.start()
     neo_driver = i2n.open_neo4j_session()
+    if input("Only update pairs on seasons with new WORKED_ON relationships? (y/n): ") == 'y':
+        watermark_path = input("File path of the incremental update watermark: ")
+        update_incrementally(neo_driver, watermark_path)
+        return
     crew_list = []
     with neo_driver.session() as session:
         results = session.read_transaction(i2n.get_crew_list, 'Person')
@@ -37,8 +123,10 @@ def main():
                                                result['p.fullName']))
         for crew in crew_list:
             print("Now processing: ", crew.full_name)
-            results = session.write_transaction(update_worked_with, crew)
+            with profiling.stage(profiling.WRITE):
+                results = session.write_transaction(update_worked_with, crew)
             if results.peek():
+                session.write_transaction(i2n.bump_graph_version)
                 for result in results:
                     print("Updated: ", result['name1'], " - ", result['name2'],
                           " - ", result['startDate'], " - ", result['endDate'],
@@ -0,0 +1,125 @@
+"""
+Episode page extraction benchmark.
+
+Measures the CPU time EpisodePage takes per page on synthetic episode pages padded to
+the size of a real one, in two forms:
+
+    dom         pages without hydration data or ld+json airdate, so the season and
+                episode numbers and airdate come from parsing the whole page (the
+                only way they were read before)
+    structured  the same pages with the ld+json datePublished and the __NEXT_DATA__
+                hydration data that IMDb embeds, so nothing needs parsing
+
+Both forms are checked to give the same episodes. Also times date_string_to_date
+with and without its memo.
+
+Run from the project directory with
+
+    python3 -m benchmarks.bench_episode_pages
+"""
+import json
+import time
+from datetime import date, timedelta
+
+import imdb_to_neo4j as i2n
+
+NUM_PAGES = 200
+# Filler markup per page, roughly the size of an IMDb title page
+FILLER_ITEMS = 3000
+DATE_STRINGS = 20000
+
+
+class MemoryDriver(object):
+    """Serves pages from a dict of URL -> source, like replay.ReplayDriver"""
+    def __init__(self, pages):
+        self.pages = pages
+        self.page_source = ''
+
+    def get(self, url):
+        self.page_source = self.pages[url]
+
+    def refresh(self):
+        pass
+
+
+def make_page(imdb_episode_id, season_num, episode_num, airdate, structured):
+    ld_json = {'@type': 'TVEpisode', 'name': 'Episode %d' % episode_num,
+               'genre': ['Comedy', 'Reality-TV']}
+    scripts = ''
+    if structured:
+        ld_json['datePublished'] = airdate.isoformat()
+        next_data = {'props': {'pageProps': {'aboveTheFoldData': {
+            'id': imdb_episode_id,
+            'series': {'episodeNumber': {'seasonNumber': season_num,
+                                         'episodeNumber': episode_num}},
+            'releaseDate': {'day': airdate.day, 'month': airdate.month, 'year': airdate.year},
+        }}}}
+        scripts = ('<script id="__NEXT_DATA__" type="application/json">' +
+                   json.dumps(next_data) + '</script>')
+    filler = ''.join('<div class="ipc-metadata"><a href="/name/nm%07d/">Name %d</a>'
+                     '<span>Role %d</span></div>' % (i, i, i) for i in range(FILLER_ITEMS))
+    return ('<html><head><script type="application/ld+json">' + json.dumps(ld_json) +
+            '</script></head><body>' + filler +
+            '<ul data-testid="hero-subnav-bar-season-episode-numbers-section">'
+            '<li>S%d</li><li>E%d</li></ul>' % (season_num, episode_num) +
+            '<ul><li>Episode aired %s</li></ul>' % airdate.strftime('%d %B %Y').lstrip('0') +
+            scripts + '</body></html>')
+
+
+def make_pages(structured):
+    pages = {}
+    episodes = []
+    for i in range(NUM_PAGES):
+        imdb_episode_id = 'tt%07d' % (2000000 + i)
+        airdate = date(2010, 1, 1) + timedelta(days=i)
+        pages[i2n.IMDB_TITLE_BASE_URL + imdb_episode_id + '/'] = make_page(
+            imdb_episode_id, 1 + i // 20, 1 + i % 20, airdate, structured)
+        episodes.append(imdb_episode_id)
+    return MemoryDriver(pages), episodes
+
+
+def run(structured):
+    driver, imdb_episode_ids = make_pages(structured)
+    i2n.date_string_to_date.cache_clear()
+    results = []
+    start = time.process_time()
+    for imdb_episode_id in imdb_episode_ids:
+        episode = i2n.Episode(imdb_title_id='tt0000001', imdb_episode_id=imdb_episode_id)
+        i2n.EpisodePage(driver, episode)
+        results.append((episode.season_num, episode.episode_num, episode.airdate,
+                        episode.episode_title, tuple(episode.genre_list)))
+    return (time.process_time() - start) / len(imdb_episode_ids), results
+
+
+def time_dates():
+    # Episode lists repeat a small number of distinct dates many times
+    strings = [(date(2015, 1, 1) + timedelta(days=i % 365)).strftime('%d %b %Y')
+               for i in range(DATE_STRINGS)]
+    parse = i2n.date_string_to_date.__wrapped__
+    start = time.process_time()
+    for string in strings:
+        parse(string)
+    unmemoised = time.process_time() - start
+    i2n.date_string_to_date.cache_clear()
+    start = time.process_time()
+    for string in strings:
+        i2n.date_string_to_date(string)
+    memoised = time.process_time() - start
+    return unmemoised / DATE_STRINGS, memoised / DATE_STRINGS
+
+
+def main():
+    dom_time, dom_results = run(structured=False)
+    structured_time, structured_results = run(structured=True)
+    if dom_results != structured_results:
+        raise RuntimeError("Structured extraction gave different episodes")
+    print("Pages:                 %d" % NUM_PAGES)
+    print("dom         %8.3f ms CPU per page" % (dom_time * 1000))
+    print("structured  %8.3f ms CPU per page" % (structured_time * 1000))
+    unmemoised, memoised = time_dates()
+    print("Dates:                 %d" % DATE_STRINGS)
+    print("unmemoised  %8.2f us per date" % (unmemoised * 1e6))
+    print("memoised    %8.2f us per date" % (memoised * 1e6))
+
+
+main()
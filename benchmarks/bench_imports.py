@@ -0,0 +1,115 @@
+"""
+Import time benchmark.
+
+For each entry point script, times in a fresh process what the script costs before its
+main() runs: importing the modules it imports at the top and looking up every
+imdb_to_neo4j name it uses. Also reports which of the heavy dependencies (Selenium,
+BeautifulSoup, neo4j, config) were loaded by then. The last row is what every script
+paid when imdb_to_neo4j imported all of them up front.
+
+Scripts aren't imported themselves, since they run main() when they are; their imports
+are read from their source instead.
+
+Run from the project directory with
+
+    python3 -m benchmarks.bench_imports
+"""
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ENTRY_POINTS = [
+    'add_genres.py',
+    'add_people.py',
+    'add_worked_with.py',
+    'add_worked_on.py',
+    'scrape_name_list.py',
+    'scrape_title_list.py',
+    'crawl.py',
+    'build_episode_lookup.py',
+    'export_snapshot.py',
+    'snapshot_report.py',
+]
+
+HEAVY_MODULES = ['selenium', 'bs4', 'neo4j', 'config']
+
+REPEATS = 5
+
+# Run in a fresh interpreter: imports the modules, looks up the names and prints the
+# time taken and the heavy modules loaded as JSON
+PROBE = """
+import importlib, json, sys, time
+modules, names, heavy = json.loads(sys.argv[1])
+start = time.perf_counter()
+for module in modules:
+    try:
+        importlib.import_module(module)
+    except ImportError:
+        pass
+if names:
+    i2n = importlib.import_module('imdb_to_neo4j')
+    for name in names:
+        getattr(i2n, name)
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [module for module in heavy if module in sys.modules]]))
+"""
+
+
+def read_imports(script):
+    """
+    :return:    (list of modules the script imports at the top level, sorted list of
+                imdb_to_neo4j names it uses)
+    """
+    with open(script) as f:
+        tree = ast.parse(f.read(), script)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    names = set()
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and
+                node.value.id == 'i2n'):
+            names.add(node.attr)
+    return modules, sorted(names)
+
+
+def probe(modules, names):
+    """Median time in seconds over REPEATS fresh processes, and the heavy modules loaded"""
+    argument = json.dumps([modules, names, HEAVY_MODULES])
+    times = []
+    loaded = []
+    for _ in range(REPEATS):
+        completed = subprocess.run([sys.executable, '-c', PROBE, argument],
+                                   universal_newlines=True, stdout=subprocess.PIPE,
+                                   check=True)
+        elapsed, loaded = json.loads(completed.stdout)
+        times.append(elapsed)
+    times.sort()
+    return times[len(times) // 2], loaded
+
+
+def main():
+    print("%-26s %10s   %s" % ("entry point", "import ms", "heavy modules loaded"))
+    for script in ENTRY_POINTS:
+        if not os.path.exists(script):
+            continue
+        elapsed, loaded = probe(*read_imports(script))
+        print("%-26s %10.1f   %s" % (script, elapsed * 1000, ", ".join(loaded) or "-"))
+
+    # Everything the single imdb_to_neo4j module used to import
+    eager = ['imdb_graph', 'imdb_parsing', 'imdb_browser', 'selenium.webdriver',
+             'selenium.common.exceptions', 'neo4j', 'bs4', 'memory_graph', 'replay',
+             'imdb_datasets', 'config']
+    elapsed, loaded = probe(eager, [])
+    missing = [module for module in HEAVY_MODULES if module not in loaded]
+    print("%-26s %10.1f   %s" % ("(all layers, eager)", elapsed * 1000, ", ".join(loaded)))
+    if missing:
+        print("Not installed here, so not counted in the eager time:", ", ".join(missing))
+
+
+main()
@@ -0,0 +1,127 @@
+"""
+Memory benchmark for the scraped data model.
+
+Builds a NamePage for a synthetic person with 1,000 credits (half TV series with
+episodes, half features) from generated HTML, then reports how much memory the
+resulting objects keep alive, alongside the size of the parse tree that used to be
+retained through each Credit's div.
+
+Run from the project directory with
+
+    python3 -m benchmarks.bench_memory
+"""
+import gc
+import json
+import tracemalloc
+from datetime import date
+
+from bs4 import BeautifulSoup
+
+import imdb_to_neo4j as i2n
+
+NUM_CREDITS = 1000
+EPISODES_PER_SERIES = 5
+GENRES = ['Documentary', 'Reality-TV', 'Game-Show']
+
+
+class StaticDriver(object):
+    """Stands in for the Selenium driver, serving generated pages by URL"""
+    def __init__(self, pages):
+        self.pages = pages
+        self.page_source = ''
+
+    def get(self, url):
+        self.page_source = self.pages.get(url, '<html></html>')
+
+    def refresh(self):
+        pass
+
+
+class StaticResult(object):
+    def __init__(self, records):
+        self.records = records
+
+    def peek(self):
+        return self.records[0] if self.records else None
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class StaticDate(date):
+    def to_native(self):
+        return date(self.year, self.month, self.day)
+
+
+class StaticSession(object):
+    """Answers the episode lookups made by Credit as if every episode were in neo4j"""
+    def read_transaction(self, function, episode):
+        if function is i2n.check_neo4j_for_episode:
+            number = int(episode.imdb_episode_id[2:])
+            return StaticResult([{'e.seasonNum': number % 3 + 1,
+                                  'e.episodeNum': number % 20 + 1,
+                                  'e.airDate': StaticDate(2010 + number % 10, 1, 1)}])
+        return StaticResult([{'g.genreName': genre} for genre in GENRES])
+
+
+def name_page_html(num_credits):
+    rows = []
+    for i in range(num_credits):
+        title_id = 'tt%07d' % (1000000 + i)
+        row_class = 'filmo-row even' if i % 2 else 'filmo-row odd'
+        if i % 2:
+            episodes = ''.join(
+                '<div class="filmo-episodes">- <a href="/title/tt%07d/">Episode %d</a>'
+                '\n... (camera operator)</div>' % (5000000 + i * EPISODES_PER_SERIES + e, e)
+                for e in range(EPISODES_PER_SERIES))
+            rows.append('<div class="%s" id="camera_department-%s">'
+                        '<span class="year_column">2012-2016</span>'
+                        '<b><a href="/title/%s/">Series %d</a></b> (TV Series) (camera operator)'
+                        '<br/>%s</div>' % (row_class, title_id, title_id, i, episodes))
+        else:
+            rows.append('<div class="%s" id="camera_department-%s">'
+                        '<span class="year_column">2014</span>'
+                        '<b><a href="/title/%s/">Feature %d</a></b> (steadicam operator)'
+                        '</div>' % (row_class, title_id, title_id, i))
+    return ('<html><head><script type="application/ld+json">{"name": "Synthetic Person"}'
+            '</script></head><body>%s</body></html>' % ''.join(rows))
+
+
+def show_page_html():
+    return ('<html><head><script type="application/ld+json">%s</script></head></html>'
+            % json.dumps({'genre': GENRES}))
+
+
+def main():
+    crew = i2n.Person('nm0000001', 'Synthetic Person')
+    pages = {i2n.IMDB_NAME_BASE_URL + crew.imdb_name_id + '/': name_page_html(NUM_CREDITS)}
+    for i in range(0, NUM_CREDITS, 2):
+        pages[i2n.IMDB_TITLE_BASE_URL + 'tt%07d/' % (1000000 + i)] = show_page_html()
+    driver = StaticDriver(pages)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    name_page = i2n.NamePage(driver, StaticSession(), crew)
+    driver.page_source = ''
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    # Size of the name page parse tree that each Credit's div used to keep alive
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    soup = BeautifulSoup(pages[name_page.url], 'html.parser')
+    gc.collect()
+    tree = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    per_thousand = 1000.0 / len(name_page.credit_list)
+    print("Credits parsed:                          ", len(name_page.credit_list))
+    print("Retained by the data model per 1,000:     %.1f KiB" % (retained * per_thousand / 1024))
+    print("Parse tree no longer retained per 1,000:  %.1f KiB" % (tree * per_thousand / 1024))
+    del soup
+
+
+main()
@@ -0,0 +1,68 @@
+"""
+End-to-end throughput harness.
+
+Runs the whole pipeline offline against a directory of saved pages and an in-memory
+graph: add_genres.py, add_people.py, scrape_name_list.py, add_worked_on.py and
+add_worked_with.py, each in its own process as they'd normally be run. Reports the
+wall time of each stage and the size of the resulting graph.
+
+Saved pages can be captured from a real run by setting IMDB_TO_NEO4J_RECORD_DIR, and
+pages are looked up as laid out by replay.url_to_path.
+
+Run from the project directory with
+
+    python3 -m benchmarks.bench_pipeline
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import imdb_to_neo4j as i2n
+from memory_graph import MemoryGraph
+
+
+def run_stage(script, answers, env):
+    """Runs one of the pipeline scripts, answering its prompts from answers"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, script], input="\n".join(answers) + "\n",
+                               env=env, universal_newlines=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        print(completed.stdout)
+        raise RuntimeError(script + " failed")
+    return elapsed
+
+
+def main():
+    replay_dir = input("Directory of saved pages: ")
+    crew_csv = input("File path of the Crew List: ")
+    results_csv = crew_csv[:-4] + '_results.csv'
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        env = dict(os.environ)
+        env[i2n.REPLAY_DIR_VARIABLE] = replay_dir
+        env[i2n.MEMORY_GRAPH_VARIABLE] = os.path.join(work_dir, 'graph.pickle')
+
+        stages = [
+            ('add_genres.py', []),
+            ('add_people.py', [crew_csv]),
+            ('scrape_name_list.py', [crew_csv, '1', 'n', 'n', '1', '', '0']),
+            ('add_worked_on.py', [results_csv, '1', 'n']),
+            ('add_worked_with.py', ['n']),
+        ]
+        total = 0.0
+        for script, answers in stages:
+            elapsed = run_stage(script, answers, env)
+            total += elapsed
+            print("%-22s %8.2f s" % (script, elapsed))
+        print("%-22s %8.2f s" % ('total', total))
+
+        graph = MemoryGraph.open(env[i2n.MEMORY_GRAPH_VARIABLE])
+        print("\nGraph: %d nodes, %d relationships"
+              % (len(graph.nodes), len(graph.relationships)))
+
+
+main()
@@ -0,0 +1,106 @@
+"""
+Collaboration query latency benchmark.
+
+Times the queries of collaboration_queries.CollaborationQueries with an empty cache
+(every query goes to the database) and with a warm cache, for the same random mix of
+collaborator, ego network, shared season and path queries.
+
+By default the queries run against a generated in-memory graph of 2,000 people
+working on 400 seasons. Answer y to the prompt to run them against the neo4j database
+from config.py instead, with people picked from its Person nodes.
+
+Run from the project directory with
+
+    python3 -m benchmarks.bench_queries
+"""
+import random
+import time
+from datetime import date
+
+import imdb_to_neo4j as i2n
+import memory_graph
+from collaboration_queries import CollaborationQueries
+
+NUM_PEOPLE = 2000
+NUM_SEASONS = 400
+SEASONS_PER_PERSON = 6
+NUM_QUERIES = 500
+DISTINCT_PEOPLE = 10
+SEED = 1
+
+
+def make_graph(rng):
+    graph = memory_graph.MemoryGraph()
+    seasons = []
+    for i in range(NUM_SEASONS):
+        year = 1990 + i % 30
+        season, _ = graph.merge_node('Season', imdbSeasonID='tt%07dS1' % i)
+        graph.set_properties(season, seasonTitle='Show %d S1' % i,
+                             roughStart=memory_graph.to_memory_date(date(year, 1, 1)),
+                             roughEnd=memory_graph.to_memory_date(date(year, 12, 31)))
+        seasons.append(season)
+    people = []
+    for i in range(NUM_PEOPLE):
+        person = i2n.Person('nm%07d' % i, 'Person %d' % i)
+        graph.run(i2n.add_person, person)
+        node = graph.find_node('Person', imdbNameID=person.imdb_name_id)
+        for season in rng.sample(seasons, SEASONS_PER_PERSON):
+            graph.merge_relationship(node, 'WORKED_ON', season, jobTitle='Camera Operator')
+        people.append(person)
+    for person in people:
+        graph.run(memory_graph.update_worked_with, person)
+    return graph, [person.imdb_name_id for person in people]
+
+
+def make_queries(rng, imdb_name_ids):
+    # Analysts come back to the same people, so queries repeat
+    focus = rng.sample(imdb_name_ids, min(DISTINCT_PEOPLE, len(imdb_name_ids)))
+    queries = []
+    for _ in range(NUM_QUERIES):
+        kind = rng.choice(('collaborators', 'ego_network', 'shared_seasons', 'path'))
+        if kind in ('collaborators', 'ego_network'):
+            queries.append((kind, (rng.choice(focus),)))
+        else:
+            queries.append((kind, tuple(rng.sample(focus, 2))))
+    return queries
+
+
+def run(queries, service, cold):
+    latencies = []
+    for kind, args in queries:
+        if cold:
+            service.invalidate()
+        start = time.perf_counter()
+        getattr(service, kind)(*args)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+def report(label, latencies):
+    print("%-10s  median %8.3f ms   p95 %8.3f ms   total %8.1f ms" % (
+        label, latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.95)] * 1000, sum(latencies) * 1000))
+
+
+def main():
+    rng = random.Random(SEED)
+    if input("Benchmark against neo4j instead of a generated graph? (y/n): ") == 'y':
+        neo_driver = i2n.open_neo4j_session()
+        with neo_driver.session() as session:
+            imdb_name_ids = [record['p.imdbNameID'] for record
+                             in session.read_transaction(i2n.get_crew_list, 'Person')
+                             if record['p.imdbNameID']]
+    else:
+        neo_driver, imdb_name_ids = make_graph(rng)
+    queries = make_queries(rng, imdb_name_ids)
+
+    with CollaborationQueries(neo_driver, check_interval=60) as service:
+        report('uncached', run(queries, service, cold=True))
+        service.invalidate()
+        run(queries, service, cold=False)
+        report('cached', run(queries, service, cold=False))
+        print("Cache hits %d, misses %d" % (service.hits, service.misses))
+
+
+main()
@@ -0,0 +1,49 @@
+"""
+Season aggregation benchmark.
+
+Groups the episodes of a synthetic daily show (250 episodes a season for 40 seasons)
+into seasons with EpisodeIndex and reads back each season's airdate bounds.
+
+Run from the project directory with
+
+    python3 -m benchmarks.bench_seasons
+"""
+import timeit
+from datetime import date, timedelta
+
+import imdb_to_neo4j as i2n
+
+NUM_SEASONS = 40
+EPISODES_PER_SEASON = 250
+REPEAT = 5
+
+
+def make_episodes():
+    episodes = []
+    first_airdate = date(1980, 9, 1)
+    for season_num in range(1, NUM_SEASONS + 1):
+        for episode_num in range(1, EPISODES_PER_SEASON + 1):
+            episodes.append(i2n.Episode(
+                imdb_title_id='tt0000001',
+                imdb_episode_id='tt%07d' % (season_num * 1000 + episode_num),
+                job_title='camera operator' if episode_num % 3 else 'jib operator',
+                season_num=season_num,
+                episode_num=episode_num,
+                airdate=first_airdate + timedelta(days=365 * (season_num - 1) + episode_num),
+                genre_list=['Game-Show', 'Family']))
+    return episodes
+
+
+def group(episodes):
+    for season in i2n.EpisodeIndex('tt0000001', 'Synthetic Show', episodes).season_list:
+        season.rough_start, season.rough_end, season.first_airdate, season.last_airdate
+
+
+def main():
+    episodes = make_episodes()
+    seconds = min(timeit.repeat(lambda: group(episodes), number=1, repeat=REPEAT))
+    print("Episodes grouped:     ", len(episodes))
+    print("Best of %d:            %.1f ms" % (REPEAT, seconds * 1000))
+
+
+main()
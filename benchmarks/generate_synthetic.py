@@ -0,0 +1,379 @@
+"""
+Synthetic data generator for scale testing.
+
+Makes up a structurally realistic slice of IMDb at a chosen size, so the pipeline can
+be measured at many times the size of the data we've scraped:
+
+    shows           1 to 15 seasons (most have a few), one a year, each of a fixed
+                    number of weekly episodes starting in the autumn
+    crews           drawn for each season with a skewed distribution: a few people are
+                    on a great many seasons and most on one or two, crew sizes are
+                    heavy tailed, and much of a season's crew carries over to the next
+    credits         each crew member works a run of the season's episodes, now and then
+                    with a second job on some of them; some people also have a film
+                    credit, which has no episodes
+
+It writes, in the directory given:
+
+    pages/              saved pages laid out by replay.url_to_path, in the markup that
+                        NamePage, ShowPage, EpisodeListPage and EpisodePage parse: a name
+                        page per person, and a title page, episode list pages (by season
+                        and by year) and episode pages per show
+    crew.csv            Crew List of everyone, for add_people.py and scrape_name_list.py
+    crew_results.csv    the results csv scrape_name_list.py makes from the pages, so
+                        add_worked_on.py and add_worked_with.py can be run without scraping
+
+Running bench_pipeline.py against pages/ and crew.csv at a few sizes shows how each stage
+scales. Its scrape stage overwrites crew_results.csv with the same rows.
+
+Run from the project directory with
+
+    python3 -m benchmarks.generate_synthetic
+"""
+import csv
+import json
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import imdb_to_neo4j as i2n
+import credit_records
+from replay import url_to_path
+
+GENRES = ['Comedy', 'Reality-TV', 'Documentary', 'Talk-Show', 'Drama', 'Game-Show', 'Sport',
+          'Crime', 'Family', 'Music', 'News', 'Mystery', 'Adventure', 'History']
+# Jobs that come out of parse_job_list as they went in, the most common first
+JOBS = ['camera operator', 'first assistant camera', 'second assistant camera',
+        'steadicam operator', 'camera utility', 'key grip', 'best boy electric',
+        'lighting director', 'director of photography']
+JOB_WEIGHTS = [40, 20, 15, 8, 6, 4, 3, 2, 2]
+EPISODES_PER_SEASON = [6, 8, 8, 10, 10, 12, 13, 13, 20, 22]
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Casey', 'Riley', 'Morgan', 'Taylor', 'Jamie', 'Robin',
+               'Avery', 'Quinn', 'Drew', 'Parker', 'Reese', 'Rowan', 'Sage', 'Skyler', 'Dana']
+LAST_NAMES = ['Adams', 'Baker', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito',
+              'Jones', 'Kim', 'Lopez', 'Moreau', 'Nakamura', 'Okafor', 'Patel', 'Rossi', 'Silva']
+TITLE_WORDS = ['Kitchen', 'Island', 'Midnight', 'Wild', 'House', 'Secret', 'Road', 'Gold',
+               'Family', 'Rescue', 'Dream', 'City', 'Ocean', 'Star', 'Hunters', 'Garden',
+               'Challenge', 'Life', 'Night', 'Farm']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Zipf exponent of how often people are drawn for crews
+POPULARITY_SKEW = 0.8
+# Share of a season's crew that works on the next one too
+CARRY_OVER = 0.6
+# Share of people with a film credit
+FILM_SHARE = 0.3
+LAST_YEAR = 2023
+
+
+class SyntheticEpisode(object):
+    """ DATA MEMBERS
+        imdb_episode_id [string]
+        season_num      [int]
+        episode_num     [int]
+        airdate         [datetime.date]
+        """
+    __slots__ = ('imdb_episode_id', 'season_num', 'episode_num', 'airdate')
+
+    def __init__(self, imdb_episode_id, season_num, episode_num, airdate):
+        self.imdb_episode_id = imdb_episode_id
+        self.season_num = season_num
+        self.episode_num = episode_num
+        self.airdate = airdate
+
+
+class SyntheticShow(object):
+    """ DATA MEMBERS
+        imdb_title_id   [string]
+        title           [string]
+        genres          [list]      sorted genre names
+        seasons         [list]      list of lists of SyntheticEpisode, one per season
+        year            [int]       release year of a film, None for a show
+        """
+    __slots__ = ('imdb_title_id', 'title', 'genres', 'seasons', 'year')
+
+    def __init__(self, imdb_title_id, title, genres, year=None):
+        self.imdb_title_id = imdb_title_id
+        self.title = title
+        self.genres = genres
+        self.seasons = []
+        self.year = year
+
+    @property
+    def film(self):
+        return self.year is not None
+
+
+class SyntheticPerson(object):
+    """ DATA MEMBERS
+        imdb_name_id    [string]
+        full_name       [string]
+        job             [string]    the job they mostly do
+        credits         [dict]      imdbTitleID -> list of (SyntheticEpisode, job title)
+                                    they worked on, or an empty list for a film
+        """
+    __slots__ = ('imdb_name_id', 'full_name', 'job', 'credits')
+
+    def __init__(self, imdb_name_id, full_name, job):
+        self.imdb_name_id = imdb_name_id
+        self.full_name = full_name
+        self.job = job
+        self.credits = {}
+
+
+def generate(num_people, num_shows, seed):
+    """:return:    (list of SyntheticPerson, dict of imdbTitleID -> SyntheticShow)"""
+    rng = random.Random(seed)
+    people = [SyntheticPerson('nm%07d' % (5000000 + i),
+                              rng.choice(FIRST_NAMES) + ' ' + rng.choice(LAST_NAMES),
+                              rng.choices(JOBS, JOB_WEIGHTS)[0])
+              for i in range(num_people)]
+    cum_weights = []
+    total = 0.0
+    for rank in range(num_people):
+        total += 1.0 / (rank + 1) ** POPULARITY_SKEW
+        cum_weights.append(total)
+
+    shows = {}
+    next_episode = 0
+    for i in range(num_shows):
+        show = SyntheticShow('tt%07d' % (6000000 + i),
+                             'The ' + ' '.join(rng.sample(TITLE_WORDS, 2)) + ' ' + str(i),
+                             sorted(rng.sample(GENRES, rng.randint(1, 3))))
+        shows[show.imdb_title_id] = show
+        num_seasons = 1 + min(int(rng.expovariate(1 / 2.0)), 14)
+        num_episodes = rng.choice(EPISODES_PER_SEASON)
+        first_year = rng.randint(1995, LAST_YEAR - num_seasons + 1)
+        crew = []
+        for season_num in range(1, num_seasons + 1):
+            premiere = date(first_year + season_num - 1, 9, 1) + timedelta(days=rng.randint(0, 30))
+            season = []
+            for episode_num in range(1, num_episodes + 1):
+                season.append(SyntheticEpisode('tt%08d' % (10000000 + next_episode),
+                                               season_num, episode_num,
+                                               premiere + timedelta(weeks=episode_num - 1)))
+                next_episode += 1
+            show.seasons.append(season)
+            crew = _draw_crew(rng, crew, num_people, cum_weights)
+            for person_index in crew:
+                _add_credit(rng, people[person_index], show, season)
+
+    films = [SyntheticShow('tt%07d' % (7000000 + i), 'A ' + rng.choice(TITLE_WORDS) + ' Film ' +
+                           str(i), sorted(rng.sample(GENRES, rng.randint(1, 2))),
+                           rng.randint(1995, LAST_YEAR))
+             for i in range(max(1, num_shows // 2))]
+    for film in films:
+        shows[film.imdb_title_id] = film
+    for person in people:
+        if rng.random() < FILM_SHARE:
+            person.credits[rng.choice(films).imdb_title_id] = []
+    return people, shows
+
+
+def _draw_crew(rng, last_crew, num_people, cum_weights):
+    """Part of the last season's crew, made up to a heavy-tailed crew size with people
+    drawn by popularity"""
+    size = min(num_people, 1 + int(3 * rng.paretovariate(1.5)), 60)
+    crew = [person_index for person_index in last_crew if rng.random() < CARRY_OVER][:size]
+    chosen = set(crew)
+    while len(crew) < size:
+        person_index = rng.choices(range(num_people), cum_weights=cum_weights)[0]
+        if person_index not in chosen:
+            chosen.add(person_index)
+            crew.append(person_index)
+    return crew
+
+
+def _add_credit(rng, person, show, season):
+    # Half the crew work the whole season, the rest a run of it
+    if rng.random() < 0.5:
+        start, end = 0, len(season)
+    else:
+        start = rng.randrange(len(season))
+        end = rng.randint(start + 1, len(season))
+    second_job = rng.choice(JOBS) if rng.random() < 0.1 else None
+    credit = person.credits.setdefault(show.imdb_title_id, [])
+    for episode in season[start:end]:
+        job = second_job if second_job and rng.random() < 0.3 else person.job
+        credit.append((episode, job))
+
+
+def _years(show, episodes):
+    """:return:    (first year, last year) as strings"""
+    if show.film:
+        return str(show.year), str(show.year)
+    years = sorted({episode.airdate.year for episode, job in episodes})
+    return str(years[0]), str(years[-1])
+
+
+def _credits_in_page_order(person, shows):
+    """(show, episodes) for each credit, most recent first as IMDb lists them"""
+    return sorted(((shows[imdb_title_id], episodes)
+                   for imdb_title_id, episodes in person.credits.items()),
+                  key=lambda credit: _years(*credit)[1], reverse=True)
+
+
+def name_page(person, shows):
+    rows = []
+    for show, episodes in _credits_in_page_order(person, shows):
+        imdb_title_id = show.imdb_title_id
+        if show.film:
+            year = str(show.year)
+            header = '(%s)' % person.job
+        else:
+            first_year, last_year = _years(show, episodes)
+            year = first_year if first_year == last_year else first_year + '-' + last_year
+            header = '(TV Series) (%s)' % person.job
+        rows.append('<div class="filmo-row %s" id="camera_department-%s">'
+                    '<span class="year_column">\n%s</span>\n<b><a href="/title/%s/">%s</a></b>\n'
+                    '%s\n<br/>\n' % ('odd' if len(rows) % 2 == 0 else 'even', imdb_title_id,
+                                     year, imdb_title_id, show.title, header))
+        for episode, job in episodes:
+            rows.append('<div class="filmo-episodes">- <a href="/title/%s/">Episode %d.%d</a> '
+                        '(%d)\n... (%s)</div>\n' % (episode.imdb_episode_id, episode.season_num,
+                                                   episode.episode_num, episode.airdate.year,
+                                                   job))
+        rows.append('</div>\n')
+    return ('<html><head><script type="application/ld+json">%s</script></head><body>\n%s'
+            '</body></html>\n' % (json.dumps({'@type': 'Person', 'name': person.full_name}),
+                                  ''.join(rows)))
+
+
+def title_page(show):
+    data = {'@type': 'Movie' if show.film else 'TVSeries', 'name': show.title,
+            'genre': show.genres}
+    return ('<html><head><script type="application/ld+json">%s</script></head>'
+            '<body></body></html>\n' % json.dumps(data))
+
+
+def episode_page(show, episode):
+    ld_json = {'@type': 'TVEpisode', 'name': 'Episode %d.%d' % (episode.season_num,
+                                                                episode.episode_num),
+               'genre': show.genres, 'datePublished': episode.airdate.isoformat()}
+    next_data = {'props': {'pageProps': {'aboveTheFoldData': {
+        'id': episode.imdb_episode_id,
+        'series': {'episodeNumber': {'seasonNumber': episode.season_num,
+                                     'episodeNumber': episode.episode_num}},
+        'releaseDate': {'day': episode.airdate.day, 'month': episode.airdate.month,
+                        'year': episode.airdate.year},
+    }}}}
+    return ('<html><head><script type="application/ld+json">%s</script>'
+            '<script id="__NEXT_DATA__" type="application/json">%s</script></head>'
+            '<body></body></html>\n' % (json.dumps(ld_json), json.dumps(next_data)))
+
+
+def episode_list_options(show):
+    """The /episodes page, which only matters for its season and year options"""
+    years = sorted({episode.airdate.year for season in show.seasons for episode in season})
+    seasons = ''.join('<option value="%d">%d</option>' % (season_num, season_num)
+                      for season_num in range(1, len(show.seasons) + 1))
+    years = ''.join('<option value="%d">%d</option>' % (year, year) for year in years)
+    return ('<html><body><div><label for="bySeason">Season:</label><select id="bySeason">%s'
+            '</select></div><div><label for="byYear">Year:</label><select id="byYear">%s'
+            '</select></div></body></html>\n' % (seasons, years))
+
+
+def episode_list_page(episodes):
+    items = []
+    for i, episode in enumerate(episodes):
+        airdate = episode.airdate
+        items.append('<div class="list_item %s"><div data-const="%s"><div>S%d, Ep%d</div></div>'
+                     '<div class="airdate">%d %s. %d</div><a itemprop="name" href="/title/%s/">'
+                     'Episode %d.%d</a></div>\n'
+                     % ('odd' if i % 2 == 0 else 'even', episode.imdb_episode_id,
+                        episode.season_num, episode.episode_num, airdate.day,
+                        MONTHS[airdate.month - 1], airdate.year, episode.imdb_episode_id,
+                        episode.season_num, episode.episode_num))
+    return '<html><body>%s</body></html>\n' % ''.join(items)
+
+
+def result_rows(person, shows):
+    """The rows credit_records.credit_rows makes from the person's name page"""
+    rows = []
+    for show, episodes in _credits_in_page_order(person, shows):
+        if show.film:
+            continue
+        first_year, last_year = _years(show, episodes)
+        jobs_by_season = {}
+        for episode, job in episodes:
+            jobs = jobs_by_season.setdefault(episode.season_num, [])
+            if job not in jobs:
+                jobs.append(job)
+        for season_num in sorted(jobs_by_season):
+            for job in jobs_by_season[season_num]:
+                rows.append([person.full_name, person.imdb_name_id, 'Camera Department',
+                             i2n.to_caps(job), first_year, last_year, show.title,
+                             show.imdb_title_id, str(season_num), 'TV Series', show.genres])
+    return rows
+
+
+def write_page(pages_dir, url, source):
+    path = url_to_path(pages_dir, url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(source)
+
+
+def write(directory, people, shows):
+    """:return:    number of pages written"""
+    pages_dir = os.path.join(directory, 'pages')
+    pages = 0
+    for person in people:
+        write_page(pages_dir, i2n.IMDB_NAME_BASE_URL + person.imdb_name_id + '/',
+                   name_page(person, shows))
+        pages += 1
+    for show in shows.values():
+        base_url = i2n.IMDB_TITLE_BASE_URL + show.imdb_title_id + '/'
+        write_page(pages_dir, base_url, title_page(show))
+        pages += 1
+        if show.film:
+            continue
+        write_page(pages_dir, base_url + 'episodes', episode_list_options(show))
+        by_year = {}
+        for season in show.seasons:
+            write_page(pages_dir, base_url + 'episodes?season=%d' % season[0].season_num,
+                       episode_list_page(season))
+            for episode in season:
+                write_page(pages_dir, i2n.IMDB_TITLE_BASE_URL + episode.imdb_episode_id + '/',
+                           episode_page(show, episode))
+                by_year.setdefault(episode.airdate.year, []).append(episode)
+            pages += 2 + len(season)
+        for year, episodes in by_year.items():
+            write_page(pages_dir, base_url + 'episodes?year=%d' % year,
+                       episode_list_page(episodes))
+            pages += 1
+
+    with open(os.path.join(directory, 'crew.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['imdb_name_id', 'full_name'])
+        for person in people:
+            writer.writerow([person.imdb_name_id, person.full_name])
+    with open(os.path.join(directory, 'crew_results.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(credit_records.FIELDS)
+        for person in people:
+            writer.writerows(result_rows(person, shows))
+    return pages
+
+
+def main():
+    directory = input("Directory to write the synthetic data to: ")
+    num_people = int(input("Number of people (blank for 1000): ") or 1000)
+    num_shows = int(input("Number of shows (blank for one per 10 people): ") or
+                    max(1, num_people // 10))
+    seed = int(input("Random seed (blank for 1): ") or 1)
+
+    start = time.perf_counter()
+    people, shows = generate(num_people, num_shows, seed)
+    pages = write(directory, people, shows)
+    seasons = sum(len(show.seasons) for show in shows.values())
+    episodes = sum(len(season) for show in shows.values() for season in show.seasons)
+    credited = sum(len(credit) for person in people for credit in person.credits.values())
+    print("%d people, %d shows, %d seasons, %d episodes, %d episode credits"
+          % (num_people, num_shows, seasons, episodes, credited))
+    print("%d pages written in %.1f s" % (pages, time.perf_counter() - start))
+
+
+main()
@@ -0,0 +1,17 @@
+import imdb_datasets
+
+
+def main():
+    while True:
+        try:
+            episode_path = input("File path of title.episode.tsv.gz: ")
+            basics_path = input("File path of title.basics.tsv.gz: ")
+            directory = input("Directory for the episode lookup: ")
+            count = imdb_datasets.build_episode_lookup(episode_path, basics_path, directory)
+            break
+        except FileNotFoundError:
+            print("File not found")
+    print("Episode lookup of", count, "episodes written to", directory)
+
+
+main()
@@ -0,0 +1,316 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import queue
+import threading
+import time
+
+import imdb_to_neo4j as i2n
+
+
+def get_collaborators(tx, imdb_name_id):
+    return tx.run("MATCH (p:Person {imdbNameID: $imdbNameID})-[r:WORKED_WITH]-(p2:Person) "
+                  "RETURN p2.imdbNameID AS imdbNameID, p2.fullName AS fullName, "
+                  "r.seasons_in_common AS seasonsInCommon, r.startDate AS startDate, "
+                  "r.endDate AS endDate "
+                  "ORDER BY seasonsInCommon DESC, fullName ",
+                  imdbNameID=imdb_name_id)
+
+
+def get_ego_network(tx, imdb_name_id):
+    """A person's collaborators, each with which of the other collaborators they worked with"""
+    return tx.run("MATCH (p:Person {imdbNameID: $imdbNameID})-[:WORKED_WITH]-(p2:Person) "
+                  "WITH collect(DISTINCT p2) AS members "
+                  "UNWIND members AS p1 "
+                  "OPTIONAL MATCH (p1)-[:WORKED_WITH]->(p2:Person) WHERE p2 IN members "
+                  "RETURN p1.imdbNameID AS imdbNameID, p1.fullName AS fullName, "
+                  "collect(p2.imdbNameID) AS workedWith "
+                  "ORDER BY imdbNameID ",
+                  imdbNameID=imdb_name_id)
+
+
+def get_shared_seasons(tx, imdb_name_id1, imdb_name_id2):
+    return tx.run("MATCH (:Person {imdbNameID: $imdbNameID1})-[:WORKED_ON]->(se:Season)"
+                  "<-[:WORKED_ON]-(:Person {imdbNameID: $imdbNameID2}) "
+                  "RETURN DISTINCT se.imdbSeasonID AS imdbSeasonID, "
+                  "se.seasonTitle AS seasonTitle, se.roughStart AS roughStart "
+                  "ORDER BY roughStart ",
+                  imdbNameID1=imdb_name_id1, imdbNameID2=imdb_name_id2)
+
+
+def get_collaboration_path(tx, imdb_name_id1, imdb_name_id2, max_length):
+    # Variable length bounds can't be parameters, so max_length is formatted in
+    return tx.run("MATCH (p1:Person {imdbNameID: $imdbNameID1}), "
+                  "(p2:Person {imdbNameID: $imdbNameID2}), "
+                  "path = shortestPath((p1)-[:WORKED_WITH*..%d]-(p2)) "
+                  "RETURN [p IN nodes(path) | p.fullName] AS names " % int(max_length),
+                  imdbNameID1=imdb_name_id1, imdbNameID2=imdb_name_id2)
+
+
+def get_collaborators_in_years(tx, imdb_name_id, first_year, last_year):
+    """A person's collaborators between two years (inclusive), from the WORKED_WITH_YEAR
+    relationships written by add_collaboration_years.py"""
+    return tx.run("MATCH (p:Person {imdbNameID: $imdbNameID})-[r:WORKED_WITH_YEAR]-(p2:Person) "
+                  "WHERE r.year >= $firstYear AND r.year <= $lastYear "
+                  "WITH p2, r ORDER BY r.year "
+                  "WITH p2, collect([r.year, r.seasons_in_common]) AS years "
+                  "RETURN p2.imdbNameID AS imdbNameID, p2.fullName AS fullName, years "
+                  "ORDER BY size(years) DESC, fullName ",
+                  imdbNameID=imdb_name_id, firstYear=first_year, lastYear=last_year)
+
+
+def get_collaborations_in_years(tx, first_year, last_year, min_years):
+    """Every pair of people who worked together in at least min_years of the years
+    between first_year and last_year (inclusive)"""
+    return tx.run("MATCH (p1:Person)-[r:WORKED_WITH_YEAR]->(p2:Person) "
+                  "WHERE r.year >= $firstYear AND r.year <= $lastYear "
+                  "WITH p1, p2, count(r) AS years, sum(r.seasons_in_common) AS seasonYears "
+                  "WHERE years >= $minYears "
+                  "RETURN p1.imdbNameID AS imdbNameID1, p2.imdbNameID AS imdbNameID2, "
+                  "years, seasonYears "
+                  "ORDER BY imdbNameID1, imdbNameID2 ",
+                  firstYear=first_year, lastYear=last_year, minYears=min_years)
+
+
+def get_collaboration_years(tx, imdb_name_id1, imdb_name_id2):
+    return tx.run("MATCH (:Person {imdbNameID: $imdbNameID1})-[r:WORKED_WITH_YEAR]-"
+                  "(:Person {imdbNameID: $imdbNameID2}) "
+                  "RETURN r.year AS year, r.seasons_in_common AS seasonsInCommon "
+                  "ORDER BY year ",
+                  imdbNameID1=imdb_name_id1, imdbNameID2=imdb_name_id2)
+
+
+class SessionPool(object):
+    """ A fixed set of neo4j sessions shared between threads, so a query doesn't pay for
+        opening a session. Use as
+
+            with pool.session() as session:
+                session.read_transaction(...)
+        """
+    def __init__(self, neo_driver, size=4):
+        self.neo_driver = neo_driver
+        self.size = size
+        self._sessions = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self):
+        session = self._take()
+        try:
+            yield session
+        except Exception:
+            # The session may be unusable, so replace it
+            session.close()
+            session = self.neo_driver.session()
+            raise
+        finally:
+            self._sessions.put(session)
+
+    def _take(self):
+        # Sessions are opened as they're first needed, up to size
+        try:
+            return self._sessions.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self.neo_driver.session()
+        return self._sessions.get()
+
+    def close(self):
+        while True:
+            try:
+                self._sessions.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class CollaborationQueries(object):
+    """ Read-only collaboration queries over the WORKED_WITH, WORKED_WITH_YEAR and
+        WORKED_ON relationships, with the results of recent queries cached.
+
+        Results are kept in a least recently used cache of cache_size entries. Before a
+        cached result is used, the graph version (see imdb_graph.bump_graph_version),
+        which the scripts that write WORKED_ON, WORKED_WITH and WORKED_WITH_YEAR
+        relationships move on, is checked at most every check_interval seconds, and the
+        whole cache is dropped if it has moved. Results can therefore be up to
+        check_interval seconds stale.
+
+        DATA MEMBERS
+        pool            SessionPool
+        cache_size      [int]       most results kept
+        check_interval  [float]     seconds between checks of the graph version
+        hits            [int]       queries answered from the cache
+        misses          [int]       queries run against the database
+        """
+    def __init__(self, neo_driver=None, cache_size=256, pool_size=4, check_interval=5.0):
+        self.neo_driver = neo_driver or i2n.open_neo4j_session()
+        self.pool = SessionPool(self.neo_driver, pool_size)
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._graph_version = None
+        self._checked = None
+
+    def collaborators(self, imdb_name_id):
+        """
+        :return:    tuple of (imdbNameID, full name, seasons in common, start date,
+                    end date), most seasons in common first
+        """
+        return self._query(get_collaborators, imdb_name_id)
+
+    def ego_network(self, imdb_name_id):
+        """
+        :return:    (frozenset of imdbNameIDs of the person and their collaborators,
+                    frozenset of (imdbNameID, imdbNameID) collaborations between them)
+        """
+        return self._query(get_ego_network, imdb_name_id)
+
+    def shared_seasons(self, imdb_name_id1, imdb_name_id2):
+        """
+        :return:    tuple of (imdbSeasonID, season title) both people worked on, earliest
+                    first
+        """
+        return self._query(get_shared_seasons, imdb_name_id1, imdb_name_id2)
+
+    def path(self, imdb_name_id1, imdb_name_id2, max_length=6):
+        """
+        :return:    tuple of full names along a shortest WORKED_WITH path between two
+                    people, or None if they aren't connected within max_length steps
+        """
+        return self._query(get_collaboration_path, imdb_name_id1, imdb_name_id2, max_length)
+
+    # Answered from the WORKED_WITH_YEAR relationships, see add_collaboration_years.py
+
+    def collaborators_in(self, imdb_name_id, first_year, last_year):
+        """
+        :return:    tuple of (imdbNameID, full name, tuple of (year, seasons in common)) of
+                    the people the person worked with between first_year and last_year
+                    (inclusive), most years first
+        """
+        return self._query(get_collaborators_in_years, imdb_name_id, first_year, last_year)
+
+    def collaborations_in(self, first_year, last_year, min_years=1):
+        """
+        The collaboration network of a range of years.
+
+        :return:    tuple of (imdbNameID, imdbNameID, number of years they worked together
+                    in, seasons in common summed over those years), the first imdbNameID
+                    of each pair the lower
+        """
+        return self._query(get_collaborations_in_years, first_year, last_year, min_years)
+
+    def collaboration_years(self, imdb_name_id1, imdb_name_id2):
+        """
+        :return:    tuple of (year, number of seasons in common) of the years two people
+                    worked together, earliest first
+        """
+        return self._query(get_collaboration_years, imdb_name_id1, imdb_name_id2)
+
+    def _query(self, transaction, *args):
+        key = (transaction.__name__,) + args
+        self._check_graph_version()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+        with self.pool.session() as session:
+            records = list(session.read_transaction(transaction, *args))
+        result = READERS[transaction.__name__](records, *args)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _check_graph_version(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_interval:
+            return
+        with self.pool.session() as session:
+            record = session.read_transaction(i2n.get_graph_version).single()
+        graph_version = record['version'] if record else None
+        with self._lock:
+            self._checked = now
+            if graph_version != self._graph_version:
+                self._graph_version = graph_version
+                self._cache.clear()
+
+    def invalidate(self):
+        """Drops every cached result"""
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Results are converted to tuples and frozensets so cached results aren't tied to a
+# session, and can be shared between callers without one changing them for the others
+
+def _read_collaborators(records, imdb_name_id):
+    return tuple((record['imdbNameID'], record['fullName'], record['seasonsInCommon'],
+                  _to_native(record['startDate']), _to_native(record['endDate']))
+                 for record in records)
+
+
+def _read_ego_network(records, imdb_name_id):
+    members = {imdb_name_id}
+    edges = set()
+    for record in records:
+        members.add(record['imdbNameID'])
+        edges.add(tuple(sorted((imdb_name_id, record['imdbNameID']))))
+        for other in record['workedWith']:
+            edges.add(tuple(sorted((record['imdbNameID'], other))))
+    return frozenset(members), frozenset(edges)
+
+
+def _read_shared_seasons(records, imdb_name_id1, imdb_name_id2):
+    return tuple((record['imdbSeasonID'], record['seasonTitle']) for record in records)
+
+
+def _read_collaboration_path(records, imdb_name_id1, imdb_name_id2, max_length):
+    return tuple(records[0]['names']) if records else None
+
+
+def _read_collaborators_in_years(records, imdb_name_id, first_year, last_year):
+    return tuple((record['imdbNameID'], record['fullName'],
+                  tuple((year, seasons_in_common) for year, seasons_in_common in record['years']))
+                 for record in records)
+
+
+def _read_collaborations_in_years(records, first_year, last_year, min_years):
+    return tuple((record['imdbNameID1'], record['imdbNameID2'], record['years'],
+                  record['seasonYears'])
+                 for record in records)
+
+
+def _read_collaboration_years(records, imdb_name_id1, imdb_name_id2):
+    return tuple((record['year'], record['seasonsInCommon']) for record in records)
+
+
+READERS = {
+    'get_collaborators': _read_collaborators,
+    'get_ego_network': _read_ego_network,
+    'get_shared_seasons': _read_shared_seasons,
+    'get_collaboration_path': _read_collaboration_path,
+    'get_collaborators_in_years': _read_collaborators_in_years,
+    'get_collaborations_in_years': _read_collaborations_in_years,
+    'get_collaboration_years': _read_collaboration_years,
+}
+
+
+def _to_native(value):
+    return value.to_native() if hasattr(value, 'to_native') else value
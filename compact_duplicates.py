@@ -0,0 +1,52 @@
+import imdb_to_neo4j as i2n
+
+# Labels compacted, shows first so their seasons' SEASON_OF relationships end up on one show
+LABELS = ('Show', 'Season')
+
+# Groups of duplicates merged per transaction
+DEFAULT_CHUNK_SIZE = 100
+
+
+def compact(session, label, chunk_size, report_only):
+    """
+    Merges the duplicates of every key of a label onto the oldest node with the key, a
+    chunk of keys per transaction.
+
+    :return:    (groups of duplicates, nodes deleted, relationships before, relationships after)
+    """
+    groups = [record['nodeIDs']
+              for record in session.read_transaction(i2n.find_duplicates, label)]
+    deleted = before = after = 0
+    if report_only:
+        return len(groups), deleted, before, after
+    for i in range(0, len(groups), chunk_size):
+        result = session.write_transaction(i2n.merge_duplicates, label,
+                                           groups[i:i + chunk_size]).single()
+        session.write_transaction(i2n.bump_graph_version)
+        deleted += result['nodesDeleted']
+        before += result['relationshipsBefore']
+        after += result['relationshipsAfter']
+        print("Merged", min(i + chunk_size, len(groups)), "of", len(groups), label,
+              "groups")
+    return len(groups), deleted, before, after
+
+
+def main():
+    neo_driver = i2n.open_neo4j_session()
+    chunk_size = int(input("Groups of duplicates to merge per transaction (blank for "
+                           + str(DEFAULT_CHUNK_SIZE) + "): ") or DEFAULT_CHUNK_SIZE)
+    report_only = input("Only report the duplicates, without merging them? (y/n): ") == 'y'
+
+    with neo_driver.session() as session:
+        for label in LABELS:
+            groups, deleted, before, after = compact(session, label, chunk_size, report_only)
+            if report_only:
+                print(label + ":", groups, "keys with duplicate nodes")
+                continue
+            print("%s: %d keys with duplicate nodes, %d nodes reclaimed, %d relationships "
+                  "reclaimed (%d -> %d)" % (label, groups, deleted, before - after, before,
+                                            after))
+    session.close()
+
+
+main()
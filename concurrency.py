@@ -0,0 +1,244 @@
+import itertools
+import queue
+import threading
+import time
+
+from imdb_browser import PageTimeout
+
+OK = 'ok'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+BLOCKED = 'blocked'
+
+# Priorities of fetches in a FetchPool, lowest first
+FOREGROUND = 0
+LOOKAHEAD = 1
+_STOP = 2
+
+
+class BlockedPageError(Exception):
+    """Raised for a fetch whose page still looked blocked after every retry"""
+
+
+class AdaptiveConcurrency(object):
+    """ Chooses how many fetch workers should be active, from how fetches are going.
+
+        Outcomes are collected in windows of `window` fetches. At the end of each window:
+        - if any page looked blocked (ie an IMDb throttling page with no ld+json), or
+          the error/timeout rate is above max_error_rate, the limit is halved
+        - if median latency has risen above latency_tolerance times the best median
+          seen so far, the limit is lowered by one
+        - otherwise the limit is raised by one
+        so the limit climbs until IMDb starts pushing back and then backs off quickly.
+
+        DATA MEMBERS
+        limit           [int]       number of workers that should be fetching at once
+        min_workers     [int]       lowest the limit will go
+        max_workers     [int]       highest the limit will go
+        history         [list]      (seconds since start, limit, reason) for each change
+        """
+    def __init__(self, min_workers=1, max_workers=8, initial=None, window=20,
+                 max_error_rate=0.1, latency_tolerance=2.0):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.limit = initial or min_workers
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.latency_tolerance = latency_tolerance
+        self.best_latency = None
+        self.totals = {OK: 0, ERROR: 0, TIMEOUT: 0, BLOCKED: 0}
+        self.history = []
+        self._start = time.monotonic()
+        self._latencies = []
+        self._outcomes = []
+        self._lock = threading.Lock()
+        self._set_limit(self.limit, 'initial')
+
+    def record(self, latency, outcome=OK):
+        """
+        :param latency:     [float]     seconds the fetch took
+        :param outcome:     [string]    OK, ERROR, TIMEOUT or BLOCKED
+        """
+        with self._lock:
+            self.totals[outcome] += 1
+            self._latencies.append(latency)
+            self._outcomes.append(outcome)
+            if len(self._outcomes) >= self.window:
+                self._adjust()
+
+    def _adjust(self):
+        outcomes = self._outcomes
+        latencies = sorted(self._latencies)
+        self._outcomes = []
+        self._latencies = []
+        failures = sum(1 for outcome in outcomes if outcome in (ERROR, TIMEOUT))
+        median = latencies[len(latencies) // 2]
+
+        if BLOCKED in outcomes:
+            self._set_limit(self.limit // 2, 'blocked pages')
+        elif failures > self.max_error_rate * len(outcomes):
+            self._set_limit(self.limit // 2, 'errors/timeouts')
+        elif self.best_latency and median > self.latency_tolerance * self.best_latency:
+            self._set_limit(self.limit - 1, 'latency %.2fs' % median)
+        else:
+            self._set_limit(self.limit + 1, 'healthy')
+        if self.best_latency is None or median < self.best_latency:
+            self.best_latency = median
+
+    def _set_limit(self, limit, reason):
+        limit = max(self.min_workers, min(self.max_workers, limit))
+        if not self.history or limit != self.limit:
+            self.history.append((time.monotonic() - self._start, limit, reason))
+        self.limit = limit
+
+    def report(self):
+        """Returns a printable summary of the outcomes and the limit over time"""
+        lines = ["Fetches: " + ", ".join(outcome + " " + str(count)
+                                          for outcome, count in self.totals.items())]
+        for seconds, limit, reason in self.history:
+            lines.append("%8.1fs  %2d workers  (%s)" % (seconds, limit, reason))
+        return "\n".join(lines)
+
+
+class FetchPool(object):
+    """ Runs page fetches on several browsers at once, with the number fetching at any
+        moment set by an AdaptiveConcurrency controller.
+
+        Each worker thread has its own driver. They're all created by driver_factory
+        when the pool is, on the calling thread, since opening a browser may prompt for
+        input (ie to sign in or complete a CAPTCHA). A fetch is a function(driver, item);
+        its result counts as BLOCKED if it has a true `blocked` attribute (see
+        Page.blocked), as TIMEOUT if it raised a PageTimeout, and as ERROR if it
+        raised anything else.
+
+        Queued fetches are started in order of priority, so the FOREGROUND fetches of map,
+        which the caller is waiting for, go ahead of LOOKAHEAD fetches submitted in the
+        background. A blocked fetch is queued again once the controller has had retry_delay seconds
+        (doubled for each retry) to back off, up to max_retries times, after which it
+        fails with a BlockedPageError.
+
+        DATA MEMBERS
+        driver_factory  function returning a new Selenium driver, ie open_imdb_browser
+        controller      AdaptiveConcurrency object
+        drivers         [list]  a driver for each worker
+        max_retries     [int]   times a blocked fetch is retried
+        retry_delay     [float] seconds before the first retry of a blocked fetch
+        """
+    def __init__(self, driver_factory, controller=None, max_retries=3, retry_delay=10.0):
+        self.driver_factory = driver_factory
+        self.controller = controller or AdaptiveConcurrency()
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.drivers = [driver_factory() for _ in range(self.controller.max_workers)]
+        self._tasks = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._active = 0
+        self._gate = threading.Condition()
+        self._retries = set()
+        self._retry_lock = threading.Lock()
+        self._threads = []
+        for i, driver in enumerate(self.drivers):
+            thread = threading.Thread(target=self._work, args=(driver,),
+                                      name='fetch-' + str(i), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def map(self, function, items, priority=FOREGROUND):
+        """Fetches every item and returns the results in order. If a fetch raised, the
+        exception is re-raised here once all the other fetches are done"""
+        items = list(items)
+        results = [None] * len(items)
+        errors = []
+        done = threading.Semaphore(0)
+
+        def finisher(i):
+            def finish(result, error):
+                results[i] = result
+                if error is not None:
+                    errors.append(error)
+                done.release()
+            return finish
+
+        for i, item in enumerate(items):
+            self._put(priority, (function, item, finisher(i), 0))
+        for _ in items:
+            done.acquire()
+        if errors:
+            raise errors[0]
+        return results
+
+    def submit(self, function, item, callback=None, priority=LOOKAHEAD):
+        """Queues a fetch without waiting for it. callback(result, error) is called on
+        the worker thread when it finishes"""
+        self._put(priority, (function, item, callback, 0))
+
+    def _put(self, priority, task):
+        # The counter keeps fetches of the same priority in the order they were queued
+        self._tasks.put((priority, next(self._order), task))
+
+    def _work(self, driver):
+        while True:
+            # Only takes a fetch once allowed to be active, so it's the most urgent one
+            self._acquire()
+            priority, _, task = self._tasks.get()
+            if task is None:
+                self._release()
+                break
+            function, item, callback, attempts = task
+            result, error = None, None
+            start = time.monotonic()
+            try:
+                result = function(driver, item)
+                outcome = BLOCKED if getattr(result, 'blocked', False) else OK
+            except Exception as e:
+                error = e
+                outcome = TIMEOUT if isinstance(e, PageTimeout) else ERROR
+            finally:
+                self._release()
+            self.controller.record(time.monotonic() - start, outcome)
+            if outcome == BLOCKED:
+                if attempts < self.max_retries:
+                    self._retry(priority, (function, item, callback, attempts + 1))
+                    continue
+                result, error = None, BlockedPageError(
+                    "Still blocked after " + str(attempts) + " retries: " + repr(item))
+            if callback is not None:
+                callback(result, error)
+
+    def _retry(self, priority, task):
+        """Queues a blocked fetch again after its back-off, without holding up a worker"""
+        def requeue():
+            with self._retry_lock:
+                self._retries.discard(timer)
+            self._put(priority, task)
+
+        timer = threading.Timer(self.retry_delay * 2 ** (task[3] - 1), requeue)
+        timer.daemon = True
+        with self._retry_lock:
+            self._retries.add(timer)
+        timer.start()
+
+    def _acquire(self):
+        with self._gate:
+            while self._active >= self.controller.limit:
+                self._gate.wait(0.5)
+            self._active += 1
+
+    def _release(self):
+        with self._gate:
+            self._active -= 1
+            self._gate.notify_all()
+
+    def close(self):
+        """Stops the workers and quits their drivers. Blocked fetches still waiting to be
+        retried are dropped"""
+        with self._retry_lock:
+            for timer in self._retries:
+                timer.cancel()
+            self._retries.clear()
+        for _ in self._threads:
+            self._put(_STOP, None)
+        for thread in self._threads:
+            thread.join()
+        for driver in self.drivers:
+            driver.quit()
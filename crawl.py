@@ -0,0 +1,50 @@
+import imdb_to_neo4j as i2n
+import crawl_frontier
+import csv
+from datetime import date
+
+
+def write_list(path, header, taken):
+    with open(path, mode='w') as f:
+        csvwriter = csv.writer(f)
+        csvwriter.writerow(header)
+        for imdb_id, name, priority in taken:
+            csvwriter.writerow([imdb_id, name])
+
+
+def main():
+    neo_driver = i2n.open_neo4j_session()
+
+    frontier_path = input("File path of the crawl frontier (blank for crawl_frontier.json): ")
+    frontier = crawl_frontier.CrawlFrontier(frontier_path or 'crawl_frontier.json')
+    people_budget = int(input("Maximum number of people to scrape this run: ") or 0)
+    title_budget = int(input("Maximum number of titles to scrape this run: ") or 0)
+
+    with neo_driver.session() as session:
+        new_people, new_titles = frontier.refresh(session)
+    session.close()
+    print("Queued", new_people, "new people and", new_titles, "new titles")
+
+    people = frontier.take(crawl_frontier.PERSON, people_budget)
+    titles = frontier.take(crawl_frontier.TITLE, title_budget)
+    prefix = 'crawl_' + date.today().isoformat()
+    if people:
+        # Same layout as a hand-built crew list, for add_people.py and scrape_name_list.py
+        write_list(prefix + '_people.csv', ['imdb_name_id', 'full_name'], people)
+        print("\nPeople list written to", prefix + '_people.csv')
+        for imdb_id, name, priority in people:
+            print("%-12s %-30s %8.2f" % (imdb_id, name, priority))
+    if titles:
+        write_list(prefix + '_titles.csv', ['imdb_title_id', 'show_title'], titles)
+        print("\nTitle list written to", prefix + '_titles.csv')
+        for imdb_id, name, priority in titles:
+            print("%-12s %-30s %8.2f" % (imdb_id, name, priority))
+
+    # The frontier is only saved once the lists are written, so they aren't lost
+    frontier.save()
+    print("\nStill queued:", frontier.count(crawl_frontier.PERSON), "people,",
+          frontier.count(crawl_frontier.TITLE), "titles;", frontier.count_in_flight(),
+          "handed out and not scraped yet")
+
+
+main()
@@ -0,0 +1,237 @@
+import heapq
+import json
+import os
+from datetime import date, datetime
+
+FRONTIER_VERSION = 1
+
+PERSON = 'person'
+TITLE = 'title'
+
+# Days after which a scraped person or title is worth scraping again
+REVISIT_AFTER = 365
+
+# Days a handed out ID is left out of the queue while waiting for its scrape to show up
+# in the graph, after which it's assumed the scrape never happened
+IN_FLIGHT_DAYS = 14
+
+# Camera and electrical crew a season usually has, to guess how many of a show's crew
+# are still unknown
+TYPICAL_SEASON_CREW = 10
+
+
+def get_person_candidates(tx):
+    """Every person, including crew added from titles' credits who have never been
+    scraped, with the number of people they share a season with whose filmographies
+    haven't been scraped, and when their own filmography was last scraped"""
+    return tx.run("MATCH (p:Person) "
+                  "OPTIONAL MATCH (p)-[:WORKED_ON]->(:Season)<-[:WORKED_ON]-(p2:Person) "
+                  "WHERE p2 <> p AND p2.fingerprintDate IS null "
+                  "RETURN p.imdbNameID AS imdbID, p.fullName AS name, "
+                  "count(DISTINCT p2) AS reach, p.fingerprintDate AS scrapedDate ")
+
+
+def get_title_candidates(tx, typical_crew):
+    """Every show with a guess at how many of its seasons' crew are still unknown: for
+    each season, how far its known crew falls short of typical_crew"""
+    return tx.run("MATCH (sh:Show) "
+                  "OPTIONAL MATCH (se:Season)-[:SEASON_OF]->(sh) "
+                  "OPTIONAL MATCH (p:Person)-[:WORKED_ON]->(se) "
+                  "WITH sh, se, count(DISTINCT p) AS crew "
+                  "RETURN sh.imdbTitleID AS imdbID, sh.showTitle AS name, "
+                  "sh.crewScrapedDate AS scrapedDate, "
+                  "sum(CASE WHEN se IS null OR crew >= $typicalCrew THEN 0 "
+                  "    ELSE $typicalCrew - crew END) AS reach ",
+                  typicalCrew=typical_crew)
+
+
+class CrawlFrontier(object):
+    """ Persistent list of people and titles still to be scraped, so crew lists can be
+        picked from the graph instead of being built by hand.
+
+        An IMDb ID is queued at most once, and not at all while it was recently
+        visited (scraped) or is in flight. IDs that are taken are in flight until the
+        graph shows they were scraped (a person's fingerprintDate or a show's
+        crewScrapedDate, read by refresh), or until in_flight_days have passed, when
+        they can be queued again. Queued IDs are taken highest priority first, where
+
+            priority = (1 + reach) * staleness
+
+        reach estimates how much of the graph a scrape would add: for a person, how many
+        people they share a season with have never had their own filmography scraped,
+        and for a title, how many of its seasons' crew are still unknown (see
+        get_title_candidates). Scraping therefore goes to the edges of what's known
+        rather than to people and shows that are already well covered. staleness is 1
+        for IDs that have never been scraped, and for IDs that have it grows from 0.5 to
+        1 as the last scrape goes from revisit_after to twice revisit_after days old. IDs
+        scraped more recently than revisit_after days ago aren't queued at all.
+
+        The frontier is saved as JSON, written to a temporary file and renamed so an
+        interrupted save leaves the previous frontier in place.
+
+        DATA MEMBERS
+        path            [string]    file the frontier is saved to
+        revisit_after   [int]       days before a visited ID can be queued again
+        in_flight_days  [int]       days before a taken ID that wasn't scraped can be
+                                    queued again
+        queued          [dict]      IMDb ID -> [kind, name, priority]
+        visited         [dict]      IMDb ID -> date it was last scraped
+        in_flight       [dict]      IMDb ID -> date it was taken
+        """
+    def __init__(self, path, revisit_after=REVISIT_AFTER, in_flight_days=IN_FLIGHT_DAYS):
+        self.path = path
+        self.revisit_after = revisit_after
+        self.in_flight_days = in_flight_days
+        self.queued = {}
+        self.visited = {}
+        self.in_flight = {}
+        self._heaps = {PERSON: [], TITLE: []}
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path) as f:
+            state = json.load(f)
+        if state.get('version') != FRONTIER_VERSION:
+            raise ValueError("Unsupported crawl frontier version: " + str(state.get('version')))
+        self.visited = {imdb_id: date(*map(int, visited.split('-')))
+                        for imdb_id, visited in state['visited'].items()}
+        # Not in frontiers saved before IDs were kept in flight
+        self.in_flight = {imdb_id: date(*map(int, taken.split('-')))
+                          for imdb_id, taken in state.get('in_flight', {}).items()}
+        for imdb_id, (kind, name, priority) in state['queued'].items():
+            # Visited since it was queued, ie by a refresh that didn't run take()
+            if self.staleness(imdb_id):
+                self._queue(imdb_id, kind, name, priority)
+
+    def save(self):
+        state = {'version': FRONTIER_VERSION,
+                 'visited': {imdb_id: visited.isoformat()
+                             for imdb_id, visited in sorted(self.visited.items())},
+                 'in_flight': {imdb_id: taken.isoformat()
+                               for imdb_id, taken in sorted(self.in_flight.items())},
+                 'queued': dict(sorted(self.queued.items()))}
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(self.path + '.tmp', self.path)
+
+    def staleness(self, imdb_id, today=None):
+        """Returns the staleness of an ID (see the class docstring), 0 if it's too
+        recently scraped to be queued"""
+        visited = self.visited.get(imdb_id)
+        if visited is None:
+            return 1.0
+        age = ((today or date.today()) - visited).days
+        if age < self.revisit_after:
+            return 0.0
+        return 0.5 * min(2.0, age / self.revisit_after)
+
+    def add(self, kind, imdb_id, name, reach=0, scraped_date=None):
+        """
+        Queues an ID unless it's already queued, in flight or was scraped too recently.
+        An ID that's already queued has its priority raised if this one is higher.
+
+        :param kind:            PERSON or TITLE
+        :param reach:           [int]   estimate of the new crew scraping the ID would find
+        :param scraped_date:    [date]  when the ID was last scraped, if known from
+                                        outside the frontier (ie the graph)
+        :return:                True if the ID was newly queued
+        """
+        if scraped_date is not None:
+            self.mark_visited(imdb_id, scraped_date)
+        if self._in_flight(imdb_id):
+            return False
+        staleness = self.staleness(imdb_id)
+        if not staleness:
+            self.queued.pop(imdb_id, None)
+            return False
+        priority = round((1 + reach) * staleness, 3)
+        queued = self.queued.get(imdb_id)
+        if queued is not None:
+            if priority > queued[2]:
+                self._queue(imdb_id, kind, name, priority)
+            return False
+        self._queue(imdb_id, kind, name, priority)
+        return True
+
+    def _queue(self, imdb_id, kind, name, priority):
+        self.queued[imdb_id] = [kind, name, priority]
+        # Entries whose priority has since changed are skipped when popped
+        heapq.heappush(self._heaps[kind], (-priority, imdb_id))
+
+    def mark_visited(self, imdb_id, visited=None):
+        """Records that an ID was scraped, keeping the most recent date. An ID in flight
+        that was scraped since it was taken is no longer in flight, and a queued ID that's
+        now too recently scraped is no longer queued (its heap entry is skipped)."""
+        visited = visited or date.today()
+        if imdb_id not in self.visited or self.visited[imdb_id] < visited:
+            self.visited[imdb_id] = visited
+        if imdb_id in self.queued and not self.staleness(imdb_id):
+            del self.queued[imdb_id]
+        if imdb_id in self.in_flight and self.in_flight[imdb_id] <= visited:
+            del self.in_flight[imdb_id]
+
+    def _in_flight(self, imdb_id, today=None):
+        taken = self.in_flight.get(imdb_id)
+        if taken is None:
+            return False
+        if ((today or date.today()) - taken).days < self.in_flight_days:
+            return True
+        # The scrape it was taken for never reached the graph
+        del self.in_flight[imdb_id]
+        return False
+
+    def take(self, kind, budget):
+        """
+        Removes up to budget of the highest priority IDs of a kind from the queue and
+        puts them in flight. They're marked visited once refresh finds them scraped.
+
+        :return:    list of (imdb_id, name, priority)
+        """
+        heap = self._heaps[kind]
+        taken = []
+        while heap and len(taken) < budget:
+            priority, imdb_id = heapq.heappop(heap)
+            queued = self.queued.get(imdb_id)
+            if queued is None or queued[0] != kind or queued[2] != -priority:
+                continue
+            del self.queued[imdb_id]
+            self.in_flight[imdb_id] = date.today()
+            taken.append((imdb_id, queued[1], queued[2]))
+        return taken
+
+    def count(self, kind):
+        return sum(1 for queued in self.queued.values() if queued[0] == kind)
+
+    def count_in_flight(self):
+        return len(self.in_flight)
+
+    def refresh(self, session):
+        """
+        Queues the people and shows in the graph, scored by how much unknown crew they
+        lead to and how long ago they were scraped.
+
+        :return:    (number of people newly queued, number of titles newly queued)
+        """
+        new_people = 0
+        for record in session.read_transaction(get_person_candidates):
+            if record['imdbID']:
+                new_people += self.add(PERSON, record['imdbID'], record['name'],
+                                       record['reach'], _to_date(record['scrapedDate']))
+        new_titles = 0
+        for record in session.read_transaction(get_title_candidates, TYPICAL_SEASON_CREW):
+            if record['imdbID']:
+                new_titles += self.add(TITLE, record['imdbID'], record['name'],
+                                       record['reach'], _to_date(record['scrapedDate']))
+        return new_people, new_titles
+
+
+def _to_date(value):
+    """Converts a neo4j Date/DateTime or a python date/datetime to a date"""
+    if value is None:
+        return None
+    if hasattr(value, 'to_native'):
+        value = value.to_native()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
@@ -0,0 +1,144 @@
+import json
+import sqlite3
+import zlib
+
+import imdb_to_neo4j as i2n
+
+# Layout of the stored credits
+CACHE_VERSION = 2
+
+
+class CachedCredit(object):
+    """ A credit read back from a CreditCache, with the same data members as the
+        Credit it was stored from that scrape_name_list.py writes out
+
+        DATA MEMBERS
+        title           [string]    show title
+        imdb_title_id   [string]    show imdb title id
+        show_type       [string]    show type ie, 'Feature Film', 'TV Series'
+        job_class       [string]    job class ie 'camera department', 'cinematographer'
+        job_title       [string]    specific job title
+        first_year      [string]    first year credited
+        last_year       [string]    last year credited
+        genre_list      [str list]  genres of the title (only if no seasons)
+        season_list     list of Season objects, with their job titles, genres and years
+        """
+    __slots__ = ('title', 'imdb_title_id', 'show_type', 'job_class', 'job_title',
+                 'first_year', 'last_year', 'genre_list', 'season_list')
+
+    def __init__(self, title, imdb_title_id, show_type, job_class, job_title, first_year,
+                 last_year, genre_list, season_list):
+        self.title = title
+        self.imdb_title_id = imdb_title_id
+        self.show_type = i2n.intern_string(show_type)
+        self.job_class = i2n.intern_string(job_class)
+        self.job_title = i2n.intern_string(job_title)
+        self.first_year = first_year
+        self.last_year = last_year
+        self.genre_list = i2n.intern_genres(genre_list)
+        self.season_list = season_list
+
+
+def _season_to_list(season):
+    first_year = int(season.rough_start[:4]) if season.rough_start else None
+    last_year = int(season.rough_end[:4]) if season.rough_end else None
+    return [season.season_num, first_year, last_year, season.job_title_list, season.genre_list]
+
+
+def _season_from_list(values, imdb_title_id, show_title):
+    season_num, first_year, last_year, job_title_list, genre_list = values
+    season = i2n.Season(imdb_title_id, season_num, show_title)
+    if first_year is not None:
+        season.add_air_year(first_year)
+        season.add_air_year(last_year)
+    season.job_title_list = [i2n.intern_string(job) for job in job_title_list]
+    season.genre_list = i2n.intern_genres(genre_list)
+    return season
+
+
+def _credit_to_list(credit):
+    return [credit.title, credit.imdb_title_id, credit.show_type, credit.job_class,
+            credit.job_title, credit.first_year, credit.last_year, credit.genre_list,
+            [_season_to_list(season) for season in credit.season_list]]
+
+
+def _credit_from_list(values):
+    title, imdb_title_id = values[0], values[1]
+    seasons = [_season_from_list(season, imdb_title_id, title) for season in values[8]]
+    return CachedCredit(*(values[:8] + [seasons]))
+
+
+class CreditCache(object):
+    """ The credits parsed from each person's name page, so they can be written out
+        again without loading and parsing the page's credits and episodes.
+
+        Entries are kept in an SQLite file, one per person, as zlib-compressed JSON. An
+        entry is only used if the person's filmography fingerprint (see
+        NamePage.filmography_fingerprint) is the same as when it was written, and it was
+        written by the same parser version (imdb_parsing.PARSER_VERSION). The rest of a
+        live page changes from one load to the next, but the fingerprint only changes with
+        the credits, so a person whose credits have changed is parsed again and their entry
+        replaced.
+
+        DATA MEMBERS
+        path            [string]    SQLite file of the cache
+        parser_version  [int]       parser version entries must have been written by
+        hits            [int]       people whose credits came from the cache
+        misses          [int]       people looked up who had no usable entry
+        """
+    def __init__(self, path, parser_version=None):
+        self.path = path
+        self.parser_version = parser_version or i2n.PARSER_VERSION
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(credits)")]
+        if columns and 'fingerprint' not in columns:
+            # Keyed on a hash of the whole page, so none of its entries could be used
+            self.connection.execute("DROP TABLE credits")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS credits ("
+                                "imdb_name_id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                                "parser_version INTEGER NOT NULL, "
+                                "cache_version INTEGER NOT NULL, data BLOB NOT NULL)")
+        self.connection.commit()
+
+    def get(self, imdb_name_id, fingerprint):
+        """
+        :param fingerprint:     the person's filmography fingerprint
+        :return:                list of CachedCredit stored for the person, or None
+        """
+        row = self.connection.execute(
+            "SELECT data FROM credits WHERE imdb_name_id = ? AND fingerprint = ? "
+            "AND parser_version = ? AND cache_version = ?",
+            (imdb_name_id, fingerprint, self.parser_version, CACHE_VERSION)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        credits = json.loads(zlib.decompress(row[0]).decode('utf-8'))
+        return [_credit_from_list(credit) for credit in credits]
+
+    def has(self, imdb_name_id, fingerprint):
+        """True if get() would return the person's credits, without counting as a lookup"""
+        return self.connection.execute(
+            "SELECT 1 FROM credits WHERE imdb_name_id = ? AND fingerprint = ? "
+            "AND parser_version = ? AND cache_version = ?",
+            (imdb_name_id, fingerprint, self.parser_version, CACHE_VERSION)).fetchone() is not None
+
+    def put(self, imdb_name_id, fingerprint, credit_list):
+        data = json.dumps([_credit_to_list(credit) for credit in credit_list],
+                          separators=(',', ':'))
+        # Committed straight away, so a failed run keeps what it had parsed
+        self.connection.execute("INSERT OR REPLACE INTO credits VALUES (?, ?, ?, ?, ?)",
+                                (imdb_name_id, fingerprint, self.parser_version, CACHE_VERSION,
+                                 zlib.compress(data.encode('utf-8'))))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,236 @@
+from datetime import date
+import gzip
+import json
+import os
+import re
+import struct
+
+import imdb_to_neo4j as i2n
+
+MAGIC = b'I2NR'
+VERSION = 1
+EXTENSION = '.crec'
+
+FIELDS = ['name', 'name_id', 'job_class', 'job_title', 'first_year', 'last_year',
+          'show_title', 'title_id', 'season', 'show_type', 'show_genres']
+
+_LENGTH = struct.Struct('>I')
+
+# Written next to a results csv or credit records file, see FingerprintWriter
+FINGERPRINTS_SUFFIX = '_fingerprints.jsonl'
+
+
+class CreditRecordError(Exception):
+    pass
+
+
+def _encode_value(value):
+    # Dates are the only type JSON doesn't have, so they're tagged objects
+    if isinstance(value, date):
+        return {'date': value.isoformat()}
+    raise TypeError("Can't store " + type(value).__name__ + " in a credit record")
+
+
+def _decode_object(value):
+    if 'date' in value:
+        return date(*map(int, value['date'].split('-')))
+    return value
+
+
+_encoder = json.JSONEncoder(separators=(',', ':'), default=_encode_value)
+_decoder = json.JSONDecoder(object_hook=_decode_object)
+
+
+class CreditRecordWriter(object):
+    """ Writes credit rows (lists of values in FIELDS order) to a credit records file, a
+        typed alternative to the results csv written by scrape_name_list.py.
+
+        A credit records file is a gzip stream containing a header listing the fields
+        followed by one record per row. The header and every record are length-prefixed
+        (4-byte big-endian length) JSON arrays, so years and season numbers stay ints,
+        genres stay lists and dates stay dates, and read_credit_records can stream the
+        file one record at a time.
+        """
+    def __init__(self, path, fields=None):
+        self.path = path
+        self.fields = fields or FIELDS
+        self.file = gzip.open(path, 'wb')
+        self.file.write(MAGIC + bytes([VERSION]))
+        self._write(self.fields)
+
+    def _write(self, values):
+        data = _encoder.encode(values).encode('utf-8')
+        self.file.write(_LENGTH.pack(len(data)))
+        self.file.write(data)
+
+    def write(self, row):
+        if len(row) != len(self.fields):
+            raise CreditRecordError("Expected " + str(len(self.fields)) + " values, got " +
+                                    str(len(row)))
+        self._write(row)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_credit_records(path):
+    """
+    Streams the rows of a credit records file.
+
+    :return:    generator of tuples of values in the order of the file's fields
+    """
+    with gzip.open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise CreditRecordError(path + " is not a credit records file")
+        version = f.read(1)[0]
+        if version != VERSION:
+            raise CreditRecordError("Unsupported credit records version: " + str(version))
+        fields = _read(f)
+        if fields is None:
+            raise CreditRecordError(path + " has no header")
+        while True:
+            row = _read(f)
+            if row is None:
+                break
+            yield tuple(row)
+
+
+def _read(f):
+    prefix = f.read(_LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) < _LENGTH.size:
+        raise CreditRecordError("Truncated credit record")
+    length = _LENGTH.unpack(prefix)[0]
+    data = f.read(length)
+    if len(data) < length:
+        raise CreditRecordError("Truncated credit record")
+    return _decoder.decode(data.decode('utf-8'))
+
+
+def fingerprints_path(results_path):
+    """Path of the fingerprints file that goes with a results csv or credit records file"""
+    return os.path.splitext(results_path)[0] + FINGERPRINTS_SUFFIX
+
+
+class FingerprintWriter(object):
+    """ Writes the filmography fingerprints of the people in a results file to a file of
+        their own, one JSON object per line, so add_worked_on.py can store them in neo4j
+        once the people's rows are loaded. Until then a refresh run scrapes them again.
+
+        Each person is written and flushed as soon as their rows are, so the file of an
+        interrupted scrape matches its results.
+        """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w')
+
+    def write(self, person, filmography_fingerprint, fingerprints):
+        self.file.write(json.dumps({'name_id': person.imdb_name_id, 'name': person.full_name,
+                                    'filmography': filmography_fingerprint,
+                                    'credits': fingerprints}, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_fingerprints(path):
+    """
+    :return:    list of (Person, filmography fingerprint, dict of credit fingerprints) in
+                a fingerprints file, empty if there isn't one
+    """
+    if not os.path.exists(path):
+        return []
+    fingerprints = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                values = json.loads(line)
+                fingerprints.append((i2n.Person(values['name_id'], values['name']),
+                                     values['filmography'], values['credits']))
+    return fingerprints
+
+
+def to_int(value):
+    """Converts a scraped year or season number to an int, or None if there isn't one"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def typed_row(row):
+    """Converts a results csv row to the typed values stored in a credit records file"""
+    typed = list(row)
+    for i in (4, 5, 8):
+        typed[i] = to_int(row[i])
+    typed[10] = list(row[10] or [])
+    return typed
+
+
+def is_tv_series(show_type):
+    """True for the show types that results rows are written for, ie 'TV Series' and
+    'TV Mini Series'. add_worked_on.py makes a Show of every title in the results"""
+    return bool(re.match("TV", show_type) and re.search("Series", show_type))
+
+
+def credit_rows(crew, credit):
+    """
+    The results csv rows for a credit: for a TV series, one per season and job title if
+    its seasons are known, otherwise one for the whole show. Other credits have no rows.
+
+    :param crew:    Person object
+    :param credit:  Credit object
+    :return:        list of rows, each a list of values in FIELDS order
+    """
+    rows = []
+    if not is_tv_series(credit.show_type):
+        return rows
+    if credit.season_list:
+        for season in credit.season_list:
+            if ((credit.first_year and credit.last_year) or
+                    season.rough_start and season.rough_end):
+                for job in season.job_title_list:
+                    rows.append([
+                        crew.full_name,
+                        crew.imdb_name_id,
+                        i2n.to_caps(credit.job_class),
+                        i2n.to_caps(job),
+                        credit.first_year,
+                        credit.last_year,
+                        credit.title,
+                        credit.imdb_title_id,
+                        str(season.season_num),
+                        credit.show_type,
+                        season.genre_list,
+                    ])
+    else:
+        rows.append([
+            crew.full_name,
+            crew.imdb_name_id,
+            i2n.to_caps(credit.job_class),
+            i2n.to_caps(credit.job_title),
+            credit.first_year,
+            credit.last_year,
+            credit.title,
+            credit.imdb_title_id,
+            None,
+            credit.show_type,
+            credit.genre_list,
+        ])
+    return rows
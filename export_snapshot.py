@@ -0,0 +1,15 @@
+import imdb_to_neo4j as i2n
+import graph_snapshot
+
+
+def main():
+    neo_driver = i2n.open_neo4j_session()
+    directory = input("Directory for the snapshot: ")
+    counts = graph_snapshot.export_snapshot(neo_driver, directory)
+    print("Snapshot written to", directory)
+    print("WORKED_ON (season) edges:", counts['worked_on_season_person'])
+    print("WORKED_ON (show) edges:  ", counts['worked_on_show_person'])
+    print("WORKED_WITH edges:       ", counts['worked_with_person1'])
+
+
+main()
@@ -0,0 +1,289 @@
+from array import array
+import json
+import mmap
+import os
+import sys
+from datetime import datetime
+
+SNAPSHOT_VERSION = 1
+PAGE_SIZE = 5000
+
+# Column name -> array typecode. Node ids in edge columns are indexes into the
+# corresponding id list (people.json, seasons.json, shows.json, job_titles.json)
+COLUMNS = {
+    'season_show': 'i',             # show index of each season, -1 if unknown
+    'season_start': 'h',            # year of roughStart, 0 if unknown
+    'season_end': 'h',              # year of roughEnd, 0 if unknown
+    'worked_on_season_person': 'i',
+    'worked_on_season_season': 'i',
+    'worked_on_season_job': 'i',
+    'worked_on_show_person': 'i',
+    'worked_on_show_show': 'i',
+    'worked_on_show_job': 'i',
+    'worked_with_person1': 'i',
+    'worked_with_person2': 'i',
+    'worked_with_seasons': 'i',     # seasons_in_common
+    'worked_with_start': 'h',       # year of startDate, 0 if unknown
+    'worked_with_end': 'h',         # year of endDate, 0 if unknown
+}
+
+
+def get_person_page(tx, after, limit):
+    return tx.run("MATCH (p:Person) WHERE id(p) > $after "
+                  "RETURN id(p) AS nodeID, p.imdbNameID AS imdbNameID, p.fullName AS fullName "
+                  "ORDER BY nodeID LIMIT $limit",
+                  after=after, limit=limit)
+
+
+def get_show_page(tx, after, limit):
+    return tx.run("MATCH (sh:Show) WHERE id(sh) > $after "
+                  "RETURN id(sh) AS nodeID, sh.imdbTitleID AS imdbTitleID, "
+                  "sh.showTitle AS showTitle "
+                  "ORDER BY nodeID LIMIT $limit",
+                  after=after, limit=limit)
+
+
+def get_season_page(tx, after, limit):
+    return tx.run("MATCH (se:Season) WHERE id(se) > $after "
+                  "RETURN id(se) AS nodeID, se.imdbSeasonID AS imdbSeasonID, "
+                  "se.seasonTitle AS seasonTitle, se.roughStart.year AS startYear, "
+                  "se.roughEnd.year AS endYear, "
+                  "[(se)-[:SEASON_OF]->(sh:Show) | sh.imdbTitleID][0] AS imdbTitleID "
+                  "ORDER BY nodeID LIMIT $limit",
+                  after=after, limit=limit)
+
+
+def get_person_edge_page(tx, after, limit):
+    """Returns the WORKED_ON and outgoing WORKED_WITH edges of a page of people.
+    Paging by person keeps every page an id seek rather than a relationship scan"""
+    return tx.run("MATCH (p:Person) WHERE id(p) > $after "
+                  "WITH p ORDER BY id(p) LIMIT $limit "
+                  "RETURN id(p) AS nodeID, p.imdbNameID AS imdbNameID, "
+                  "[(p)-[r:WORKED_ON]->(se:Season) | [se.imdbSeasonID, r.jobTitle]] AS seasons, "
+                  "[(p)-[r:WORKED_ON]->(sh:Show) | [sh.imdbTitleID, r.jobTitle]] AS shows, "
+                  "[(p)-[r:WORKED_WITH]->(p2:Person) | [p2.imdbNameID, r.seasons_in_common, "
+                  "r.startDate.year, r.endDate.year]] AS workedWith "
+                  "ORDER BY nodeID",
+                  after=after, limit=limit)
+
+
+def _read_pages(session, transaction, page_size):
+    """Yields the records of a paged read query one page at a time"""
+    after = -1
+    while True:
+        records = list(session.read_transaction(transaction, after, page_size))
+        if not records:
+            break
+        yield records
+        after = records[-1]['nodeID']
+
+
+class _ColumnWriter(object):
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {name: open(os.path.join(directory, name + '.bin'), 'wb')
+                      for name in COLUMNS}
+        self.counts = {name: 0 for name in COLUMNS}
+
+    def append(self, name, values):
+        if values:
+            array(COLUMNS[name], values).tofile(self.files[name])
+            self.counts[name] += len(values)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+class _Encoder(object):
+    """Assigns consecutive integers to string identifiers"""
+    def __init__(self):
+        self.index = {}
+        self.ids = []
+        self.names = []
+
+    def add(self, identifier, name=None):
+        if identifier not in self.index:
+            self.index[identifier] = len(self.ids)
+            self.ids.append(identifier)
+            self.names.append(name)
+        return self.index[identifier]
+
+    def get(self, identifier):
+        return self.index.get(identifier, -1)
+
+
+def export_snapshot(neo_driver, directory, page_size=PAGE_SIZE):
+    """
+    Streams Person, Season and Show nodes and WORKED_ON/WORKED_WITH edges out of
+    neo4j a page at a time and writes them to a columnar snapshot in directory.
+
+    :param neo_driver:  neo4j driver
+    :param directory:   directory to write the snapshot to (created if necessary)
+    :param page_size:   number of nodes read per transaction
+    :return:            dict of row counts per column
+    """
+    os.makedirs(directory, exist_ok=True)
+    people = _Encoder()
+    shows = _Encoder()
+    seasons = _Encoder()
+    jobs = _Encoder()
+    columns = _ColumnWriter(directory)
+    try:
+        with neo_driver.session() as session:
+            for records in _read_pages(session, get_person_page, page_size):
+                for record in records:
+                    if record['imdbNameID']:
+                        people.add(record['imdbNameID'], record['fullName'])
+                print("Exported", len(people.ids), "people")
+
+            for records in _read_pages(session, get_show_page, page_size):
+                for record in records:
+                    if record['imdbTitleID']:
+                        shows.add(record['imdbTitleID'], record['showTitle'])
+                print("Exported", len(shows.ids), "shows")
+
+            for records in _read_pages(session, get_season_page, page_size):
+                season_show, season_start, season_end = [], [], []
+                for record in records:
+                    if record['imdbSeasonID'] and record['imdbSeasonID'] not in seasons.index:
+                        seasons.add(record['imdbSeasonID'], record['seasonTitle'])
+                        season_show.append(shows.get(record['imdbTitleID']))
+                        season_start.append(record['startYear'] or 0)
+                        season_end.append(record['endYear'] or 0)
+                columns.append('season_show', season_show)
+                columns.append('season_start', season_start)
+                columns.append('season_end', season_end)
+                print("Exported", len(seasons.ids), "seasons")
+
+            for records in _read_pages(session, get_person_edge_page, page_size):
+                _append_edges(records, columns, people, seasons, shows, jobs)
+                print("Exported edges for", records[-1]['imdbNameID'])
+    finally:
+        columns.close()
+
+    for name, encoder in (('people', people), ('seasons', seasons), ('shows', shows),
+                          ('job_titles', jobs)):
+        with open(os.path.join(directory, name + '.json'), 'w') as f:
+            json.dump({'ids': encoder.ids, 'names': encoder.names}, f)
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'created': datetime.now().isoformat(),
+        'byteorder': sys.byteorder,
+        'columns': {name: {'typecode': typecode, 'length': columns.counts[name]}
+                    for name, typecode in COLUMNS.items()},
+    }
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return columns.counts
+
+
+def _append_edges(records, columns, people, seasons, shows, jobs):
+    edges = {name: [] for name in COLUMNS if name.startswith('worked_')}
+    for record in records:
+        person = people.get(record['imdbNameID'])
+        if person < 0:
+            continue
+        for imdb_season_id, job_title in record['seasons']:
+            season = seasons.get(imdb_season_id)
+            if season >= 0:
+                edges['worked_on_season_person'].append(person)
+                edges['worked_on_season_season'].append(season)
+                edges['worked_on_season_job'].append(jobs.add(job_title or ''))
+        for imdb_title_id, job_title in record['shows']:
+            show = shows.get(imdb_title_id)
+            if show >= 0:
+                edges['worked_on_show_person'].append(person)
+                edges['worked_on_show_show'].append(show)
+                edges['worked_on_show_job'].append(jobs.add(job_title or ''))
+        for imdb_name_id, seasons_in_common, start_year, end_year in record['workedWith']:
+            person2 = people.get(imdb_name_id)
+            if person2 >= 0:
+                edges['worked_with_person1'].append(person)
+                edges['worked_with_person2'].append(person2)
+                edges['worked_with_seasons'].append(seasons_in_common or 0)
+                edges['worked_with_start'].append(start_year or 0)
+                edges['worked_with_end'].append(end_year or 0)
+    for name, values in edges.items():
+        columns.append(name, values)
+
+
+class Snapshot(object):
+    """ A columnar graph snapshot written by export_snapshot.
+
+        Columns are memory-mapped read-only and exposed as typed memoryviews, so
+        opening a snapshot costs next to nothing until the data is used.
+
+        DATA MEMBERS
+        directory       [string]        snapshot directory
+        manifest        [dict]          snapshot metadata (version, creation time, columns)
+        people          [str list]      imdbNameID of each person, by person index
+        person_names    [str list]      full name of each person, by person index
+        seasons         [str list]      imdbSeasonID of each season, by season index
+        season_titles   [str list]      season title of each season, by season index
+        shows           [str list]      imdbTitleID of each show, by show index
+        show_titles     [str list]      show title of each show, by show index
+        job_titles      [str list]      job titles, by job index
+        """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest['version'] != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported snapshot version: " + str(self.manifest['version']))
+        self.people, self.person_names = self._load_ids('people')
+        self.seasons, self.season_titles = self._load_ids('seasons')
+        self.shows, self.show_titles = self._load_ids('shows')
+        self.job_titles = self._load_ids('job_titles')[0]
+        self._mmaps = []
+        self._columns = {}
+        self._person_index = None
+
+    def _load_ids(self, name):
+        with open(os.path.join(self.directory, name + '.json')) as f:
+            data = json.load(f)
+        return data['ids'], data['names']
+
+    def column(self, name):
+        """Returns the named column as a read-only sequence of ints"""
+        if name not in self._columns:
+            self._columns[name] = self._map_column(name)
+        return self._columns[name]
+
+    def _map_column(self, name):
+        typecode = self.manifest['columns'][name]['typecode']
+        path = os.path.join(self.directory, name + '.bin')
+        if self.manifest['columns'][name]['length'] == 0:
+            return array(typecode)
+        if self.manifest['byteorder'] != sys.byteorder:
+            # Snapshot was written on a machine of the other endianness
+            values = array(typecode)
+            with open(path, 'rb') as f:
+                values.frombytes(f.read())
+            values.byteswap()
+            return values
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmaps.append(mapped)
+        return memoryview(mapped).cast(typecode)
+
+    def person_index(self, imdb_name_id):
+        """Returns the index of the person with the given imdbNameID, or -1"""
+        if self._person_index is None:
+            self._person_index = {imdb_name_id: i for i, imdb_name_id in enumerate(self.people)}
+        return self._person_index.get(imdb_name_id, -1)
+
+    def close(self):
+        for column in self._columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        self._columns = {}
+        for mapped in self._mmaps:
+            mapped.close()
+        self._mmaps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
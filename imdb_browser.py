@@ -0,0 +1,137 @@
+"""
+Browser layer: open_imdb_browser, which logs in to IMDb in Chrome.
+
+Selenium and config are only imported when a browser is opened. Page loads that time out
+raise PageTimeout, so the parsing layer can handle them without importing Selenium.
+"""
+import os
+from replay import ReplayDriver, RecordingDriver
+
+IMDB_SIGNIN_URL = 'https://www.imdb.com/registration/signin'
+
+# Offline runs: serve pages from a directory of saved HTML instead of a browser, or save
+# every page a browser loads
+REPLAY_DIR_VARIABLE = 'IMDB_TO_NEO4J_REPLAY_DIR'
+RECORD_DIR_VARIABLE = 'IMDB_TO_NEO4J_RECORD_DIR'
+
+
+class PageTimeout(Exception):
+    """Raised by the drivers open_imdb_browser returns when a page takes too long to load"""
+
+
+class BrowserDriver(object):
+    """ Wraps a Selenium driver so that get() and refresh() raise PageTimeout instead of
+        Selenium's TimeoutException. Everything else is passed through to the wrapped
+        driver.
+
+        DATA MEMBERS
+        driver              Selenium driver
+        timeout_exception   Selenium's TimeoutException class
+        """
+    def __init__(self, driver, timeout_exception):
+        self.driver = driver
+        self.timeout_exception = timeout_exception
+
+    def get(self, url):
+        try:
+            self.driver.get(url)
+        except self.timeout_exception as e:
+            raise PageTimeout(url) from e
+
+    def refresh(self):
+        try:
+            self.driver.refresh()
+        except self.timeout_exception as e:
+            raise PageTimeout(self.driver.current_url) from e
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+def open_imdb_browser():
+    replay_dir = os.environ.get(REPLAY_DIR_VARIABLE)
+    if replay_dir:
+        return ReplayDriver(replay_dir)
+    from selenium import webdriver
+    from selenium.common.exceptions import TimeoutException
+    import config
+
+    find_radio = '''
+        settingsUI = document.getElementsByTagName('settings-ui')[0]
+        settingsMain = settingsUI.shadowRoot.getElementById('main')
+        settingsBasicPage = settingsMain.shadowRoot.querySelector('settings-basic-page')
+        settingsPrivacyPage = settingsBasicPage.shadowRoot.querySelector('settings-privacy-page')
+        radioGroup = settingsPrivacyPage.shadowRoot.querySelector('settings-category-default-radio-group')
+        disabledRadioOption = radioGroup.shadowRoot.getElementById('disabledRadioOption')
+        disc = disabledRadioOption.shadowRoot.querySelector('.disc-border')
+        return disc
+        '''
+    # Set Chrome preferences
+    chrome_options = webdriver.ChromeOptions()
+    prefs = {
+        'profile.default_content_settings':
+        {
+            'cookies': 2
+        },
+             }
+    chrome_options.add_experimental_option('prefs', prefs)
+    chrome_options.add_argument('--enable-automation')
+
+    # Instantiate webdriver and navigate to IMDB registration/login page
+    driver = webdriver.Chrome(options=chrome_options)
+
+    j = 5
+    while j > 0:
+        try:
+            driver.get(IMDB_SIGNIN_URL)
+            break
+        except TimeoutException:
+            driver.refresh()
+            j -= 1
+
+    # Click on "Sign in with IMDb" button
+    si = driver.find_element_by_link_text('Sign in with IMDb')
+    si.click()
+
+    # Log in to IMDBPro account
+    email = config.imdb_username
+    password = config.imdb_password
+
+    un = driver.find_element_by_id('ap_email')
+    un.send_keys(email)
+
+    ps = driver.find_element_by_id('ap_password')
+    ps.send_keys(password)
+
+    li = driver.find_element_by_id('signInSubmit')
+    li.click()
+
+    pause = input("Hit enter to continue: ")
+
+    j = 5
+    while j > 0:
+        try:
+            driver.get('chrome://settings/content/javascript')
+            break
+        except TimeoutException:
+            driver.refresh()
+            j -= 1
+
+    driver.execute_script(find_radio).click()
+
+    j = 5
+    while j > 0:
+        try:
+            driver.get('chrome://settings/content/images')
+            break
+        except TimeoutException:
+            driver.refresh()
+            j -= 1
+
+    driver.execute_script(find_radio).click()
+
+    driver = BrowserDriver(driver, TimeoutException)
+    record_dir = os.environ.get(RECORD_DIR_VARIABLE)
+    if record_dir:
+        return RecordingDriver(driver, record_dir)
+    return driver
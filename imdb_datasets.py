@@ -0,0 +1,244 @@
+from array import array
+import bisect
+import gzip
+import json
+import mmap
+import os
+import sys
+from datetime import datetime
+
+LOOKUP_VERSION = 1
+
+# Column name -> array typecode. Rows are sorted by episode; the by_parent columns
+# list the same rows again sorted by show, for looking up a show's episodes
+COLUMNS = {
+    'episode': 'I',         # episode imdbTitleID as an int (tt0123456 -> 123456)
+    'parent': 'I',          # show imdbTitleID as an int
+    'season': 'h',          # season number, 0 if unknown
+    'episode_num': 'i',     # episode number, 0 if unknown
+    'year': 'h',            # year the episode aired, 0 if unknown
+    'genres': 'I',          # bit i set if the episode has genre i of the manifest's genres
+    'by_parent_parent': 'I',
+    'by_parent_row': 'I',
+}
+
+NULL = '\\N'
+
+
+def title_id_to_int(imdb_title_id):
+    return int(imdb_title_id[2:])
+
+
+def int_to_title_id(number):
+    return 'tt' + str(number).zfill(7)
+
+
+def _to_int(value):
+    return 0 if value == NULL else int(value)
+
+
+def _read_tsv(path):
+    """Streams the rows of a gzipped IMDb dataset file as lists of strings, without
+    the header row"""
+    with gzip.open(path, 'rt', encoding='utf-8', newline='\n') as f:
+        next(f)
+        for line in f:
+            yield line.rstrip('\n').split('\t')
+
+
+def build_episode_lookup(episode_path, basics_path, directory):
+    """
+    Builds an episode lookup from IMDb's title.episode.tsv.gz and title.basics.tsv.gz
+    dataset files (https://datasets.imdbws.com/). Both files are streamed, so only the
+    lookup's own columns are held in memory.
+
+    :param episode_path:    path of title.episode.tsv.gz
+    :param basics_path:     path of title.basics.tsv.gz
+    :param directory:       directory to write the lookup to (created if necessary)
+    :return:                number of episodes in the lookup
+    """
+    os.makedirs(directory, exist_ok=True)
+    columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+    episodes = columns['episode']
+    in_order = True
+    for tconst, parent_tconst, season_number, episode_number in _read_tsv(episode_path):
+        number = title_id_to_int(tconst)
+        if episodes and number <= episodes[-1]:
+            in_order = False
+        episodes.append(number)
+        columns['parent'].append(title_id_to_int(parent_tconst))
+        columns['season'].append(_to_int(season_number))
+        columns['episode_num'].append(_to_int(episode_number))
+    print("Read", len(episodes), "episodes")
+
+    if not in_order:
+        # The dumps are published in tconst order, so this is only a fallback
+        order = sorted(range(len(episodes)), key=episodes.__getitem__)
+        for name in ('episode', 'parent', 'season', 'episode_num'):
+            column = columns[name]
+            columns[name] = array(COLUMNS[name], (column[i] for i in order))
+        episodes = columns['episode']
+
+    genres = []
+    genre_bits = {}
+    years = columns['year']
+    genre_masks = columns['genres']
+    years.extend([0] * len(episodes))
+    genre_masks.extend([0] * len(episodes))
+    for row in _read_tsv(basics_path):
+        if row[1] != 'tvEpisode':
+            continue
+        number = title_id_to_int(row[0])
+        i = bisect.bisect_left(episodes, number)
+        if i == len(episodes) or episodes[i] != number:
+            continue
+        years[i] = _to_int(row[5])
+        mask = 0
+        if row[8] != NULL:
+            for genre in row[8].split(','):
+                if genre not in genre_bits:
+                    if len(genres) == 32:
+                        raise ValueError("Too many genres to encode: " + genre)
+                    genre_bits[genre] = 1 << len(genres)
+                    genres.append(genre)
+                mask |= genre_bits[genre]
+        genre_masks[i] = mask
+
+    parents = columns['parent']
+    order = sorted(range(len(episodes)), key=parents.__getitem__)
+    columns['by_parent_parent'] = array('I', (parents[i] for i in order))
+    columns['by_parent_row'] = array('I', order)
+
+    for name, values in columns.items():
+        with open(os.path.join(directory, name + '.bin'), 'wb') as f:
+            values.tofile(f)
+    manifest = {
+        'version': LOOKUP_VERSION,
+        'created': datetime.now().isoformat(),
+        'byteorder': sys.byteorder,
+        'genres': genres,
+        'columns': {name: {'typecode': typecode, 'length': len(columns[name])}
+                    for name, typecode in COLUMNS.items()},
+    }
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return len(episodes)
+
+
+class EpisodeRecord(object):
+    """ An episode as given in the IMDb datasets
+
+        DATA MEMBERS
+        imdb_episode_id [string]    imdbTitleID of the episode
+        imdb_title_id   [string]    imdbTitleID of the show
+        season_num      [int]       season number, None if unknown
+        episode_num     [int]       episode number, None if unknown
+        year            [int]       year the episode aired, None if unknown
+        genre_list      [str list]  genres of the episode
+        """
+    __slots__ = ('imdb_episode_id', 'imdb_title_id', 'season_num', 'episode_num', 'year',
+                 'genre_list')
+
+    def __init__(self, imdb_episode_id, imdb_title_id, season_num, episode_num, year,
+                 genre_list):
+        self.imdb_episode_id = imdb_episode_id
+        self.imdb_title_id = imdb_title_id
+        self.season_num = season_num
+        self.episode_num = episode_num
+        self.year = year
+        self.genre_list = genre_list
+
+
+class EpisodeLookup(object):
+    """ Season, episode number, year and genres of every episode on IMDb, from a lookup
+        written by build_episode_lookup, so episodes can be placed in seasons without
+        loading their pages.
+
+        Columns are memory-mapped read-only and searched by bisection, so opening a
+        lookup costs next to nothing and each lookup touches only a few pages of it.
+
+        DATA MEMBERS
+        directory       [string]    lookup directory
+        manifest        [dict]      lookup metadata (version, creation time, columns)
+        genres          [str list]  genre names, by bit in the genres column
+        """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest['version'] != LOOKUP_VERSION:
+            raise ValueError("Unsupported episode lookup version: " +
+                             str(self.manifest['version']))
+        self.genres = self.manifest['genres']
+        self._mmaps = []
+        self._columns = {name: self._map_column(name) for name in COLUMNS}
+        self._genre_lists = {}
+
+    def _map_column(self, name):
+        typecode = self.manifest['columns'][name]['typecode']
+        path = os.path.join(self.directory, name + '.bin')
+        if self.manifest['columns'][name]['length'] == 0:
+            return array(typecode)
+        if self.manifest['byteorder'] != sys.byteorder:
+            # Lookup was written on a machine of the other endianness
+            values = array(typecode)
+            with open(path, 'rb') as f:
+                values.frombytes(f.read())
+            values.byteswap()
+            return values
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmaps.append(mapped)
+        return memoryview(mapped).cast(typecode)
+
+    def __len__(self):
+        return len(self._columns['episode'])
+
+    def _genre_list(self, mask):
+        # Few distinct combinations occur, so each list is built once and shared
+        if mask not in self._genre_lists:
+            self._genre_lists[mask] = [sys.intern(genre) for bit, genre in enumerate(self.genres)
+                                       if mask & (1 << bit)]
+        return self._genre_lists[mask]
+
+    def _record(self, row):
+        columns = self._columns
+        return EpisodeRecord(int_to_title_id(columns['episode'][row]),
+                             int_to_title_id(columns['parent'][row]),
+                             columns['season'][row] or None,
+                             columns['episode_num'][row] or None,
+                             columns['year'][row] or None,
+                             self._genre_list(columns['genres'][row]))
+
+    def get(self, imdb_episode_id):
+        """Returns the EpisodeRecord of an episode, or None if it isn't in the lookup"""
+        number = title_id_to_int(imdb_episode_id)
+        episodes = self._columns['episode']
+        i = bisect.bisect_left(episodes, number)
+        if i < len(episodes) and episodes[i] == number:
+            return self._record(i)
+        return None
+
+    def episodes_of(self, imdb_title_id):
+        """Returns the EpisodeRecords of a show's episodes"""
+        number = title_id_to_int(imdb_title_id)
+        parents = self._columns['by_parent_parent']
+        rows = self._columns['by_parent_row']
+        start = bisect.bisect_left(parents, number)
+        end = bisect.bisect_right(parents, number, start)
+        return [self._record(rows[i]) for i in range(start, end)]
+
+    def close(self):
+        for column in self._columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        self._columns = {}
+        for mapped in self._mmaps:
+            mapped.close()
+        self._mmaps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,370 @@
+"""
+Graph-access layer: the neo4j transaction functions and open_neo4j_session.
+
+neo4j, config and the in-memory graph are only imported when a session is opened, so
+scripts that only talk to the graph don't pay for the scraping dependencies.
+"""
+import json
+import os
+from datetime import datetime
+
+# Use an in-memory graph saved to this file instead of neo4j (see memory_graph.py)
+MEMORY_GRAPH_VARIABLE = 'IMDB_TO_NEO4J_MEMORY_GRAPH'
+
+# Set (to anything) to MERGE shows on imdbTitleID alone, so a title scraped under another
+# name updates the existing Show instead of creating a second one
+SHOW_KEY_ONLY_VARIABLE = 'IMDB_TO_NEO4J_SHOW_KEY_ONLY'
+
+# Label -> (key property, relationships of the label as (type, direction, property
+# relationships of the type are told apart by)), for merging duplicate nodes
+DUPLICATE_KEYS = {
+    'Show': ('imdbTitleID', [('SEASON_OF', 'in', None),
+                             ('WORKED_ON', 'in', 'jobTitle'),
+                             ('HAS_GENRE', 'out', None)]),
+    'Season': ('imdbSeasonID', [('SEASON_OF', 'out', None),
+                                ('WORKED_ON', 'in', 'jobTitle'),
+                                ('EPISODE_OF', 'in', None)]),
+}
+
+
+def add_genre(tx, genre_name):
+    tx.run("MERGE (g:Genre {genreName: $genreName}) "
+           "ON CREATE SET g.uuid = apoc.create.uuid() ",
+           genreName=genre_name)
+
+
+def add_person(tx, person):
+    full_name = person.full_name
+    imdb_name_id = person.imdb_name_id
+    tx.run("MERGE (a:Person {imdbNameID: $imdbNameID})"
+           "ON CREATE SET a.createdDate = datetime(), "
+           "a.uuid = apoc.create.uuid(), a.fullName = $fullName ",
+           fullName=full_name, imdbNameID=imdb_name_id,)
+
+
+def get_crew_list(tx, label):
+    return tx.run("MATCH (p) WHERE $label IN labels(p) "
+                  "RETURN p.imdbNameID, p.fullName ",
+                  label=label)
+
+
+def get_filmography_fingerprint(tx, imdb_name_id):
+    return tx.run("MATCH (p:Person {imdbNameID: $imdbNameID}) "
+                  "RETURN p.filmographyFingerprint, p.creditFingerprints",
+                  imdbNameID=imdb_name_id)
+
+
+def set_filmography_fingerprint(tx, person, filmography_fingerprint, fingerprints):
+    """Set by add_worked_on.py once the person's scraped credits are loaded. The person is
+    added if they aren't in neo4j yet.
+    fingerprints:    [dict]  credit key -> fingerprint, stored as a list of
+                             'key=fingerprint' strings"""
+    tx.run("MERGE (p:Person {imdbNameID: $imdbNameID}) "
+           "ON CREATE SET p.createdDate = datetime(), "
+           "p.uuid = apoc.create.uuid(), p.fullName = $fullName "
+           "SET p.filmographyFingerprint = $filmographyFingerprint, "
+           "p.creditFingerprints = $creditFingerprints, p.fingerprintDate = datetime()",
+           imdbNameID=person.imdb_name_id, fullName=person.full_name,
+           filmographyFingerprint=filmography_fingerprint,
+           creditFingerprints=[key + "=" + fingerprint
+                               for key, fingerprint in sorted(fingerprints.items())])
+
+
+def read_credit_fingerprints(results):
+    """Converts the result of get_filmography_fingerprint to a dict of credit key ->
+    fingerprint, empty if the person has never been fingerprinted"""
+    fingerprints = {}
+    for record in results:
+        for credit in record['p.creditFingerprints'] or []:
+            key, _, fingerprint = credit.rpartition("=")
+            fingerprints[key] = fingerprint
+    return fingerprints
+
+
+def check_neo4j_for_episode(tx, episode):
+    imdb_episode_id = episode.imdb_episode_id
+    return tx.run("MATCH(e:Episode {imdbEpisodeID: $imdbEpisodeID})"
+                  "RETURN e.seasonNum, e.episodeNum, e.airDate",
+                  imdbEpisodeID=imdb_episode_id)
+
+
+def check_neo4j_for_episode_genre(tx, episode):
+    imdb_episode_id = episode.imdb_episode_id
+    return tx.run("MATCH(e:Episode {imdbEpisodeID: $imdbEpisodeID})-[:HAS_GENRE]->(g:Genre)"
+                  "RETURN g.genreName",
+                  imdbEpisodeID=imdb_episode_id)
+
+
+def set_crew_scraped(tx, imdb_title_id):
+    """Records that a show's full credits have been scraped, for crawl_frontier.py"""
+    tx.run("MATCH (sh:Show {imdbTitleID: $imdbTitleID}) "
+           "SET sh.crewScrapedDate = datetime() ",
+           imdbTitleID=imdb_title_id)
+
+
+def get_episodes(tx, imdb_episode_ids):
+    """The episodes of a list that are in neo4j, each with its genres, in one query rather
+    than a check_neo4j_for_episode and check_neo4j_for_episode_genre per episode"""
+    return tx.run("UNWIND $imdbEpisodeIDs AS imdbEpisodeID "
+                  "MATCH (e:Episode {imdbEpisodeID: imdbEpisodeID}) "
+                  "OPTIONAL MATCH (e)-[:HAS_GENRE]->(g:Genre) "
+                  "RETURN imdbEpisodeID, e.seasonNum AS seasonNum, "
+                  "e.episodeNum AS episodeNum, e.airDate AS airDate, "
+                  "collect(g.genreName) AS genres ",
+                  imdbEpisodeIDs=imdb_episode_ids)
+
+
+def check_neo4j_for_show(tx, show):
+    return tx.run("MATCH (s:Show {imdbTitleID: $imdbTitleID})"
+                  "RETURN s.showTitle",
+                  imdbTitleID=show.imdb_title_id)
+
+
+def check_neo4j_for_season(tx, season):
+    return tx.run("MATCH (se:Season {imdbSeasonID: $imdbSeasonID})"
+                  "RETURN se.seasonTitle, se.firstAirDate, se.lastAirDate",
+                  imdbSeasonID=season.imdb_season_id)
+
+
+def get_seasons_of_show(tx, imdb_title_id):
+    return tx.run("MATCH (sh:Show {imdbTitleID: $imdbTitleID})<-[:SEASON_OF]-(se) "
+                  "RETURN se.imdbSeasonID AS imdbSeasonID, se.roughStart AS roughStart, "
+                  "se.roughEnd AS roughEnd ",
+                  imdbTitleID=imdb_title_id)
+
+
+def get_shows_with_seasons(tx, imdb_title_ids):
+    """The shows of a list that are in neo4j, each with its seasons (a row with a null
+    imdbSeasonID for a show with none)"""
+    return tx.run("UNWIND $imdbTitleIDs AS imdbTitleID "
+                  "MATCH (sh:Show {imdbTitleID: imdbTitleID}) "
+                  "OPTIONAL MATCH (sh)<-[:SEASON_OF]-(se) "
+                  "RETURN imdbTitleID, se.imdbSeasonID AS imdbSeasonID, "
+                  "se.roughStart AS roughStart, se.roughEnd AS roughEnd ",
+                  imdbTitleIDs=imdb_title_ids)
+
+
+def check_neo4j_for_season_years(tx, show, start_year, end_year):
+    return tx.run("MATCH (s:Show {imdbTitleID: $imdbTitleID})<-[:SEASON_OF]-(se) "
+                  "WHERE date(toString($start_year) + '-01-01') <= se.roughEnd and "
+                  "se.roughStart <= date(toString($end_year) + '-01-01') "
+                  "RETURN se.imdbSeasonID AS imdbSeasonID, se.roughStart AS roughStart, "
+                  "se.roughEnd AS roughEnd ",
+                  imdbTitleID=show.imdb_title_id, start_year=start_year, end_year=end_year)
+
+
+def add_episode(tx, episode):
+    imdb_episode_id = episode.imdb_episode_id
+    imdb_season_id = episode.imdb_season_id
+    imdb_title_id = episode.imdb_title_id
+    season_num = episode.season_num
+    episode_num = episode.episode_num
+    airdate = episode.airdate_string
+    episode_title = episode.episode_title
+
+    tx.run("MERGE(e:Episode {imdbEpisodeID: $imdbEpisodeID}) "
+           "ON CREATE SET e.createdDate = datetime(), e.imdbSeasonID = $imdbSeasonID, "
+           "e.imdbTitleID = $imdbTitleID, "
+           "e.seasonNum = $seasonNum, e.episodeNum = $episodeNum, e.airDate = date($airDate), "
+           "e.episodeTitle = $episodeTitle, e.uuid = apoc.create.uuid() "
+           "WITH e "
+           "MATCH(se:Season {imdbSeasonID: $imdbSeasonID}) "
+           "MERGE(e)-[:EPISODE_OF]->(se)",
+           imdbEpisodeID=imdb_episode_id, imdbSeasonID=imdb_season_id, imdbTitleID=imdb_title_id,
+           seasonNum=season_num, episodeNum=episode_num, airDate=airdate,
+           episodeTitle=episode_title)
+
+
+def add_genre_to_episode(tx, episode):
+    imdb_episode_id = episode.imdb_episode_id
+    genre_list = episode.genre_list
+    if genre_list:
+        for genre in genre_list:
+            tx.run("MATCH(e:Episode {imdbEpisodeID: $imdbEpisodeID})"
+                   "MATCH(g:Genre {genreName:$genre})"
+                   "MERGE(e)-[:HAS_GENRE]->(g)", imdbEpisodeID=imdb_episode_id, genre=genre)
+
+
+def add_season(tx, season, source):
+    print("Called add_season")
+    tx.run("MERGE (se:Season {imdbSeasonID: $imdbSeasonID}) "
+           "ON CREATE SET se.createdDate = datetime(), se.source = $source, "
+           "se.seasonTitle = $seasonTitle, se.seasonNumber = $seasonNumber, "
+           "se.firstAirdate = date($firstAirdate), se.lastAirdate = date($lastAirdate), "
+           "se.roughStart = date($roughStart), se.roughEnd = date($roughEnd), "
+           "se.uuid = apoc.create.uuid() ",
+           imdbSeasonID=season.imdb_season_id, seasonTitle=season.season_title,
+           seasonNumber=season.season_num, firstAirdate=season.first_airdate,
+           lastAirdate=season.last_airdate, roughStart=season.rough_start,
+           roughEnd=season.rough_end, source=source)
+
+
+def add_season_of(tx, season, show):
+    print("Called add_season_of")
+    tx.run("MATCH (se:Season {imdbSeasonID: $imdbSeasonID})"
+           "MATCH (sh:Show {imdbTitleID: $imdbTitleID})"
+           "MERGE(se)-[:SEASON_OF]->(sh)",
+           imdbSeasonID=season.imdb_season_id, imdbTitleID=show.imdb_title_id)
+
+
+def add_show(tx, show, source):
+    print("Called add_show")
+    if os.environ.get(SHOW_KEY_ONLY_VARIABLE):
+        tx.run("MERGE (sh:Show {imdbTitleID: $imdbTitleID}) "
+               "ON CREATE SET sh.createdDate = datetime(), sh.source = $source, "
+               "sh.showTitle = $showTitle, sh.uuid = apoc.create.uuid() ",
+               imdbTitleID=show.imdb_title_id, showTitle=show.show_title,
+               source=source)
+    else:
+        tx.run("MERGE (sh:Show {imdbTitleID: $imdbTitleID, showTitle: $showTitle}) "
+               "ON CREATE SET sh.createdDate = datetime(), sh.source = $source, "
+               "sh.uuid = apoc.create.uuid() ",
+               imdbTitleID=show.imdb_title_id, showTitle=show.show_title,
+               source=source)
+    for genre in show.genre_list:
+            add_has_genre(tx, show.imdb_title_id, genre, source)
+
+
+def add_has_genre(tx, imdb_title_id, genre, source):
+    tx.run("MATCH (sh:Show {imdbTitleID: $imdbTitleID})"
+           "MATCH (g:Genre {genreName: $genre})"
+           "MERGE (sh)-[r:HAS_GENRE]->(g)"
+           "ON CREATE SET r.createdDate = datetime(), r.source = $source",
+           imdbTitleID=imdb_title_id, genre=genre, source=source)
+
+
+def add_worked_on_show(tx, imdb_name_id, job_title, imdb_title_id, source):
+    print("Called add_worked_on_show")
+    tx.run("MATCH (a:Person {imdbNameID: $imdbNameID})"
+           "MATCH (sh:Show {imdbTitleID: $imdbTitleID})"
+           "MERGE (a)-[r:WORKED_ON {jobTitle: $jobTitle}]->(sh)"
+           "ON CREATE SET r.createdDate = datetime(), r.source = $source",
+           imdbNameID=imdb_name_id, jobTitle=job_title, imdbTitleID=imdb_title_id,
+           source=source)
+
+
+def add_worked_on_season(tx, imdb_name_id, job_title, imdb_season_id, source):
+    print("Called add_worked_on_season")
+    return tx.run("MATCH (a:Person {imdbNameID: $imdbNameID})"
+                  "MATCH (se:Season {imdbSeasonID: $imdbSeasonID})"
+                  "MERGE (a)-[r:WORKED_ON {jobTitle: $jobTitle}]->(se)"
+                  "ON CREATE SET r.createdDate = datetime(), "
+                  "r.source = $source RETURN r.createdDate",
+                  imdbNameID=imdb_name_id, jobTitle=job_title, imdbSeasonID=imdb_season_id,
+                  source=source)
+
+
+def bump_graph_version(tx):
+    """Moves the graph version on. Called by every script that writes or changes WORKED_ON,
+    WORKED_WITH or WORKED_WITH_YEAR relationships, so CollaborationQueries knows to drop
+    its cached results"""
+    tx.run("MERGE (v:GraphVersion {name: 'graph'}) "
+           "SET v.version = coalesce(v.version, 0) + 1, v.updatedDate = datetime() ")
+
+
+def get_graph_version(tx):
+    return tx.run("OPTIONAL MATCH (v:GraphVersion) "
+                  "RETURN max(v.version) AS version ")
+
+
+def find_duplicates(tx, label):
+    """Every key (see DUPLICATE_KEYS) shared by more than one node of the label, with
+    the ids of its nodes, oldest first"""
+    key = DUPLICATE_KEYS[label][0]
+    # Labels and property names can't be parameters, so they're formatted in
+    return tx.run("MATCH (n:%s) WHERE n.%s IS NOT null "
+                  "WITH n ORDER BY n.createdDate, id(n) "
+                  "WITH n.%s AS key, collect(id(n)) AS nodeIDs "
+                  "WHERE size(nodeIDs) > 1 "
+                  "RETURN key, nodeIDs " % (label, key, key))
+
+
+def merge_duplicates(tx, label, groups):
+    """
+    Merges each group of duplicate nodes onto its first node: their relationships are
+    moved onto it, where it doesn't have the same relationship already, and they're
+    deleted. A duplicate with relationships of a type not in DUPLICATE_KEYS is kept.
+    Relationships moved or merged onto it get an updatedDate, so the incremental
+    updates of add_worked_with.py and add_collaboration_years.py pick up the merged
+    seasons.
+
+    :param label:   'Show' or 'Season'
+    :param groups:  list of lists of node ids, the node to keep first
+    :return:        result with relationshipsBefore, relationshipsAfter and nodesDeleted
+    """
+    node_ids = [node_id for group in groups for node_id in group]
+    pairs = [[group[0], node_id] for group in groups for node_id in group[1:]]
+    before = tx.run("MATCH (n) WHERE id(n) IN $nodeIDs "
+                    "OPTIONAL MATCH (n)-[r]-() "
+                    "RETURN count(r) AS relationships ", nodeIDs=node_ids).single()
+    for rel_type, direction, rel_key in DUPLICATE_KEYS[label][1]:
+        rel_props = ' {%s: r.%s}' % (rel_key, rel_key) if rel_key else ''
+        if direction == 'in':
+            old_pattern = "(drop)<-[r:%s]-(other)" % rel_type
+            new_pattern = "(keep)<-[r2:%s%s]-(other)" % (rel_type, rel_props)
+        else:
+            old_pattern = "(drop)-[r:%s]->(other)" % rel_type
+            new_pattern = "(keep)-[r2:%s%s]->(other)" % (rel_type, rel_props)
+        tx.run("UNWIND $pairs AS pair "
+               "MATCH (keep:%s) WHERE id(keep) = pair[0] "
+               "MATCH (drop:%s) WHERE id(drop) = pair[1] "
+               "MATCH %s "
+               "MERGE %s "
+               "ON CREATE SET r2 += properties(r) "
+               "SET r2.updatedDate = datetime() "
+               "DELETE r " % (label, label, old_pattern, new_pattern),
+               pairs=pairs)
+    deleted = tx.run("UNWIND $pairs AS pair "
+                     "MATCH (drop:%s) WHERE id(drop) = pair[1] AND NOT (drop)--() "
+                     "DELETE drop "
+                     "RETURN count(*) AS deleted " % label, pairs=pairs).single()
+    return tx.run("MATCH (n) WHERE id(n) IN $nodeIDs "
+                  "OPTIONAL MATCH (n)-[r]-() "
+                  "RETURN $before AS relationshipsBefore, count(r) AS relationshipsAfter, "
+                  "$deleted AS nodesDeleted ",
+                  nodeIDs=node_ids, before=before['relationships'],
+                  deleted=deleted['deleted'])
+
+
+def get_seasons_worked_on_since(tx, since):
+    """Seasons with WORKED_ON relationships created or updated (by merge_duplicates)
+    after since (an ISO 8601 datetime string, or None for all of them). Every row also
+    has the watermark, the latest of those dates as a string to pass back as since: it
+    keeps neo4j's full precision, which converting it to a Python datetime would lose"""
+    return tx.run("MATCH (:Person)-[r:WORKED_ON]->(se:Season) "
+                  "WITH se, coalesce(r.updatedDate, r.createdDate) AS changed "
+                  "WHERE $since IS null OR changed > datetime($since) "
+                  "WITH se.imdbSeasonID AS imdbSeasonID, max(changed) AS latest "
+                  "WITH collect(imdbSeasonID) AS imdbSeasonIDs, max(latest) AS latest "
+                  "UNWIND imdbSeasonIDs AS imdbSeasonID "
+                  "RETURN imdbSeasonID, toString(latest) AS watermark ",
+                  since=since)
+
+
+def read_watermark(path):
+    """createdDate of the latest WORKED_ON relationship seen by the last incremental
+    update that kept its watermark at path, as an ISO 8601 string, or None if there
+    hasn't been one"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['workedOn']
+
+
+def write_watermark(path, watermark):
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'workedOn': watermark, 'updated': datetime.now().isoformat()}, f)
+    os.replace(path + '.tmp', path)
+
+
+def open_neo4j_session():
+    memory_graph = os.environ.get(MEMORY_GRAPH_VARIABLE)
+    if memory_graph:
+        from memory_graph import MemoryGraph
+        return MemoryGraph.open(memory_graph)
+    from neo4j import GraphDatabase, basic_auth
+    import config
+    neo_driver = GraphDatabase.driver \
+        (config.neo4j_host,
+         auth=basic_auth(config.neo4j_user, config.neo4j_password))
+    return neo_driver
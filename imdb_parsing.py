@@ -0,0 +1,1511 @@
+"""
+Parsing layer: the Page classes that scrape IMDb pages and the objects they produce
+(Person, Credit, Show, Season, Episode ...).
+
+BeautifulSoup is only imported when the first page is loaded.
+"""
+import re
+from datetime import date, datetime
+import functools
+import json
+import html as h
+import bisect
+import itertools
+import hashlib
+import os
+import sys
+import profiling
+from imdb_browser import PageTimeout
+from imdb_graph import (check_neo4j_for_episode, check_neo4j_for_episode_genre, add_episode,
+                        add_genre_to_episode, add_show, add_season, add_season_of)
+
+IMDB_NAME_BASE_URL = 'https://www.imdb.com/name/'
+IMDB_TITLE_BASE_URL = 'https://www.imdb.com/title/'
+
+# Bump when a change alters what's parsed from name pages, so cached credits are redone
+PARSER_VERSION = 1
+
+# Episode lookup built from the IMDb datasets by build_episode_lookup.py
+EPISODE_LOOKUP_VARIABLE = 'IMDB_TO_NEO4J_EPISODE_LOOKUP'
+
+# Embedded JSON payloads, read straight from the page source
+LD_JSON_PATTERN = re.compile(r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+                             re.S)
+NEXT_DATA_PATTERN = re.compile(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.S)
+
+# Fewest unresolved episodes of a credit for which the show's episode list is tried
+# before the episodes' own pages
+EPISODE_LIST_THRESHOLD = 10
+
+# Words that mark a job description as a camera or g&e department job
+CREW_JOB_PATTERN = re.compile('camera|AC|operator|photo|cinematograph|clapper'
+                              '|imag|loader|puller|data|utility|dit|jib|tech|media'
+                              '|pov|assistant|steadicam|video|light|electric|gaffer|grip')
+
+
+class Page(object):
+    def __init__(self, driver, imdb_id):
+        """
+        driver [Selenium driver object]     Selenium driver
+        url [string]                        URL of the page
+        """
+        self.driver = driver
+        self.imdb_id = imdb_id
+        self.blocked = False
+        self.page_source = None
+        self._soup = None
+
+    def _get_page(self, url):
+        with profiling.stage(profiling.FETCH):
+            j = 5
+            while j > 0:
+                try:
+                    self.driver.get(url)
+                    self.page_source = self.driver.page_source
+                    self._soup = None
+                    break
+                except PageTimeout:
+                    self.driver.refresh()
+                    j -= 1
+
+    @property
+    def soup(self):
+        """The page's parse tree. Parsing is most of the CPU cost of a page, so it's only
+        done when something outside the embedded JSON is needed"""
+        if self._soup is None and self.page_source is not None:
+            from bs4 import BeautifulSoup
+            with profiling.stage(profiling.PARSE):
+                self._soup = BeautifulSoup(self.page_source, 'html.parser')
+        return self._soup
+
+    def _get_script(self, pattern):
+        with profiling.stage(profiling.PARSE):
+            match = pattern.search(self.page_source or '')
+            if match:
+                try:
+                    return json.loads(match.group(1))
+                except ValueError:
+                    return None
+            return None
+
+    def _get_json(self):
+        return self._get_script(LD_JSON_PATTERN)
+
+    def _get_next_data(self):
+        """The page's hydration data (the __NEXT_DATA__ script), or None"""
+        return self._get_script(NEXT_DATA_PATTERN)
+
+    def _get_expected_json(self):
+        """For pages that always carry ld+json. A page without it is most likely an IMDb
+        throttling or error page rather than a real one, so it's flagged as blocked"""
+        data = self._get_json()
+        self.blocked = data is None
+        return data
+
+    def release_page(self):
+        """Drops the page and its parse tree once everything has been extracted from them"""
+        self._soup = None
+        self.page_source = None
+
+
+class NamePage(Page):
+    def __init__(self, driver, session, crew, writer=None, known_fingerprints=None,
+                 fetch_pool=None, episode_lookup=None, credit_cache=None, prefetcher=None):
+        """
+        :param driver:              Selenium driver object
+        :param session:             neo4j session
+        :param crew:                Person object
+        :param writer:              optional WriteBehindBuffer for neo4j writes
+        :param known_fingerprints:  optional dict of credit key -> fingerprint from the last
+                                    run (see get_filmography_fingerprint). Credits whose
+                                    fingerprint hasn't changed are skipped
+        :param fetch_pool:          optional FetchPool to fetch episode pages in parallel
+        :param episode_lookup:      optional EpisodeLookup consulted before episode pages
+        :param credit_cache:        optional CreditCache. If it has the credits parsed from
+                                    a page with the same filmography fingerprint, they're
+                                    used instead of parsing
+        :param prefetcher:          optional prefetch.Prefetcher, which may have fetched the
+                                    page and the episodes and titles of its credits already
+        """
+        Page.__init__(self, driver, crew.imdb_name_id)
+        self.url = IMDB_NAME_BASE_URL + self.imdb_id + '/'
+        prefetched = prefetcher.take_name_page(self.imdb_id) if prefetcher else None
+        if prefetched is not None:
+            self.page_source = prefetched.page_source
+            self._soup = prefetched.soup
+        else:
+            self._get_page(self.url)
+        data = self._get_expected_json()
+        if data:
+            self.name = data['name']
+        # Fingerprinted first, since the credit cache is keyed on them: unlike the page as a
+        # whole, they only change when a credit does
+        with profiling.stage(profiling.PARSE):
+            divs = [(div,) + credit_fingerprint(div) for div in credit_divs(self.soup)]
+        self.fingerprints = {key: fingerprint for _, key, fingerprint in divs}
+        self.unchanged_count = 0
+        self.from_cache = False
+        cached = None
+        if credit_cache is not None and not self.blocked:
+            cached = credit_cache.get(self.imdb_id, self.filmography_fingerprint)
+        if cached is not None:
+            self.credit_list = cached
+            self.from_cache = True
+        else:
+            with profiling.stage(profiling.PARSE):
+                self._get_credits(divs, session, writer, known_fingerprints or {}, fetch_pool,
+                                  episode_lookup, prefetcher)
+            # Only a complete parse can stand in for the page later
+            if credit_cache is not None and not self.blocked and not self.unchanged_count:
+                credit_cache.put(self.imdb_id, self.filmography_fingerprint, self.credit_list)
+        self.release_page()
+
+    def _get_credits(self, divs, session, writer, known_fingerprints, fetch_pool,
+                     episode_lookup, prefetcher):
+        """:param divs:    list of (credit div, key, fingerprint)"""
+        self.credit_list = []
+        for div, key, fingerprint in divs:
+            if known_fingerprints.get(key) == fingerprint:
+                self.unchanged_count += 1
+                continue
+            self.credit_list.append(Credit(div, self.driver, session, writer, fetch_pool,
+                                           episode_lookup, prefetcher))
+
+    @property
+    def filmography_fingerprint(self):
+        """Fingerprint of the whole filmography, built from the credit fingerprints"""
+        return filmography_fingerprint(self.fingerprints)
+
+    def __iter__(self):
+        return iter(self.credit_list)
+
+
+class Person(object):
+    __slots__ = ('imdb_name_id', 'full_name')
+
+    def __init__(self, imdb_name_id, full_name):
+        """imdbNameID:  [string]    imdbNameID of the person
+           fullName:    [string]    person's full name"""
+        self.imdb_name_id = imdb_name_id
+        self.full_name = full_name
+
+
+class Credit(object):
+    """ DATA MEMBERS
+        div             div containing information for a single screen credit
+                        (released once the credit has been extracted)
+        driver          selenium driver (released once the credit has been extracted)
+        writer          optional WriteBehindBuffer; if given, new episodes are queued
+                        for writing instead of being written before scraping continues
+        fetch_pool      optional FetchPool; if given, uncached episode pages are fetched
+                        in parallel
+        episode_lookup  optional EpisodeLookup; episodes found in it aren't fetched
+        prefetcher      optional prefetch.Prefetcher; episodes and genres it has looked up
+                        or fetched ahead of time are taken from it
+                        (writer to prefetcher are also released once the credit has been
+                        extracted; the neo4j session is only used while it's built)
+        title           [string]    show title
+        imdb_title_id   [string]    show imdb title id
+        show_type       [string]    show type ie, 'Feature Film', 'TV Series'
+        job_class       [string]    job class ie 'camera department', 'cinematographer'
+        job_title       [string]    specific job title
+        first_year      [string]    first year credited
+        last_year       [string]    last year credited
+        genre_list      [str list]  list of genres for the overall title
+                                    (only has content if no episodes listed)
+
+        episode_list    list of episode objects representing episodes in screen credit
+        season_list     list of season objects representing the seasons the episodes appeared in
+        """
+    __slots__ = ('div', 'driver', 'writer', 'fetch_pool', 'episode_lookup', 'prefetcher',
+                 'title', 'imdb_title_id', 'show_type', 'job_class', 'job_title', 'first_year',
+                 'last_year', 'genre_list', 'episode_list', 'season_list')
+
+    def __init__(self, div, driver, session, writer=None, fetch_pool=None, episode_lookup=None,
+                 prefetcher=None):
+        self.div = div
+        self.driver = driver
+        self.writer = writer
+        self.fetch_pool = fetch_pool
+        self.episode_lookup = episode_lookup
+        self.prefetcher = prefetcher
+        self.title = div.find('a').text
+        self._get_job_class_imdb_title_id()
+        self.job_title = ''
+        self.show_type = ''
+        self._get_show_type_job_title()
+        print(self.title + " (" + self.show_type + ")")
+        self._get_years()
+        self.episode_list = []
+        self.season_list = []
+        self._create_episode_list()
+        self.genre_list = []
+        if self.episode_list:
+            with profiling.stage(profiling.RESOLVE):
+                self._create_season_list(session)
+        if not self.season_list:
+            genre_list = None
+            if self.prefetcher:
+                genre_list = self.prefetcher.take_genres(self.imdb_title_id)
+            if genre_list is None:
+                genre_list = ShowPage(driver, self.imdb_title_id).genre_list
+            self.genre_list = genre_list
+        self.job_class = intern_string(self.job_class)
+        self.job_title = intern_string(self.job_title)
+        self.show_type = intern_string(self.show_type)
+        # The div keeps the whole page's parse tree alive, so let it go
+        self.div = None
+        self.driver = None
+        self.writer = None
+        self.fetch_pool = None
+        self.episode_lookup = None
+        self.prefetcher = None
+
+    def _get_job_class_imdb_title_id(self):
+        job_class, self.imdb_title_id = self.div.attrs['id'].split('-')
+        self.job_class = job_class.replace("_", " ")
+
+    def _get_show_type_job_title(self):
+        show_type_job_title = self.div.b.next_sibling.strip()
+        # If that text chunk exists
+        if show_type_job_title:
+            # if that chunk consists of multiple parts, each in parentheses
+            if ") (" in show_type_job_title:
+                # split it into its individual elements
+                elements = show_type_job_title.split(') (')
+                # iterate through the list of elements
+                for element in elements:
+                    # if the element is a show type, then set show type to the element's value
+                    if bool(re.search('TV|Docu|Short|Video', element)):
+                        self.show_type = element.translate(element.maketrans('', '', '()'))
+                    # if the element is a job description, set job desc to the element's value
+                    elif is_crew_job(element):
+                        self.job_title = element.translate(element.maketrans('', '', '()'))
+                # if job description is split into two different jobs
+                if ' - ' in self.job_title:
+                    # split it in two and assign job description to the first value
+                    job_list = self.job_title.split(' - ')
+                    self.job_title = job_list[0]
+                # if the second chunk was not a show type, it was a status
+                # (ie, 'completed', so the type is feature film
+                if self.show_type == '':
+                    self.show_type = 'Feature Film'
+            # if that chunk consists of just one part
+            else:
+                # if it represents a show type, set show type to its value
+                if bool(re.search('TV|Docu|Short|Video', show_type_job_title)):
+                    self.show_type = show_type_job_title.translate(
+                        show_type_job_title.maketrans('', '', '()'))
+                # if it doesn't represent a show type, then it must be a job description.
+                # Set job description to its value and show type to feature film
+                # (which is never listed explicitly in imdb.
+                else:
+                    self.job_title = show_type_job_title.translate(
+                        show_type_job_title.maketrans('', '', '()'))
+                    self.show_type = 'Feature Film'
+        # if the show type/job description text chunk doesn't exist
+        else:
+            # set show type to feature film, since it's never listed explicitly in imdb.
+            self.show_type = 'Feature Film'
+        # if the credit is listed in the Cinematographer section, then set job description to DP
+        if self.job_class == 'cinematographer':
+            self.job_title = 'director of photography'
+
+    def _get_years(self):
+        year = self.div.find('span', {'class': 'year_column'}).text.strip()
+        # strip out roman numerals from the year column
+        year = year.translate(year.maketrans('', '', '/I'))
+        # if there's a range of years, separate it into first and last year
+        if len(year) == 9:
+            self.first_year = year[0:4]
+            self.last_year = year[5:9]
+        # if there's only one year, set first and last year equal to the same year
+        else:
+            self.first_year = year
+            self.last_year = year
+
+    def _create_episode_list(self):
+        episode_divs = self.div.findAll('div', {'class': 'filmo-episodes'})
+        if episode_divs:
+            # for each episode div
+            for episode_div in episode_divs:
+                # find all the <a> elements in the episode div
+                for link in episode_div.findAll('a'):
+                    # if there's a link to an episode page
+                    if 'href' in link.attrs:
+                        job_title = ''
+                        # Grab the episode job title credit from the episode credit (if it exists)
+                        episode_title_job = episode_div.text.strip("\n)- ").split("\n... (")
+                        if len(episode_title_job) == 2:
+                            if is_crew_job(episode_title_job[1]):
+                                job_title = episode_title_job[1]
+                        imdb_episode_id = re.search('tt[0-9]{7,10}', link.attrs['href']).group(0)
+
+                        # Create an Episode object with the imdbTitleID of the episode and the
+                        # job title credit
+                        self.episode_list.append(Episode(imdb_title_id=self.imdb_title_id,
+                                                         imdb_episode_id=imdb_episode_id,
+                                                         job_title=job_title))
+
+    def _create_season_list(self, session):
+        uncached = []
+        prefetched = []
+        for episode in self.episode_list:
+            if self.prefetcher:
+                needs_write = self.prefetcher.take_episode(episode)
+                if needs_write is not None:
+                    if needs_write:
+                        prefetched.append(episode)
+                    continue
+            results = session.read_transaction(check_neo4j_for_episode, episode)
+            if results.peek() is not None:
+                for record in results:
+                    if record['e.seasonNum'] is not None:
+                        episode.season_num = int(record['e.seasonNum'])
+                    if record['e.episodeNum'] is not None:
+                        episode.episode_num = int(record['e.episodeNum'])
+                    if record['e.airDate'] is not None:
+                        episode.airdate = record['e.airDate'].to_native()
+                genre_results = session.read_transaction(check_neo4j_for_episode_genre, episode)
+                if genre_results.peek() is not None:
+                    for record in genre_results:
+                        episode.add_genre(record['g.genreName'])
+            elif not resolve_episode(episode, self.episode_lookup):
+                uncached.append(episode)
+
+        if len(uncached) >= EPISODE_LIST_THRESHOLD:
+            uncached = self._resolve_from_episode_list(session, uncached)
+
+        if self.fetch_pool and len(uncached) > 1:
+            episode_pages = self.fetch_pool.map(fetch_episode_page, uncached)
+        else:
+            episode_pages = [EpisodePage(self.driver, episode) for episode in uncached]
+
+        for episode in prefetched + [episode_page.episode for episode_page in episode_pages]:
+            if self.prefetcher:
+                self.prefetcher.remember(episode)
+
+            # If the episode has an airdate, season and episode numbers
+            # (otherwise it's useless) add it to neo4j
+            if episode.airdate and episode.season_num and episode.episode_num:
+                print('     adding episode to neo4j: ', episode.episode_title,
+                      episode.imdb_episode_id)
+                if self.writer:
+                    # HAS_GENRE depends on the episode, so write both together
+                    self.writer.write((add_episode, episode),
+                                      (add_genre_to_episode, episode))
+                else:
+                    session.write_transaction(add_episode, episode)
+                    session.write_transaction(add_genre_to_episode, episode)
+
+        self.season_list = EpisodeIndex(self.imdb_title_id, self.title,
+                                        self.episode_list).season_list
+        with profiling.stage(profiling.PARSE):
+            for season in self.season_list:
+                if season.job_title_list:
+                    season.job_title_list = parse_job_list(season.job_title_list)
+                else:
+                    if self.job_class == 'cinematographer':
+                        season.job_title_list = ['director of photography']
+
+    def _resolve_from_episode_list(self, session, uncached):
+        """
+        Places episodes using the show's episode list pages, which give the season and
+        episode numbers, title and airdate of a whole season or year at a time, when that
+        takes fewer page loads than the episodes' own pages. Every complete episode seen
+        on the list pages is added to neo4j, so later credits on the show find it there.
+
+        :param uncached:    Episode objects not found in neo4j or the episode lookup
+        :return:            the episodes the list pages didn't place
+        """
+        list_page = EpisodeListPage(self.driver, Show(self.imdb_title_id, self.title),
+                                    load=False)
+        urls = list_page.urls_for_years(self.first_year, self.last_year)
+        # The list pages, and the episode list page itself if the seasons had to be read
+        # from it
+        loads = len(urls) + (1 if list_page.loaded else 0)
+        if loads >= len(uncached):
+            list_page.release_page()
+            return uncached
+        print("     resolving", len(uncached), "episodes from", len(urls), "episode list pages")
+        list_page.get_episodes_from_urls(urls, {episode.imdb_episode_id for episode in uncached})
+
+        # The list pages don't give genres, so like episodes from the lookup these have none
+        seen = {}
+        for episode in list_page.episode_list:
+            seen[episode.imdb_episode_id] = episode
+            if self.prefetcher:
+                self.prefetcher.remember(episode)
+            if episode.airdate and episode.season_num and episode.episode_num:
+                if self.writer:
+                    self.writer.write((add_episode, episode))
+                else:
+                    session.write_transaction(add_episode, episode)
+
+        remaining = []
+        for episode in uncached:
+            found = seen.get(episode.imdb_episode_id)
+            if found is not None and found.airdate and found.season_num:
+                episode.season_num = found.season_num
+                episode.episode_num = found.episode_num
+                episode.airdate = found.airdate
+                episode.episode_title = found.episode_title
+            else:
+                remaining.append(episode)
+        return remaining
+
+
+class Show(object):
+    __slots__ = ('imdb_title_id', 'show_title', 'genre_list')
+
+    def __init__(self, imdb_title_id = None, show_title = None, genres = None):
+        """imdbTitleID:     [string]    imdbTitleID of the show
+           showTitle:       [string]    title of the show
+           genres:          [string]    list of genres for the show in string form,
+                                        or a list of genres"""
+        self.imdb_title_id = imdb_title_id
+        self.show_title = show_title
+
+        if isinstance(genres, list):
+            self.genre_list = intern_genres(genres)
+        elif genres:
+            # convert the string "genres" into a python list of genres
+            genres = genres.strip("[]")
+            self.genre_list = [intern_string(genre.strip("'")) for genre in genres.split(", ")]
+        # if no genres exist, set the genre list to the null list
+        else:
+            self.genre_list = []
+
+
+class ShowPage(Page):
+    def __init__(self, driver, imdb_title_id):
+        Page.__init__(self, driver, imdb_title_id)
+        self.url = IMDB_TITLE_BASE_URL + self.imdb_id + '/'
+        self._get_page(self.url)
+        self.genre_list = []
+        self.show_type = ''
+        self._get_genres()
+        self.release_page()
+
+    def _get_genres(self):
+        data = self._get_expected_json()
+        if data:
+            if 'genre' in data:
+                self.genre_list = intern_genres(data['genre'])
+            # ie 'TVSeries' -> 'TV Series', as it's written on name pages
+            if '@type' in data:
+                self.show_type = intern_string(
+                    re.sub('(?<=[a-z])(?=[A-Z])|(?<=TV)(?=[A-Z])', ' ', data['@type']))
+
+
+class Episode(object):
+    __slots__ = ('_imdb_title_id', 'imdb_episode_id', 'job_title', '_season_num', 'episode_num',
+                 'airdate', 'air_year', '_genre_list', 'episode_title', '_imdb_season_id')
+
+    def __init__(self, imdb_title_id=None, imdb_episode_id=None,
+                 job_title=None, season_num=None, episode_num=None,
+                 airdate=None, genre_list=None, episode_title=None):
+        """imdbTitleID: [string]            imdbTitleID of the show
+           imdbEpisodeID: [string]            imdb title code for the episode
+           jobTitle:    [string]            job title from the episode credit
+           seasonNum:   [int]               season number
+           epNum:       [int]               episode number
+           airDate:     [datetime.date]     first airdate of the episode
+           genreList:   [list of strings]   genres of episode
+
+           airYear is set instead of airDate when only the year is known (ie from
+           the IMDb datasets)"""
+        self._imdb_season_id = None
+        self.air_year = None
+        self.imdb_title_id = imdb_title_id
+        self.imdb_episode_id = imdb_episode_id
+        self.job_title = intern_string(job_title)
+        self.season_num = season_num
+        self.episode_num = episode_num
+        self.airdate = airdate
+        self.genre_list = genre_list
+        self.episode_title = episode_title
+
+    @property
+    def imdb_title_id(self):
+        return self._imdb_title_id
+
+    @imdb_title_id.setter
+    def imdb_title_id(self, imdb_title_id):
+        self._imdb_title_id = imdb_title_id
+        self._imdb_season_id = None
+
+    @property
+    def season_num(self):
+        return self._season_num
+
+    @season_num.setter
+    def season_num(self, season_num):
+        self._season_num = season_num
+        self._imdb_season_id = None
+
+    @property
+    def imdb_season_id(self):
+        if self._imdb_season_id is None and self.season_num:
+            self._imdb_season_id = self.imdb_title_id + "S" + str(self.season_num)
+        return self._imdb_season_id
+
+    @property
+    def airdate_string(self):
+        """Returns a string representation of the airDate if one exists,
+        returns empty string if not"""
+        if self.airdate:
+            return self.airdate.strftime('%Y-%m-%d')
+        else:
+            return None
+
+    @property
+    def genre_list(self):
+        """Genres are kept sorted as they're set or added"""
+        return self._genre_list
+
+    @genre_list.setter
+    def genre_list(self, genre_list):
+        if genre_list:
+            genre_list = sorted(intern_genres(genre_list))
+        self._genre_list = genre_list
+
+    @property
+    def genre_string(self):
+        """Returns a string representation of the genre list"""
+        return ", ".join(self.genre_list)
+
+    def add_genre(self, genre):
+        """genre:   [string]"""
+        if not self._genre_list:
+            self._genre_list = []
+        bisect.insort(self._genre_list, intern_string(genre))
+
+    def __lt__(self, other):
+        return self.episode_num < other.episode_num
+
+    def __str__(self):
+        return self.imdb_episode_id + ", " + str(self.season_num) + ", " \
+               + str(self.episode_num) + ", " \
+               + self.airdate_string + ", " + self.genre_string
+
+
+class Season(object):
+    __slots__ = ('imdb_title_id', 'season_num', 'episode_list', 'airdate_list',
+                 '_job_title_list', '_job_title_set', '_genre_list', '_genre_set',
+                 'show_title', '_imdb_season_id', '_first', '_last', '_first_year',
+                 '_last_year', '_dates')
+
+    def __init__(self, imdb_title_id, season_num, show_title=None):
+        """imdbTitleID:     [string]        imdbTitleID of the show the season is part of
+           seasonNum:       [int]           season number"""
+        self.imdb_title_id = imdb_title_id
+        self.season_num = season_num
+        self.episode_list = []
+        self.airdate_list = []
+        self.job_title_list = []
+        self.genre_list = []
+        self.show_title = ""
+        if show_title:
+            self.show_title = show_title
+        self._imdb_season_id = None
+        self._first = None
+        self._last = None
+        self._first_year = None
+        self._last_year = None
+        self._dates = None
+
+    @property
+    def job_title_list(self):
+        return self._job_title_list
+
+    @job_title_list.setter
+    def job_title_list(self, job_title_list):
+        self._job_title_list = job_title_list
+        self._job_title_set = set(job_title_list)
+
+    @property
+    def genre_list(self):
+        return self._genre_list
+
+    @genre_list.setter
+    def genre_list(self, genre_list):
+        self._genre_list = genre_list
+        self._genre_set = set(genre_list)
+
+    def add_episode(self, episode):
+        """Adds an Episode object to the season's episode list and its airDate
+        to the season's airDateList"""
+        self.episode_list.append(episode)
+        if episode.airdate:
+            self.add_air_date(episode.airdate)
+        elif episode.air_year:
+            self.add_air_year(episode.air_year)
+        if episode.genre_list:
+            for genre in episode.genre_list:
+                if genre not in self._genre_set:
+                    self._genre_set.add(genre)
+                    self._genre_list.append(genre)
+        if episode.job_title:
+            if episode.job_title not in self._job_title_set:
+                job_title = intern_string(episode.job_title)
+                self._job_title_set.add(job_title)
+                self._job_title_list.append(job_title)
+
+    def add_air_date(self, airDate):
+        """Adds an airDate (datetime.date object) to the airDateList"""
+        self.airdate_list.append(airDate)
+        # Keep the bounds up to date as dates come in rather than scanning the list
+        if self._first is None or airDate < self._first:
+            self._first = airDate
+            self._dates = None
+        if self._last is None or airDate > self._last:
+            self._last = airDate
+            self._dates = None
+        self.add_air_year(airDate.year)
+
+    def add_air_year(self, year):
+        """Adds the year of an episode whose exact airdate isn't known. Only the rough
+        start and end of the season depend on it"""
+        if self._first_year is None or year < self._first_year:
+            self._first_year = year
+            self._dates = None
+        if self._last_year is None or year > self._last_year:
+            self._last_year = year
+            self._dates = None
+
+    def _get_dates(self):
+        """Returns (first_airdate, last_airdate, rough_start, rough_end), formatted once
+        per change to the airdate bounds"""
+        if self._dates is None:
+            first, last, rough_start, rough_end = None, None, None, None
+            if self._first is not None:
+                first = self._first.strftime('%Y-%m-%d')
+                last = self._last.strftime('%Y-%m-%d')
+            if self._first_year is not None:
+                rough_start = '%04d-01-01' % self._first_year
+                rough_end = '%04d-12-31' % self._last_year
+            self._dates = (first, last, rough_start, rough_end)
+        return self._dates
+
+    @property
+    def first_airdate(self):
+        """Returns a string representation of the earliest date and None if no dates"""
+        return self._get_dates()[0]
+
+    @property
+    def last_airdate(self):
+        """Returns a string representation of the latest date and None if no dates"""
+        return self._get_dates()[1]
+
+    @property
+    def imdb_season_id(self):
+        """Generates an imdbSeasonID for the season based on imdbTitleID and season number"""
+        if self._imdb_season_id is None:
+            self._imdb_season_id = self.imdb_title_id + "S" + str(self.season_num)
+        return self._imdb_season_id
+
+    @property
+    def rough_start(self):
+        """Returns string representation of the first day of the year of the first airdate"""
+        return self._get_dates()[2]
+
+    @property
+    def rough_end(self):
+        """Returns string representation of the last day of the year of the last airdate"""
+        return self._get_dates()[3]
+
+    @property
+    def season_title(self):
+        return self.show_title + " S" + str(self.season_num)
+
+
+class EpisodeIndex(object):
+    """Groups episodes into Season objects in a single pass over the episodes.
+    Episodes without a season number are left out, as they can't be placed in a season"""
+    __slots__ = ('imdb_title_id', 'show_title', '_seasons')
+
+    def __init__(self, imdb_title_id, show_title=None, episode_list=None):
+        """imdbTitleID:     [string]        imdbTitleID of the show
+           showTitle:       [string]        title of the show
+           episodeList:     [Episode list]  episodes to index"""
+        self.imdb_title_id = imdb_title_id
+        self.show_title = show_title
+        self._seasons = {}
+        if episode_list:
+            for episode in episode_list:
+                self.add_episode(episode)
+
+    def add_episode(self, episode):
+        if episode.season_num:
+            season = self._seasons.get(episode.season_num)
+            if season is None:
+                season = Season(self.imdb_title_id, episode.season_num, self.show_title)
+                self._seasons[episode.season_num] = season
+            season.add_episode(episode)
+
+    @property
+    def season_list(self):
+        """Returns the seasons in season number order"""
+        return [self._seasons[season_num] for season_num in sorted(self._seasons)]
+
+
+class SeasonIntervalIndex(object):
+    """ The seasons of one show with the years they ran, for answering which seasons
+        overlap a range of years and whether the range is fully covered by seasons
+        without going back to neo4j.
+
+        Seasons are kept sorted by start year with a running maximum of end years, and the
+        years covered are kept as sorted, non-overlapping blocks, so both questions are
+        answered by bisection.
+
+        DATA MEMBERS
+        imdb_title_id   [string]    imdbTitleID of the show
+        season_ids      [set]       imdbSeasonIDs of all the show's seasons, dated or not
+        scraped         [bool]      True once the show's seasons have been scraped in this run
+        """
+    __slots__ = ('imdb_title_id', 'season_ids', 'scraped', '_starts', '_ends', '_ids',
+                 '_max_ends', '_block_starts', '_block_ends')
+
+    def __init__(self, imdb_title_id):
+        self.imdb_title_id = imdb_title_id
+        self.season_ids = set()
+        self.scraped = False
+        self._starts = []
+        self._ends = []
+        self._ids = []
+        self._max_ends = []
+        self._block_starts = []
+        self._block_ends = []
+
+    def add(self, imdb_season_id, start_year=None, end_year=None):
+        """Adds a season, with the years it ran if they're known"""
+        if imdb_season_id in self.season_ids:
+            return
+        self.season_ids.add(imdb_season_id)
+        if start_year is None or end_year is None:
+            return
+        i = bisect.bisect_right(self._starts, start_year)
+        self._starts.insert(i, start_year)
+        self._ends.insert(i, end_year)
+        self._ids.insert(i, imdb_season_id)
+        # A show has tens of seasons at most, so rebuilding the summaries is cheap
+        self._max_ends = list(itertools.accumulate(self._ends, max))
+        self._block_starts = []
+        self._block_ends = []
+        for start, end in zip(self._starts, self._ends):
+            if self._block_ends and start <= self._block_ends[-1] + 1:
+                self._block_ends[-1] = max(self._block_ends[-1], end)
+            else:
+                self._block_starts.append(start)
+                self._block_ends.append(end)
+
+    def add_season(self, season):
+        """Adds a Season object, using the years of its rough start and end"""
+        if season.rough_start and season.rough_end:
+            self.add(season.imdb_season_id, int(season.rough_start[:4]),
+                     int(season.rough_end[:4]))
+        else:
+            self.add(season.imdb_season_id)
+
+    def overlapping(self, first_year, last_year):
+        """Returns the imdbSeasonIDs of the seasons that ran in any of the years"""
+        season_ids = []
+        # Seasons after i start too late; working back, stop once none can end in time
+        i = bisect.bisect_right(self._starts, last_year) - 1
+        while i >= 0 and self._max_ends[i] >= first_year:
+            if self._ends[i] >= first_year:
+                season_ids.append(self._ids[i])
+            i -= 1
+        season_ids.reverse()
+        return season_ids
+
+    def covers(self, first_year, last_year):
+        """Returns True if every year in the range falls within at least one season"""
+        i = bisect.bisect_right(self._block_starts, first_year) - 1
+        return i >= 0 and self._block_ends[i] >= last_year
+
+
+class EpisodePage(Page):
+    def __init__(self, driver, episode):
+        Page.__init__(self, driver, episode.imdb_episode_id)
+        self.url = IMDB_TITLE_BASE_URL + self.imdb_id + '/'
+        self.episode = episode
+        self._get_page(self.url)
+        json_data = self._get_expected_json()
+        if json_data:
+            self.episode.episode_title = h.unescape(json_data['name'])
+            self.episode.genre_list = json_data['genre']
+            if json_data.get('datePublished'):
+                self.episode.airdate = date_string_to_date(json_data['datePublished'])
+        else:
+            self.episode.episode_title = ''
+            self.episode.genre_list = []
+        self._read_next_data()
+
+        # Only parse the page itself for what the embedded JSON didn't give
+        if self.episode.season_num is None or self.episode.episode_num is None:
+            self._get_season_episode_nums()
+        if self.episode.airdate is None:
+            self._get_airdate()
+        self.release_page()
+
+    def _read_next_data(self):
+        """Season and episode numbers, and the release date if ld+json had none, from
+        the page's hydration data"""
+        data = self._get_next_data()
+        if not data:
+            return
+        # The current title's data, rather than the other titles the page links to
+        try:
+            data = data['props']['pageProps']['aboveTheFoldData']
+        except (KeyError, TypeError):
+            pass
+        numbers = find_dict(data, ('seasonNumber', 'episodeNumber'))
+        if numbers:
+            self.episode.season_num = _to_int(numbers['seasonNumber'])
+            self.episode.episode_num = _to_int(numbers['episodeNumber'])
+        if self.episode.airdate is None:
+            release_date = find_dict(data, ('year', 'month', 'day'))
+            if release_date and _to_int(release_date['year']):
+                self.episode.airdate = date(_to_int(release_date['year']),
+                                            _to_int(release_date['month']) or 1,
+                                            _to_int(release_date['day']) or 1)
+
+    def _get_season_episode_nums(self):
+        season_num = None
+        episode_num = None
+        se = self.soup.select_one('ul[data-testid="hero-subnav-bar-season-episode-numbers-section"]')
+        if se:
+            for child in se.find_all('li'):
+                child = child.text.strip()
+                if child.startswith('S'):
+                    season_num = int(child[1:])
+                if child.startswith('E'):
+                    episode_num = int(child[1:])
+        if self.episode.season_num is None:
+            self.episode.season_num = season_num
+        if self.episode.episode_num is None:
+            self.episode.episode_num = episode_num
+
+    def _get_airdate(self):
+        # Search for <li> with episode air date
+        # Extract air date if it exists and convert to datetime object
+        airdate_string = ''
+        airdate_lis = self.soup('li', text=re.compile(r'Episode air'))
+        if airdate_lis:
+            airdate_string = airdate_lis[0].text.strip()
+            if 'Episode aired' in airdate_string:
+                airdate_string = airdate_string[14:]
+            elif 'Episode airs' in airdate_string:
+                airdate_string = airdate_string[13:]
+
+        self.episode.airdate = date_string_to_date(airdate_string)
+
+
+class EpisodeListPage(Page):
+    def __init__(self, driver, show, episode_lookup=None, load=True):
+        """If an EpisodeLookup is given and has the show's episodes, they're taken from
+        it, and only the episode list pages of seasons or years it doesn't cover are
+        loaded (see get_all_episodes_by_year_or_season).
+        With load False the episode list page isn't loaded until load() is called, or
+        urls_for_years needs it"""
+        Page.__init__(self, driver, show.imdb_title_id)
+        self.url = IMDB_TITLE_BASE_URL + self.imdb_id + '/episodes'
+        self.show = show
+        self.episode_list = []
+        self.season_list = []
+        self.option_list = []
+        self.selected = None
+        self.page_layout = ''
+        self.from_lookup = False
+        self.lookup_year = None
+        self.undated_seasons = set()
+        self.loaded = False
+        if episode_lookup is not None:
+            self._get_episodes_from_lookup(episode_lookup)
+        # Loaded even if the lookup has episodes, for the seasons and years it lists
+        if load:
+            self.load()
+
+    def load(self):
+        """Loads the episode list page, which lists the show's seasons and years"""
+        if not self.loaded:
+            self._get_page(self.url)
+            self.loaded = True
+
+    def _get_episodes_from_lookup(self, episode_lookup):
+        for record in episode_lookup.episodes_of(self.imdb_id):
+            if not record.season_num:
+                continue
+            if not record.year:
+                self.undated_seasons.add(str(record.season_num))
+                continue
+            episode = Episode(imdb_title_id=self.imdb_id,
+                              imdb_episode_id=record.imdb_episode_id,
+                              season_num=record.season_num,
+                              episode_num=record.episode_num,
+                              genre_list=record.genre_list)
+            episode.air_year = record.year
+            self.episode_list.append(episode)
+        self.from_lookup = bool(self.episode_list)
+        created = episode_lookup.manifest.get('created') or ''
+        self.lookup_year = int(created[:4]) if created[:4].isdigit() else None
+        if self.from_lookup and self.undated_seasons:
+            print("     the episode lookup has no year for some episodes of",
+                  self.show.show_title, "(seasons",
+                  ", ".join(sorted(self.undated_seasons, key=int)) + "),",
+                  "loading those seasons from the episode list")
+
+    def _options_past_lookup(self):
+        """
+        The options of the episode list the lookup doesn't cover: seasons or years it has
+        no episodes of, seasons it has episodes without a year of, and its latest season
+        or year if that was still airing when the lookup was built. Episodes the lookup
+        has of those are dropped, since they're loaded from the list pages.
+        """
+        if self.page_layout == 'season':
+            def option_of(episode):
+                return str(episode.season_num)
+            stale = set(self.undated_seasons)
+        else:
+            def option_of(episode):
+                return str(episode.air_year)
+            # Undated episodes can't be put in a year
+            stale = set()
+        covered = {option_of(episode) for episode in self.episode_list}
+        latest = max(covered, key=int)
+        latest_year = max(episode.air_year for episode in self.episode_list
+                          if option_of(episode) == latest)
+        if self.lookup_year is None or latest_year >= self.lookup_year:
+            stale.add(latest)
+        self.episode_list = [episode for episode in self.episode_list
+                             if option_of(episode) not in stale]
+        return [option for option in self.option_list
+                if option not in covered or option in stale]
+
+    def _get_options_div(self, for_label):
+        label = self.soup.find('label', {'for': {for_label}})
+        if label is not None:
+            options_div = label.parent
+            options = options_div.find_all('option', {'value': {re.compile('[0-9]{1,4}')}})
+            for option in options:
+                if int(option['value'].strip()) > 0:
+                    self.option_list.append(option.text.strip())
+                    if option.has_attr('selected'):
+                        if option['selected'] == 'selected':
+                            self.selected = int(option['value'].strip())
+        if for_label == 'bySeason':
+            self.page_layout = 'season'
+        elif for_label == 'byYear':
+            self.page_layout = 'year'
+
+    def get_all_episodes_by_year_or_season(self):
+        self._get_options_div('bySeason')
+        if not self.option_list:
+            self._get_options_div('byYear')
+        options = self.option_list
+        if self.from_lookup and options:
+            options = self._options_past_lookup()
+        for option in options:
+            if self.selected:
+                if int(option) > self.selected:
+                    break
+            url = IMDB_TITLE_BASE_URL + self.imdb_id + '/episodes?' + \
+                  self.page_layout + '=' + option
+            self._get_page(url)
+            self._get_episodes_for_one_year_or_season()
+
+    def _get_episodes_for_one_year_or_season(self):
+            episode_divs = self.soup.find_all('div', {'class': {re.compile('list_item [a-z]{1,4}')}})
+            for episode_div in episode_divs:
+                episode_title = ''
+                imdb_episode_id = ''
+                season_num = ''
+                episode_num = ''
+                airdate = None
+
+                # Find Episode Title
+                title_a = episode_div.find('a', {'itemprop': {'name'}})
+                if title_a:
+                    episode_title = title_a.text.strip()
+
+                # Find IMDB Episode ID, Season Number, Episode Number
+                data_div = episode_div.find('div', {'data-const': True})
+                if data_div:
+                    imdb_episode_id = data_div['data-const']
+                    season_ep_numbers_div = data_div.find('div')
+                    if season_ep_numbers_div:
+                        season_ep_numbers_text = season_ep_numbers_div.text.strip()
+                        if season_ep_numbers_text:
+                            if season_ep_numbers_text == 'Unknown':
+                                continue
+                            season_text, ep_text = season_ep_numbers_text.split(', ')
+                            try:
+                                season_num = re.search('[0-9]{1,4}', season_text).group(0)
+                            except AttributeError:
+                                season_num = ''
+                            try:
+                                episode_num = re.search('[0-9]{1,4}', ep_text).group(0)
+                            except AttributeError:
+                                episode_num = ''
+
+                # Find airdate
+                airdate_div = episode_div.find('div', {'class': {'airdate'}})
+                if airdate_div:
+                    airdate_text = airdate_div.text.strip().replace(".", "")
+                    airdate = date_string_to_date(airdate_text)
+
+                self.episode_list.append(Episode(imdb_title_id=self.imdb_id,
+                                                 imdb_episode_id=imdb_episode_id,
+                                                 season_num=int(season_num),
+                                                 episode_num=episode_num,
+                                                 airdate=airdate,
+                                                 episode_title=episode_title))
+
+    def urls_for_years(self, first_year, last_year):
+        """
+        URLs of the episode list pages that can hold episodes aired from first_year to
+        last_year: one per year if the years are known, otherwise one per season. Only the
+        seasons have to be read from the episode list page, which is loaded for them if it
+        hasn't been.
+        """
+        self.option_list = []
+        self.selected = None
+        if first_year.isdigit() and last_year.isdigit():
+            self.page_layout = 'year'
+            options = [str(year) for year in range(int(first_year), int(last_year) + 1)]
+        else:
+            self.load()
+            self._get_options_div('bySeason')
+            options = self.option_list
+        return [IMDB_TITLE_BASE_URL + self.imdb_id + '/episodes?' + self.page_layout + '=' +
+                option for option in options]
+
+    def get_episodes_from_urls(self, urls, wanted=None):
+        """
+        Adds the episodes on each of the episode list pages to the episode list, stopping
+        early once every imdbEpisodeID in wanted has been seen.
+        Episode numbers are converted to ints, or None if not given.
+        """
+        seen = set()
+        for url in urls:
+            self._get_page(url)
+            start = len(self.episode_list)
+            self._get_episodes_for_one_year_or_season()
+            for episode in self.episode_list[start:]:
+                episode_num = str(episode.episode_num)
+                episode.episode_num = int(episode_num) if episode_num.isdigit() else None
+                seen.add(episode.imdb_episode_id)
+            if wanted is not None and wanted <= seen:
+                break
+        self.release_page()
+
+    """
+    Populates the season list with seasons whose episodes fell within a particular year
+    """
+    def get_seasons_for_year(self, year):
+        if self.from_lookup:
+            self.episode_list = [episode for episode in self.episode_list
+                                 if str(episode.air_year) == year]
+            # Otherwise the year is newer than the lookup, or it had no year for them
+            if self.episode_list and (self.lookup_year is None or
+                                      int(year) < self.lookup_year):
+                self.get_seasons_from_episodes()
+                return
+            self.episode_list = []
+        self._get_options_div('byYear')
+        if year in self.option_list:
+            url = IMDB_TITLE_BASE_URL + self.imdb_id + '/episodes?year=' + year
+            self._get_page(url)
+            self._get_episodes_for_one_year_or_season()
+            self.get_seasons_from_episodes()
+
+    def get_seasons_from_episodes(self):
+        if self.episode_list:
+            self.season_list = EpisodeIndex(self.imdb_id, self.show.show_title,
+                                            self.episode_list).season_list
+
+
+class CrewCredit(object):
+    """ A credit from a title's full credits page
+
+        DATA MEMBERS
+        person          Person object
+        job_class       [string]    'camera department' or 'cinematographer', as in Credit
+        job_title_list  [str list]  standardized job titles (see parse_job_list)
+        episode_count   [int]       number of episodes credited, None if not given
+        first_year      [string]    first year credited, '' if not given
+        last_year       [string]    last year credited, '' if not given
+        """
+    __slots__ = ('person', 'job_class', 'job_title_list', 'episode_count', 'first_year',
+                 'last_year')
+
+    def __init__(self, person, job_class, job_title_list, episode_count=None,
+                 first_year='', last_year=''):
+        self.person = person
+        self.job_class = intern_string(job_class)
+        self.job_title_list = [intern_string(job) for job in job_title_list]
+        self.episode_count = episode_count
+        self.first_year = first_year
+        self.last_year = last_year
+
+
+class FullCreditsPage(Page):
+    """ Everyone credited in the Camera and Electrical Department and Cinematography
+        sections of a title's full credits page, so a show's whole crew comes from one
+        page instead of from every crew member's episode pages.
+
+        DATA MEMBERS
+        imdb_id         [string]    imdbTitleID of the show
+        crew_credits    list of CrewCredit objects
+        """
+    # Section ids on the full credits page -> job class as given on name pages
+    SECTIONS = {'camera_department': 'camera department',
+                'cinematographer': 'cinematographer'}
+
+    def __init__(self, driver, imdb_title_id):
+        Page.__init__(self, driver, imdb_title_id)
+        self.url = IMDB_TITLE_BASE_URL + self.imdb_id + '/fullcredits'
+        self._get_page(self.url)
+        self.crew_credits = []
+        self._get_crew_credits()
+        self.release_page()
+
+    def _get_crew_credits(self):
+        for section_id, job_class in self.SECTIONS.items():
+            header = self.soup.find('h4', {'id': section_id})
+            if header is None:
+                continue
+            table = header.find_next_sibling('table')
+            if table is None:
+                continue
+            for row in table.findAll('tr'):
+                credit = self._read_row(row, job_class)
+                if credit is not None:
+                    self.crew_credits.append(credit)
+
+    @staticmethod
+    def _read_row(row, job_class):
+        name_cell = row.find('td', {'class': 'name'})
+        if name_cell is None or name_cell.a is None:
+            return None
+        match = re.search('nm[0-9]{7,10}', name_cell.a.attrs.get('href', ''))
+        if match is None:
+            return None
+        person = Person(match.group(0), name_cell.a.text.strip())
+        credit_cell = row.find('td', {'class': 'credit'})
+        credit_text = " ".join(credit_cell.text.split()) if credit_cell else ''
+        job_text, episode_count, first_year, last_year = parse_credit_text(credit_text)
+
+        if job_class == 'cinematographer':
+            job_title_list = ['director of photography']
+        elif job_text and is_crew_job(job_text):
+            job_title_list = parse_job_list([job_text])
+        else:
+            return None
+        return CrewCredit(person, job_class, job_title_list, episode_count,
+                          first_year, last_year)
+
+
+def process_imdb_title_id(driver, writer, show, episode_lookup=None, season_index=None):
+    """
+    Scrapes a show's seasons from its episode list and writes the show, its seasons and
+    their SEASON_OF relationships to neo4j.
+
+    :param driver:          Selenium driver object
+    :param writer:          WriteBehindBuffer for the neo4j writes
+    :param show:            Show object
+    :param episode_lookup:  optional EpisodeLookup used instead of the episode list pages
+    :param season_index:    optional SeasonIntervalIndex of the show, updated with the
+                            seasons found and marked scraped
+    :return:                list of Season objects
+    """
+    with profiling.stage(profiling.RESOLVE):
+        episode_page = EpisodeListPage(driver, show, episode_lookup)
+        episode_page.get_all_episodes_by_year_or_season()
+        episode_page.get_seasons_from_episodes()
+    writer.write((add_show, show, 'imdb_p'))
+    for season in episode_page.season_list:
+        print("Adding season", season.season_title, "from new process")
+        writer.write((add_season, season, 'imdb_p'),
+                     (add_season_of, season, show))
+        if season_index is not None:
+            season_index.add_season(season)
+    if season_index is not None:
+        # Whatever is still missing isn't on IMDb, so don't scrape the show again
+        season_index.scraped = True
+    # Later rows check neo4j for the show straight away
+    writer.flush()
+    return episode_page.season_list
+
+
+def credit_divs(soup):
+    """The filmography row divs of a name page, one per credit"""
+    return soup.findAll('div', {'class': {'filmo-row even', 'filmo-row odd'}})
+
+
+def credit_references(div):
+    """
+    The titles a filmography row div links to, without building a Credit.
+
+    :return:    (imdbTitleID of the show, list of imdbEpisodeIDs of the credited episodes)
+    """
+    imdb_title_id = div.attrs['id'].split('-')[1]
+    imdb_episode_ids = []
+    for episode_div in div.findAll('div', {'class': 'filmo-episodes'}):
+        for link in episode_div.findAll('a'):
+            if 'href' in link.attrs:
+                imdb_episode_ids.append(re.search('tt[0-9]{7,10}', link.attrs['href']).group(0))
+    return imdb_title_id, imdb_episode_ids
+
+
+def credit_fingerprint(div):
+    """
+    Returns (key, fingerprint) for a filmography row div. The key identifies the credit
+    (job class and imdbTitleID) and the fingerprint is a hash of the row's normalised
+    text and the episodes it links to, so it changes whenever the credit does.
+    """
+    key = div.attrs.get('id', '')
+    text = " ".join(div.get_text(" ").split())
+    episode_ids = [link.attrs['href'] for link in div.findAll('a') if 'href' in link.attrs]
+    return key, _hash_text(text + "\n" + " ".join(episode_ids))
+
+
+def filmography_fingerprint(fingerprints):
+    """Fingerprint of a whole filmography, from its dict of credit key -> fingerprint"""
+    return _hash_text("\n".join(key + "=" + fingerprints[key] for key in sorted(fingerprints)))
+
+
+def _hash_text(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_credit_text(credit_text):
+    """
+    Splits the credit column of a full credits page, ie
+        'first assistant camera (12 episodes, 2019-2021)'
+    into its job description, episode count and years.
+
+    :return:    (job text, episode count or None, first year, last year), with the
+                years '' if not given
+    """
+    match = re.search(r'\((\d+|unknown) episodes?(?:, (\d{4})(?:-(\d{4}))?)?\)$', credit_text)
+    if match is None:
+        return credit_text.strip(), None, '', ''
+    episode_count = int(match.group(1)) if match.group(1).isdigit() else None
+    first_year = match.group(2) or ''
+    last_year = match.group(3) or first_year
+    return credit_text[:match.start()].strip(), episode_count, first_year, last_year
+
+
+def is_crew_job(text):
+    """Returns True if a job description from IMDb is a camera or g&e department job"""
+    return bool(CREW_JOB_PATTERN.search(text.lower()))
+
+
+def resolve_episode(episode, episode_lookup):
+    """
+    Fills in an episode's show, season and episode numbers, year and genres from an
+    EpisodeLookup, so its page doesn't need to be loaded.
+
+    :return:    True if the lookup placed the episode in a season and year
+    """
+    if episode_lookup is None:
+        return False
+    record = episode_lookup.get(episode.imdb_episode_id)
+    if record is None or not record.season_num or not record.year:
+        return False
+    episode.imdb_title_id = record.imdb_title_id
+    episode.season_num = record.season_num
+    episode.episode_num = record.episode_num
+    episode.air_year = record.year
+    episode.genre_list = record.genre_list
+    return True
+
+
+def fetch_episode_page(driver, episode):
+    """Fetch function for FetchPool"""
+    return EpisodePage(driver, episode)
+
+
+def fetch_show_page(driver, imdb_title_id):
+    """Fetch function for FetchPool"""
+    return ShowPage(driver, imdb_title_id)
+
+
+def fetch_name_page(driver, crew):
+    """Fetch function for FetchPool: loads a person's name page and parses it, for a
+    NamePage to be built from later (see prefetch.Prefetcher)"""
+    page = Page(driver, crew.imdb_name_id)
+    page._get_page(IMDB_NAME_BASE_URL + page.imdb_id + '/')
+    page._get_expected_json()
+    # Parsed here, on the fetching thread, so the NamePage doesn't have to
+    page.filmography_fingerprint = filmography_fingerprint(
+        dict(credit_fingerprint(div) for div in credit_divs(page.soup)))
+    page.driver = None
+    return page
+
+
+def intern_string(string):
+    """Interns job titles, genres etc. so the many copies scraped from IMDb share one
+    string object. Returns the argument unchanged if it's empty or None"""
+    if string:
+        # BeautifulSoup can hand back str subclasses, which can't be interned
+        return sys.intern(str(string))
+    return string
+
+
+def intern_genres(genres):
+    """Returns a list of interned genre names. IMDb's ld+json gives a bare string
+    rather than a list when a title has a single genre"""
+    if isinstance(genres, str):
+        genres = [genres]
+    return [intern_string(genre) for genre in genres]
+
+
+# Date formats found on IMDb pages, with a pattern that recognises each
+DATE_FORMATS = [
+    (re.compile('[0-9]{4}-[0-9]{2}-[0-9]{2}$'), '%Y-%m-%d'),
+    (re.compile('[0-9]{1,2} [A-Za-z]{4,9} [0-9]{4}'), '%d %B %Y'),
+    (re.compile('[A-Za-z]{3} [0-9]{1,2}, [0-9]{4}'), '%b %d, %Y'),
+    (re.compile('[0-9]{1,2} [A-Za-z]{3} [0-9]{4}'), '%d %b %Y'),
+    (re.compile('[A-Za-z]{4,9} [0-9]{4}'), '%B %Y'),
+    (re.compile('[A-Za-z]{3} [0-9]{4}'), '%b %Y'),
+    (re.compile('[0-9]{4}'), '%Y'),
+]
+
+
+@functools.lru_cache(maxsize=4096)
+def date_string_to_date(date_string):
+    """Parses the date formats IMDb uses. Episodes of a show share few distinct airdates
+    per page, so results are memoised"""
+    for pattern, date_format in DATE_FORMATS:
+        if pattern.match(date_string):
+            return datetime.strptime(date_string, date_format).date()
+    return None
+
+
+def find_dict(data, keys):
+    """Returns the first dict, searching depth first, that has all the keys, or None"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if all(key in value for key in keys):
+                return value
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+    return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_job_list(job_list):
+    """
+    Parses and standardizes a raw list of camera/g&e department job titles from IMDb
+    """
+    job_titles = ['first assistant camera', 'second assistant camera', 'lead assistant camera',
+                  'assistant camera', 'camera operator', 'director of photography',
+                  'camera utility', 'steadicam operator', 'additional camera operator',
+                  'best boy electric', 'key grip', 'lighting director']
+    split_jobs = []
+    for job in job_list[:]:
+        if ") / (" in job:
+            jobs = job.split(") / (")
+            for j in jobs:
+                split_jobs.append(j)
+            job_list.remove(job)
+
+    for job in job_list[:]:
+        if " / " in job:
+            jobs = job.split(" / ")
+            for j in jobs:
+                split_jobs.append(j)
+            job_list.remove(job)
+
+    for job in split_jobs:
+        if job not in job_list:
+            job_list.append(job)
+
+    base_jobs = []
+    for job in job_list[:]:
+        if " - " in job:
+            base_job = job.split(" - ")[0]
+            base_jobs.append(base_job)
+            job_list.remove(job)
+    for job in base_jobs:
+        if job not in job_list:
+            job_list.append(job)
+
+    base_jobs = []
+    for job in job_list[:]:
+        if ": " in job:
+            base_job = job.split(": ")[0]
+            base_jobs.append(base_job)
+            job_list.remove(job)
+    for job in base_jobs:
+        if job not in job_list:
+            job_list.append(job)
+
+    reordered = []
+    for i in job_list[:]:
+        for j in job_titles:
+            lower_i = i.lower()
+            lower_j = j.lower()
+            if set(lower_i.split()) == (set(lower_j.split())):
+                if j not in reordered:
+                    reordered.append(j)
+                job_list.remove(i)
+    job_list.extend(reordered)
+
+    for job in job_list[:]:
+        if re.match('\"[a-fA-F]{1}\" ', job):
+            print("\'match\'")
+            temp = job[4:]
+            job_list.remove(job)
+            if temp not in job_list:
+                job_list.append(temp)
+        if re.match('[a-fA-F]{1} ', job):
+            print("match")
+            temp = job[2:]
+            job_list.remove(job)
+            if temp not in job_list:
+                job_list.append(temp)
+        if re.match('Additional |additional ', job):
+            temp = job[11:]
+            job_list.remove(job)
+            if temp not in job_list:
+                job_list.append(temp)
+        if re.match('as |As ', job):
+            job_list.remove(job)
+    return job_list
+
+
+def to_caps(str):
+    conj = ['the', 'of', 'or', 'a']
+    results = []
+    str = str.lower()
+    word_list = str.split()
+    for word in word_list:
+        if word not in conj:
+            word = word.title()
+        results.append(word)
+    result = ' '.join(results)
+    return result
+
+
+def open_episode_lookup():
+    """Returns the EpisodeLookup named by IMDB_TO_NEO4J_EPISODE_LOOKUP, or None if the
+    variable isn't set"""
+    directory = os.environ.get(EPISODE_LOOKUP_VARIABLE)
+    if directory:
+        from imdb_datasets import EpisodeLookup
+        return EpisodeLookup(directory)
+    return None
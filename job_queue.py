@@ -0,0 +1,255 @@
+import csv
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+PERSON = 'person'
+SHOW = 'show'
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+# Seconds a leased job is held for without a heartbeat before another worker can take it
+LEASE_SECONDS = 300
+
+# Leases of a job before it's given up on
+MAX_ATTEMPTS = 3
+
+
+class Job(object):
+    """ A job leased from a JobQueue
+
+        DATA MEMBERS
+        job_id          [int]       row id of the job
+        kind            [string]    PERSON or SHOW
+        key             [string]    imdbNameID or imdbTitleID the job is for
+        payload         [dict]      anything else the job needs, ie the person's name
+        attempts        [int]       number of times the job has been leased, this time included
+        """
+    __slots__ = ('job_id', 'kind', 'key', 'payload', 'attempts')
+
+    def __init__(self, job_id, kind, key, payload, attempts):
+        self.job_id = job_id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+
+
+class JobQueue(object):
+    """ Durable queue of scraping jobs in an SQLite file, shared by any number of worker
+        processes, so work is handed out as workers become free rather than split up
+        in advance.
+
+        A worker leases a job, which hides it from other workers for lease_seconds.
+        While it works it sends heartbeats (see Heartbeat), each extending the lease.
+        When it finishes it marks the job done, or failed with the error, in which case
+        the job is queued again. A job whose lease runs out because its worker crashed
+        or hung is taken by the next worker to ask. A job leased max_attempts times
+        without finishing is marked failed for good.
+
+        Every change is made in its own immediate transaction, so workers on other hosts
+        can share the file as long as the file system supports SQLite's locking.
+
+        DATA MEMBERS
+        path            [string]    SQLite file of the queue
+        worker          [string]    name this process leases jobs under
+        lease_seconds   [float]     how long a lease lasts without a heartbeat
+        max_attempts    [int]       leases of a job before it's failed for good
+        """
+    def __init__(self, path, worker=None, lease_seconds=LEASE_SECONDS,
+                 max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.worker = worker or socket.gethostname() + '-' + str(os.getpid())
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.connection = self._connect()
+        with self._transaction() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                               "job_id INTEGER PRIMARY KEY, kind TEXT NOT NULL, "
+                               "key TEXT NOT NULL, payload TEXT NOT NULL, "
+                               "state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                               "worker TEXT, lease_expires REAL, error TEXT, "
+                               "updated REAL NOT NULL, UNIQUE (kind, key))")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_state "
+                               "ON jobs (kind, state, lease_expires)")
+
+    def _connect(self):
+        # Autocommit, with transactions begun explicitly by _transaction
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    def _transaction(self, connection=None):
+        return _ImmediateTransaction(connection or self.connection)
+
+    def add(self, kind, key, payload=None):
+        """Queues a job, unless there's already one of the kind for the key.
+        :return:    True if the job was queued"""
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO jobs (kind, key, payload, state, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(payload or {}), QUEUED, time.time()))
+            return cursor.rowcount == 1
+
+    def add_crew_list(self, path, skip=0):
+        """Queues a PERSON job for each row of a crew list csv (imdbNameID, full name), as
+        read by scrape_name_list.py.
+        :return:    number of jobs queued"""
+        return self._add_list(path, skip, PERSON, 'full_name')
+
+    def add_title_list(self, path, skip=0):
+        """Queues a SHOW job for each row of a title list csv (imdbTitleID, show title), as
+        read by scrape_title_list.py.
+        :return:    number of jobs queued"""
+        return self._add_list(path, skip, SHOW, 'show_title')
+
+    def _add_list(self, path, skip, kind, name_field):
+        added = 0
+        with open(path) as f:
+            reader = csv.reader(f)
+            for i in range(skip):
+                next(reader)
+            for imdb_id, name in reader:
+                added += self.add(kind, imdb_id, {name_field: name})
+        return added
+
+    def lease(self, kind):
+        """
+        Leases the oldest queued job of a kind, or one whose lease has run out.
+
+        :return:    Job, or None if there's nothing to do
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            while True:
+                row = connection.execute(
+                    "SELECT job_id, key, payload, attempts FROM jobs "
+                    "WHERE kind = ? AND (state = ? OR (state = ? AND lease_expires < ?)) "
+                    "ORDER BY job_id LIMIT 1", (kind, QUEUED, LEASED, now)).fetchone()
+                if row is None:
+                    return None
+                job_id, key, payload, attempts = row
+                if attempts >= self.max_attempts:
+                    # Its last worker never came back
+                    connection.execute("UPDATE jobs SET state = ?, error = ?, updated = ? "
+                                       "WHERE job_id = ?",
+                                       (FAILED, "Lease expired " + str(attempts) + " times",
+                                        now, job_id))
+                    continue
+                connection.execute("UPDATE jobs SET state = ?, attempts = ?, worker = ?, "
+                                   "lease_expires = ?, updated = ? WHERE job_id = ?",
+                                   (LEASED, attempts + 1, self.worker,
+                                    now + self.lease_seconds, now, job_id))
+                return Job(job_id, kind, key, json.loads(payload), attempts + 1)
+
+    def heartbeat(self, job, connection=None):
+        """Extends a job's lease.
+        :return:    False if the lease was lost (it ran out and another worker took the job)"""
+        now = time.time()
+        with self._transaction(connection) as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE job_id = ? AND state = ? AND worker = ? AND attempts = ?",
+                (now + self.lease_seconds, now, job.job_id, LEASED, self.worker, job.attempts))
+            return cursor.rowcount == 1
+
+    def complete(self, job):
+        """Marks a job done.
+        :return:    False if the lease had been lost, in which case the job is left alone"""
+        return self._finish(job, DONE, None)
+
+    def fail(self, job, error):
+        """Queues a job again after an error, or fails it for good if it's been leased
+        max_attempts times.
+        :return:    False if the lease had been lost, in which case the job is left alone"""
+        state = FAILED if job.attempts >= self.max_attempts else QUEUED
+        return self._finish(job, state, str(error))
+
+    def _finish(self, job, state, error):
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = ?, error = ?, lease_expires = NULL, updated = ? "
+                "WHERE job_id = ? AND state = ? AND worker = ? AND attempts = ?",
+                (state, error, time.time(), job.job_id, LEASED, self.worker, job.attempts))
+            return cursor.rowcount == 1
+
+    def retry_failed(self, kind):
+        """Queues every failed job of a kind again with its attempts reset.
+        :return:    number of jobs queued"""
+        with self._transaction() as connection:
+            cursor = connection.execute("UPDATE jobs SET state = ?, attempts = 0, updated = ? "
+                                        "WHERE kind = ? AND state = ?",
+                                        (QUEUED, time.time(), kind, FAILED))
+            return cursor.rowcount
+
+    def counts(self, kind):
+        """:return:    dict of state -> number of jobs of the kind"""
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for state, count in self.connection.execute(
+                "SELECT state, count(*) FROM jobs WHERE kind = ? GROUP BY state", (kind,)):
+            counts[state] = count
+        return counts
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _ImmediateTransaction(object):
+    """BEGIN IMMEDIATE ... COMMIT, or ROLLBACK on an exception. Taking the write lock up
+    front means two workers can't both read a job as free and lease it"""
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class Heartbeat(object):
+    """ Keeps a job's lease alive from a background thread while the job is worked on:
+
+            with Heartbeat(job_queue, job):
+                ...
+
+        lost is set if a heartbeat finds the lease has gone to another worker.
+        """
+    def __init__(self, job_queue, job, interval=None):
+        self.job_queue = job_queue
+        self.job = job
+        self.interval = interval or job_queue.lease_seconds / 3
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        # SQLite connections can't be shared between threads
+        connection = self.job_queue._connect()
+        try:
+            while not self._stop.wait(self.interval):
+                if not self.job_queue.heartbeat(self.job, connection):
+                    self.lost = True
+                    break
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,955 @@
+import importlib
+import inspect
+import os
+import pickle
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+import uuid
+from imdb_graph import DUPLICATE_KEYS, SHOW_KEY_ONLY_VARIABLE
+
+# Properties that nodes are looked up by, kept in an index like neo4j's schema indexes
+INDEXED_PROPERTIES = ('imdbNameID', 'imdbTitleID', 'imdbSeasonID', 'imdbEpisodeID', 'genreName')
+
+# Transaction function name -> in-memory implementation, see @transaction
+TRANSACTIONS = {}
+
+# Modules whose transaction functions (functions taking tx first) must all have an
+# in-memory implementation. The scripts' own can't be checked, since importing a script
+# runs it
+TRANSACTION_MODULES = ('imdb_graph', 'collaboration_queries', 'crawl_frontier',
+                       'graph_snapshot', 'write_behind')
+
+
+class MemoryDate(date):
+    """A date that can be used in place of a neo4j (neotime) Date"""
+    def to_native(self):
+        return date(self.year, self.month, self.day)
+
+
+def to_memory_date(value):
+    """Equivalent of cypher's date(): parses 'YYYY-MM-DD' strings, passes None through"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d').date()
+    return MemoryDate(value.year, value.month, value.day)
+
+
+class Node(object):
+    __slots__ = ('id', 'labels', 'props')
+
+    def __init__(self, node_id, labels, props):
+        self.id = node_id
+        self.labels = set(labels)
+        self.props = props
+
+
+class Relationship(object):
+    __slots__ = ('id', 'type', 'start', 'end', 'props')
+
+    def __init__(self, rel_id, rel_type, start, end, props):
+        self.id = rel_id
+        self.type = rel_type
+        self.start = start
+        self.end = end
+        self.props = props
+
+
+class MemoryResult(object):
+    """Stands in for a neo4j statement result: records are dicts keyed like the
+    columns of the cypher query they replace"""
+    def __init__(self, records=None):
+        self.records = list(records or [])
+
+    def peek(self):
+        return self.records[0] if self.records else None
+
+    def single(self):
+        return self.records[0] if self.records else None
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class MemoryGraph(object):
+    """ In-memory property graph that can stand in for the neo4j driver.
+
+        session() returns a MemorySession whose read_transaction and write_transaction
+        accept the same transaction functions as a neo4j session (add_episode,
+        check_neo4j_for_show, ...). Rather than running their cypher, the session runs
+        the in-memory implementation registered under the function's name in
+        TRANSACTIONS, which follows the same MATCH/MERGE semantics.
+
+        If a path is given the graph is loaded from it (if it exists) and saved back to
+        it whenever a session is closed, so a graph can be shared by scripts run one
+        after the other.
+
+        DATA MEMBERS
+        path            [string]    file the graph is persisted to, or None
+        nodes           [dict]      node id -> Node
+        relationships   [dict]      relationship id -> Relationship
+        """
+    def __init__(self, path=None):
+        self.path = path
+        self.nodes = {}
+        self.relationships = {}
+        self._index = defaultdict(set)
+        self._labels = defaultdict(set)
+        self._out = defaultdict(set)
+        self._in = defaultdict(set)
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def open(cls, path):
+        """Loads the graph saved at path, or starts an empty one that will be saved there"""
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                graph = pickle.load(f)
+            graph.path = path
+            return graph
+        return cls(path)
+
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.tmp', path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    # neo4j driver interface
+
+    def session(self):
+        return MemorySession(self)
+
+    def close(self):
+        pass
+
+    def run(self, function, *args):
+        """Runs the in-memory implementation of a transaction function"""
+        try:
+            implementation = TRANSACTIONS[function.__name__]
+        except KeyError:
+            # Those of TRANSACTION_MODULES are checked on import (see check_transactions),
+            # so only a script's own transaction functions can get here
+            raise NotImplementedError("No in-memory implementation of " + function.__name__)
+        with self._lock:
+            return implementation(self, *args)
+
+    # Graph primitives
+
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def find_nodes(self, label, **props):
+        """Returns the nodes with the label and all the given property values"""
+        candidates = self._labels.get(label, ())
+        for key in INDEXED_PROPERTIES:
+            if key in props:
+                candidates = self._index.get((key, props[key]), ())
+                break
+        found = []
+        for node_id in sorted(candidates):
+            node = self.nodes[node_id]
+            if label in node.labels and all(node.props.get(key) == value
+                                             for key, value in props.items()):
+                found.append(node)
+        return found
+
+    def find_node(self, label, **props):
+        nodes = self.find_nodes(label, **props)
+        return nodes[0] if nodes else None
+
+    def create_node(self, label, **props):
+        node = Node(self._new_id(), [label], {})
+        self.nodes[node.id] = node
+        self._labels[label].add(node.id)
+        self.set_properties(node, **props)
+        return node
+
+    def merge_node(self, label, **props):
+        """MERGE on all the given properties. Returns (node, created)"""
+        node = self.find_node(label, **props)
+        if node is not None:
+            return node, False
+        return self.create_node(label, **props), True
+
+    def set_properties(self, node, **props):
+        for key, value in props.items():
+            if key in INDEXED_PROPERTIES and key in node.props:
+                self._index[(key, node.props[key])].discard(node.id)
+            if value is None:
+                node.props.pop(key, None)
+                continue
+            node.props[key] = value
+            if key in INDEXED_PROPERTIES:
+                self._index[(key, value)].add(node.id)
+
+    def delete_node(self, node):
+        """DETACH DELETE"""
+        for rel_id in list(self._out[node.id]) + list(self._in[node.id]):
+            if rel_id in self.relationships:
+                self.delete_relationship(self.relationships[rel_id])
+        self.set_properties(node, **{key: None for key in INDEXED_PROPERTIES})
+        for label in node.labels:
+            self._labels[label].discard(node.id)
+        del self.nodes[node.id]
+        self._out.pop(node.id, None)
+        self._in.pop(node.id, None)
+
+    def relationships_of(self, node, rel_type=None, direction='out'):
+        """Returns a node's relationships. direction is 'out', 'in' or 'both'"""
+        rel_ids = set()
+        if direction in ('out', 'both'):
+            rel_ids.update(self._out[node.id])
+        if direction in ('in', 'both'):
+            rel_ids.update(self._in[node.id])
+        rels = [self.relationships[rel_id] for rel_id in sorted(rel_ids)]
+        if rel_type is not None:
+            rels = [rel for rel in rels if rel.type == rel_type]
+        return rels
+
+    def neighbours(self, node, rel_type, direction='out', label=None):
+        """Returns (relationship, other node) pairs"""
+        pairs = []
+        for rel in self.relationships_of(node, rel_type, direction):
+            other = self.nodes[rel.end if rel.start == node.id else rel.start]
+            if label is None or label in other.labels:
+                pairs.append((rel, other))
+        return pairs
+
+    def create_relationship(self, start, rel_type, end, **props):
+        rel = Relationship(self._new_id(), rel_type, start.id, end.id, props)
+        self.relationships[rel.id] = rel
+        self._out[start.id].add(rel.id)
+        self._in[end.id].add(rel.id)
+        return rel
+
+    def merge_relationship(self, start, rel_type, end, undirected=False, **props):
+        """MERGE (start)-[:rel_type {props}]->(end). Returns (relationship, created)"""
+        direction = 'both' if undirected else 'out'
+        for rel, other in self.neighbours(start, rel_type, direction):
+            if other.id == end.id and all(rel.props.get(key) == value
+                                          for key, value in props.items()):
+                return rel, False
+        return self.create_relationship(start, rel_type, end, **props), True
+
+    def delete_relationship(self, rel):
+        del self.relationships[rel.id]
+        self._out[rel.start].discard(rel.id)
+        self._in[rel.end].discard(rel.id)
+
+
+class MemorySession(object):
+    def __init__(self, graph):
+        self.graph = graph
+        self.closed = False
+
+    def read_transaction(self, function, *args):
+        return self.graph.run(function, *args)
+
+    def write_transaction(self, function, *args):
+        return self.graph.run(function, *args)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.graph.path:
+                self.graph.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def transaction(function):
+    """Registers function as the in-memory implementation of the transaction function
+    with the same name"""
+    TRANSACTIONS[function.__name__] = function
+    return function
+
+
+def _uuid():
+    return str(uuid.uuid4())
+
+
+# In-memory implementations of the transaction functions in imdb_to_neo4j.py and the
+# scripts. Each takes the graph followed by the transaction function's arguments.
+
+@transaction
+def _run_transactions(graph, transactions):
+    # Transactions grouped by WriteBehindBuffer.write()
+    for transaction_args in transactions:
+        graph.run(transaction_args[0], *transaction_args[1:])
+
+
+@transaction
+def add_genre(graph, genre_name):
+    genre, created = graph.merge_node('Genre', genreName=genre_name)
+    if created:
+        graph.set_properties(genre, uuid=_uuid())
+
+
+@transaction
+def add_person(graph, person):
+    node, created = graph.merge_node('Person', imdbNameID=person.imdb_name_id)
+    if created:
+        graph.set_properties(node, createdDate=datetime.now(), uuid=_uuid(),
+                             fullName=person.full_name)
+
+
+@transaction
+def get_crew_list(graph, label):
+    return MemoryResult({'p.imdbNameID': node.props.get('imdbNameID'),
+                         'p.fullName': node.props.get('fullName')}
+                        for node in graph.find_nodes(label))
+
+
+@transaction
+def get_filmography_fingerprint(graph, imdb_name_id):
+    return MemoryResult({'p.filmographyFingerprint': node.props.get('filmographyFingerprint'),
+                         'p.creditFingerprints': node.props.get('creditFingerprints')}
+                        for node in graph.find_nodes('Person', imdbNameID=imdb_name_id))
+
+
+@transaction
+def set_filmography_fingerprint(graph, person, filmography_fingerprint, fingerprints):
+    node, created = graph.merge_node('Person', imdbNameID=person.imdb_name_id)
+    if created:
+        graph.set_properties(node, createdDate=datetime.now(), uuid=_uuid(),
+                             fullName=person.full_name)
+    graph.set_properties(node, filmographyFingerprint=filmography_fingerprint,
+                         creditFingerprints=[key + "=" + fingerprint for key, fingerprint
+                                             in sorted(fingerprints.items())],
+                         fingerprintDate=datetime.now())
+
+
+@transaction
+def check_neo4j_for_episode(graph, episode):
+    return MemoryResult({'e.seasonNum': node.props.get('seasonNum'),
+                         'e.episodeNum': node.props.get('episodeNum'),
+                         'e.airDate': node.props.get('airDate')}
+                        for node in graph.find_nodes('Episode',
+                                                     imdbEpisodeID=episode.imdb_episode_id))
+
+
+@transaction
+def check_neo4j_for_episode_genre(graph, episode):
+    records = []
+    for node in graph.find_nodes('Episode', imdbEpisodeID=episode.imdb_episode_id):
+        for _, genre in graph.neighbours(node, 'HAS_GENRE', label='Genre'):
+            records.append({'g.genreName': genre.props.get('genreName')})
+    return MemoryResult(records)
+
+
+@transaction
+def set_crew_scraped(graph, imdb_title_id):
+    for show in graph.find_nodes('Show', imdbTitleID=imdb_title_id):
+        show.props['crewScrapedDate'] = datetime.now()
+
+
+@transaction
+def get_episodes(graph, imdb_episode_ids):
+    records = []
+    for imdb_episode_id in imdb_episode_ids:
+        for node in graph.find_nodes('Episode', imdbEpisodeID=imdb_episode_id):
+            records.append({'imdbEpisodeID': imdb_episode_id,
+                            'seasonNum': node.props.get('seasonNum'),
+                            'episodeNum': node.props.get('episodeNum'),
+                            'airDate': node.props.get('airDate'),
+                            'genres': [genre.props.get('genreName') for _, genre
+                                       in graph.neighbours(node, 'HAS_GENRE', label='Genre')]})
+    return MemoryResult(records)
+
+
+@transaction
+def check_neo4j_for_show(graph, show):
+    return MemoryResult({'s.showTitle': node.props.get('showTitle')}
+                        for node in graph.find_nodes('Show', imdbTitleID=show.imdb_title_id))
+
+
+@transaction
+def check_neo4j_for_season(graph, season):
+    # The query returns firstAirDate/lastAirDate, which aren't the stored property names
+    return MemoryResult({'se.seasonTitle': node.props.get('seasonTitle'),
+                         'se.firstAirDate': node.props.get('firstAirDate'),
+                         'se.lastAirDate': node.props.get('lastAirDate')}
+                        for node in graph.find_nodes('Season',
+                                                     imdbSeasonID=season.imdb_season_id))
+
+
+@transaction
+def get_seasons_of_show(graph, imdb_title_id):
+    return MemoryResult({'imdbSeasonID': season.props.get('imdbSeasonID'),
+                         'roughStart': season.props.get('roughStart'),
+                         'roughEnd': season.props.get('roughEnd')}
+                        for show_node in graph.find_nodes('Show', imdbTitleID=imdb_title_id)
+                        for _, season in graph.neighbours(show_node, 'SEASON_OF', 'in'))
+
+
+@transaction
+def get_shows_with_seasons(graph, imdb_title_ids):
+    records = []
+    for imdb_title_id in imdb_title_ids:
+        for show_node in graph.find_nodes('Show', imdbTitleID=imdb_title_id):
+            seasons = [season for _, season in graph.neighbours(show_node, 'SEASON_OF', 'in')]
+            for season in seasons or [None]:
+                props = season.props if season is not None else {}
+                records.append({'imdbTitleID': imdb_title_id,
+                                'imdbSeasonID': props.get('imdbSeasonID'),
+                                'roughStart': props.get('roughStart'),
+                                'roughEnd': props.get('roughEnd')})
+    return MemoryResult(records)
+
+
+@transaction
+def check_neo4j_for_season_years(graph, show, start_year, end_year):
+    start = to_memory_date(str(start_year) + '-01-01')
+    end = to_memory_date(str(end_year) + '-01-01')
+    records = []
+    for show_node in graph.find_nodes('Show', imdbTitleID=show.imdb_title_id):
+        for _, season in graph.neighbours(show_node, 'SEASON_OF', 'in'):
+            rough_start = season.props.get('roughStart')
+            rough_end = season.props.get('roughEnd')
+            if rough_start and rough_end and start <= rough_end and rough_start <= end:
+                records.append({'imdbSeasonID': season.props.get('imdbSeasonID'),
+                                'roughStart': rough_start, 'roughEnd': rough_end})
+    return MemoryResult(records)
+
+
+@transaction
+def add_episode(graph, episode):
+    node, created = graph.merge_node('Episode', imdbEpisodeID=episode.imdb_episode_id)
+    if created:
+        graph.set_properties(node, createdDate=datetime.now(),
+                             imdbSeasonID=episode.imdb_season_id,
+                             imdbTitleID=episode.imdb_title_id,
+                             seasonNum=episode.season_num, episodeNum=episode.episode_num,
+                             airDate=to_memory_date(episode.airdate_string),
+                             episodeTitle=episode.episode_title, uuid=_uuid())
+    for season in graph.find_nodes('Season', imdbSeasonID=episode.imdb_season_id):
+        graph.merge_relationship(node, 'EPISODE_OF', season)
+
+
+@transaction
+def add_genre_to_episode(graph, episode):
+    for genre_name in episode.genre_list or []:
+        for node in graph.find_nodes('Episode', imdbEpisodeID=episode.imdb_episode_id):
+            for genre in graph.find_nodes('Genre', genreName=genre_name):
+                graph.merge_relationship(node, 'HAS_GENRE', genre)
+
+
+@transaction
+def add_season(graph, season, source):
+    node, created = graph.merge_node('Season', imdbSeasonID=season.imdb_season_id)
+    if created:
+        graph.set_properties(node, createdDate=datetime.now(), source=source,
+                             seasonTitle=season.season_title, seasonNumber=season.season_num,
+                             firstAirdate=to_memory_date(season.first_airdate),
+                             lastAirdate=to_memory_date(season.last_airdate),
+                             roughStart=to_memory_date(season.rough_start),
+                             roughEnd=to_memory_date(season.rough_end), uuid=_uuid())
+
+
+@transaction
+def add_season_of(graph, season, show):
+    for season_node in graph.find_nodes('Season', imdbSeasonID=season.imdb_season_id):
+        for show_node in graph.find_nodes('Show', imdbTitleID=show.imdb_title_id):
+            graph.merge_relationship(season_node, 'SEASON_OF', show_node)
+
+
+@transaction
+def add_show(graph, show, source):
+    if os.environ.get(SHOW_KEY_ONLY_VARIABLE):
+        node, created = graph.merge_node('Show', imdbTitleID=show.imdb_title_id)
+        if created:
+            graph.set_properties(node, showTitle=show.show_title)
+    else:
+        node, created = graph.merge_node('Show', imdbTitleID=show.imdb_title_id,
+                                         showTitle=show.show_title)
+    if created:
+        graph.set_properties(node, createdDate=datetime.now(), source=source, uuid=_uuid())
+    for genre in show.genre_list:
+        add_has_genre(graph, show.imdb_title_id, genre, source)
+
+
+@transaction
+def add_has_genre(graph, imdb_title_id, genre_name, source):
+    for show in graph.find_nodes('Show', imdbTitleID=imdb_title_id):
+        for genre in graph.find_nodes('Genre', genreName=genre_name):
+            rel, created = graph.merge_relationship(show, 'HAS_GENRE', genre)
+            if created:
+                rel.props.update(createdDate=datetime.now(), source=source)
+
+
+def _add_worked_on(graph, imdb_name_id, job_title, source, label, **target):
+    records = []
+    for person in graph.find_nodes('Person', imdbNameID=imdb_name_id):
+        for node in graph.find_nodes(label, **target):
+            rel, created = graph.merge_relationship(person, 'WORKED_ON', node,
+                                                    jobTitle=job_title)
+            if created:
+                rel.props.update(createdDate=datetime.now(), source=source)
+            records.append({'r.createdDate': rel.props.get('createdDate')})
+    return MemoryResult(records)
+
+
+@transaction
+def add_worked_on_show(graph, imdb_name_id, job_title, imdb_title_id, source):
+    _add_worked_on(graph, imdb_name_id, job_title, source, 'Show', imdbTitleID=imdb_title_id)
+
+
+@transaction
+def add_worked_on_season(graph, imdb_name_id, job_title, imdb_season_id, source):
+    return _add_worked_on(graph, imdb_name_id, job_title, source, 'Season',
+                          imdbSeasonID=imdb_season_id)
+
+
+@transaction
+def bump_graph_version(graph):
+    version, _ = graph.merge_node('GraphVersion', name='graph')
+    version.props.update(version=version.props.get('version', 0) + 1,
+                         updatedDate=datetime.now())
+
+
+@transaction
+def get_graph_version(graph):
+    versions = [node.props.get('version', 0) for node in graph.find_nodes('GraphVersion')]
+    return MemoryResult([{'version': max(versions) if versions else None}])
+
+
+@transaction
+def find_duplicates(graph, label):
+    key = DUPLICATE_KEYS[label][0]
+    groups = defaultdict(list)
+    for node_id in sorted(graph._labels.get(label, ())):
+        node = graph.nodes[node_id]
+        if node.props.get(key) is not None:
+            groups[node.props[key]].append(node)
+    records = []
+    for value, nodes in groups.items():
+        if len(nodes) > 1:
+            nodes.sort(key=lambda node: (node.props.get('createdDate') is None,
+                                         node.props.get('createdDate') or datetime.min,
+                                         node.id))
+            records.append({'key': value, 'nodeIDs': [node.id for node in nodes]})
+    return MemoryResult(records)
+
+
+@transaction
+def merge_duplicates(graph, label, groups):
+    nodes = [graph.nodes[node_id] for group in groups for node_id in group
+             if node_id in graph.nodes]
+    before = sum(len(graph.relationships_of(node, direction='both')) for node in nodes)
+    deleted = 0
+    for group in groups:
+        keep = graph.nodes[group[0]]
+        for node_id in group[1:]:
+            drop = graph.nodes[node_id]
+            for rel_type, direction, rel_key in DUPLICATE_KEYS[label][1]:
+                for rel, other in graph.neighbours(drop, rel_type, direction):
+                    match = {rel_key: rel.props.get(rel_key)} if rel_key else {}
+                    if direction == 'in':
+                        moved, created = graph.merge_relationship(other, rel_type, keep,
+                                                                  **match)
+                    else:
+                        moved, created = graph.merge_relationship(keep, rel_type, other,
+                                                                  **match)
+                    if created:
+                        moved.props.update(rel.props)
+                    moved.props['updatedDate'] = datetime.now()
+                    graph.delete_relationship(rel)
+            if not graph.relationships_of(drop, direction='both'):
+                graph.delete_node(drop)
+                deleted += 1
+    nodes = [node for node in nodes if node.id in graph.nodes]
+    after = sum(len(graph.relationships_of(node, direction='both')) for node in nodes)
+    return MemoryResult([{'relationshipsBefore': before, 'relationshipsAfter': after,
+                          'nodesDeleted': deleted}])
+
+
+@transaction
+def update_worked_with(graph, person):
+    # add_worked_with.py: create WORKED_WITH between people who share a season and
+    # aren't connected yet, with the aggregates of the seasons they share
+    records = []
+    for p1 in graph.find_nodes('Person', imdbNameID=person.imdb_name_id):
+        connected = {other.id for _, other in graph.neighbours(p1, 'WORKED_WITH', 'both')}
+        shared = defaultdict(dict)
+        for _, season in graph.neighbours(p1, 'WORKED_ON', label='Season'):
+            for _, p2 in graph.neighbours(season, 'WORKED_ON', 'in'):
+                if p2.id != p1.id and p2.id not in connected:
+                    shared[p2.id][season.id] = season
+        for p2_id in sorted(shared):
+            p2 = graph.nodes[p2_id]
+            seasons = sorted(shared[p2_id].values(),
+                             key=lambda se: se.props.get('roughStart') or date.min,
+                             reverse=True)
+            aggregates = season_aggregates(seasons)
+            if aggregates['startDate'] is None or aggregates['endDate'] is None:
+                continue
+            rel, created = graph.merge_relationship(p1, 'WORKED_WITH', p2)
+            if created:
+                rel.props.update(aggregates, createdDate=datetime.now(), uuid=_uuid())
+            records.append(dict(aggregates, name1=p1.props.get('fullName'),
+                                name2=p2.props.get('fullName')))
+    return MemoryResult(records)
+
+
+@transaction
+def get_seasons_worked_on_since(graph, since):
+    since = datetime.fromisoformat(since) if since is not None else None
+    latest = {}
+    for rel in graph.relationships.values():
+        if rel.type != 'WORKED_ON' or 'Person' not in graph.nodes[rel.start].labels:
+            continue
+        season = graph.nodes[rel.end]
+        created = rel.props.get('updatedDate') or rel.props.get('createdDate')
+        if 'Season' not in season.labels or (since is not None and
+                                             (created is None or created <= since)):
+            continue
+        imdb_season_id = season.props.get('imdbSeasonID')
+        if imdb_season_id not in latest or (created is not None and
+                                            (latest[imdb_season_id] is None or
+                                             created > latest[imdb_season_id])):
+            latest[imdb_season_id] = created
+    dates = [created for created in latest.values() if created is not None]
+    watermark = max(dates).isoformat() if dates else None
+    return MemoryResult({'imdbSeasonID': imdb_season_id, 'watermark': watermark}
+                        for imdb_season_id in latest)
+
+
+@transaction
+def refresh_worked_with(graph, imdb_season_ids):
+    # add_worked_with.py incremental mode: recompute WORKED_WITH for every pair on the
+    # seasons over all their shared seasons, updating existing relationships either way round
+    pairs = set()
+    for imdb_season_id in imdb_season_ids:
+        for season in graph.find_nodes('Season', imdbSeasonID=imdb_season_id):
+            people = [p for _, p in graph.neighbours(season, 'WORKED_ON', 'in', label='Person')]
+            for p1 in people:
+                for p2 in people:
+                    if (p1.props.get('imdbNameID') is not None and
+                            p2.props.get('imdbNameID') is not None and
+                            p1.props['imdbNameID'] < p2.props['imdbNameID']):
+                        pairs.add((p1.id, p2.id))
+    records = []
+    for p1_id, p2_id in sorted(pairs):
+        p1 = graph.nodes[p1_id]
+        p2 = graph.nodes[p2_id]
+        seasons = {season.id: season
+                   for _, season in graph.neighbours(p1, 'WORKED_ON', label='Season')
+                   if any(other.id == p2.id
+                          for _, other in graph.neighbours(season, 'WORKED_ON', 'in'))}
+        seasons = sorted(seasons.values(),
+                         key=lambda se: se.props.get('roughStart') or date.min, reverse=True)
+        aggregates = season_aggregates(seasons)
+        if aggregates['startDate'] is None or aggregates['endDate'] is None:
+            continue
+        rel, created = graph.merge_relationship(p1, 'WORKED_WITH', p2, undirected=True)
+        rel.props.update(aggregates)
+        if not created:
+            rel.props['updatedDate'] = datetime.now()
+        if created:
+            rel.props.update(createdDate=datetime.now(), uuid=_uuid())
+        records.append(dict(aggregates, name1=p1.props.get('fullName'),
+                            name2=p2.props.get('fullName'), created=created))
+    return MemoryResult(records)
+
+
+@transaction
+def refresh_collaboration_years(graph, imdb_season_ids):
+    # add_collaboration_years.py: replace the WORKED_WITH_YEAR relationships of every
+    # pair on the seasons with the number of shared seasons running in each year
+    pairs = set()
+    for imdb_season_id in imdb_season_ids:
+        for season in graph.find_nodes('Season', imdbSeasonID=imdb_season_id):
+            people = [p for _, p in graph.neighbours(season, 'WORKED_ON', 'in', label='Person')]
+            for p1 in people:
+                for p2 in people:
+                    if (p1.props.get('imdbNameID') is not None and
+                            p2.props.get('imdbNameID') is not None and
+                            p1.props['imdbNameID'] < p2.props['imdbNameID']):
+                        pairs.add((p1.id, p2.id))
+    records = []
+    for p1_id, p2_id in sorted(pairs):
+        p1 = graph.nodes[p1_id]
+        p2 = graph.nodes[p2_id]
+        for rel, other in graph.neighbours(p1, 'WORKED_WITH_YEAR'):
+            if other.id == p2.id:
+                graph.delete_relationship(rel)
+        years = defaultdict(set)
+        for _, season in graph.neighbours(p1, 'WORKED_ON', label='Season'):
+            start = season.props.get('roughStart')
+            if start is None or not any(other.id == p2.id for _, other
+                                        in graph.neighbours(season, 'WORKED_ON', 'in')):
+                continue
+            end = season.props.get('roughEnd') or start
+            for year in range(start.year, end.year + 1):
+                years[year].add(season.id)
+        if not years:
+            continue
+        for year in sorted(years):
+            graph.create_relationship(p1, 'WORKED_WITH_YEAR', p2, year=year,
+                                      seasons_in_common=len(years[year]),
+                                      createdDate=datetime.now())
+        records.append({'imdbNameID1': p1.props['imdbNameID'],
+                        'imdbNameID2': p2.props['imdbNameID'], 'years': len(years)})
+    return MemoryResult(records)
+
+
+def season_aggregates(seasons):
+    """startDate, endDate, seasons_in_common and season_list of WORKED_WITH for a list of
+    shared Season nodes ordered by roughStart descending"""
+    starts = [se.props['roughStart'] for se in seasons if se.props.get('roughStart')]
+    ends = [se.props['roughEnd'] for se in seasons if se.props.get('roughEnd')]
+    season_list = []
+    for se in seasons:
+        if se.props.get('seasonTitle') is not None and se.props.get('roughStart'):
+            entry = se.props['seasonTitle'] + ' (' + str(se.props['roughStart'].year) + ')'
+            if entry not in season_list:
+                season_list.append(entry)
+    return {'startDate': min(starts) if starts else None,
+            'endDate': max(ends) if ends else None,
+            'seasons_in_common': len(seasons),
+            'season_list': season_list[:5]}
+
+
+# graph_snapshot.py paged reads
+
+def _page(nodes, after, limit):
+    return [node for node in sorted(nodes, key=lambda node: node.id) if node.id > after][:limit]
+
+
+@transaction
+def get_person_page(graph, after, limit):
+    return MemoryResult({'nodeID': node.id, 'imdbNameID': node.props.get('imdbNameID'),
+                         'fullName': node.props.get('fullName')}
+                        for node in _page(graph.find_nodes('Person'), after, limit))
+
+
+@transaction
+def get_show_page(graph, after, limit):
+    return MemoryResult({'nodeID': node.id, 'imdbTitleID': node.props.get('imdbTitleID'),
+                         'showTitle': node.props.get('showTitle')}
+                        for node in _page(graph.find_nodes('Show'), after, limit))
+
+
+@transaction
+def get_season_page(graph, after, limit):
+    records = []
+    for node in _page(graph.find_nodes('Season'), after, limit):
+        shows = [show.props.get('imdbTitleID')
+                 for _, show in graph.neighbours(node, 'SEASON_OF', label='Show')]
+        records.append({'nodeID': node.id, 'imdbSeasonID': node.props.get('imdbSeasonID'),
+                        'seasonTitle': node.props.get('seasonTitle'),
+                        'startYear': _year(node.props.get('roughStart')),
+                        'endYear': _year(node.props.get('roughEnd')),
+                        'imdbTitleID': shows[0] if shows else None})
+    return MemoryResult(records)
+
+
+@transaction
+def get_person_edge_page(graph, after, limit):
+    records = []
+    for node in _page(graph.find_nodes('Person'), after, limit):
+        worked_on = graph.neighbours(node, 'WORKED_ON')
+        records.append({
+            'nodeID': node.id, 'imdbNameID': node.props.get('imdbNameID'),
+            'seasons': [[other.props.get('imdbSeasonID'), rel.props.get('jobTitle')]
+                        for rel, other in worked_on if 'Season' in other.labels],
+            'shows': [[other.props.get('imdbTitleID'), rel.props.get('jobTitle')]
+                      for rel, other in worked_on if 'Show' in other.labels],
+            'workedWith': [[other.props.get('imdbNameID'), rel.props.get('seasons_in_common'),
+                            _year(rel.props.get('startDate')), _year(rel.props.get('endDate'))]
+                           for rel, other in graph.neighbours(node, 'WORKED_WITH', label='Person')]
+        })
+    return MemoryResult(records)
+
+
+def _year(value):
+    return value.year if value is not None else None
+
+
+# crawl_frontier.py candidates
+
+@transaction
+def get_person_candidates(graph):
+    records = []
+    for node in graph.find_nodes('Person'):
+        unscraped = {other.id
+                     for _, season in graph.neighbours(node, 'WORKED_ON', label='Season')
+                     for _, other in graph.neighbours(season, 'WORKED_ON', 'in')
+                     if 'Person' in other.labels and other.id != node.id and
+                     other.props.get('fingerprintDate') is None}
+        records.append({'imdbID': node.props.get('imdbNameID'),
+                        'name': node.props.get('fullName'),
+                        'reach': len(unscraped),
+                        'scrapedDate': node.props.get('fingerprintDate')})
+    return MemoryResult(records)
+
+
+@transaction
+def get_title_candidates(graph, typical_crew):
+    records = []
+    for node in graph.find_nodes('Show'):
+        reach = 0
+        for _, season in graph.neighbours(node, 'SEASON_OF', 'in', label='Season'):
+            crew = {person.id for _, person in graph.neighbours(season, 'WORKED_ON', 'in')
+                    if 'Person' in person.labels}
+            reach += max(0, typical_crew - len(crew))
+        records.append({'imdbID': node.props.get('imdbTitleID'),
+                        'name': node.props.get('showTitle'),
+                        'scrapedDate': node.props.get('crewScrapedDate'),
+                        'reach': reach})
+    return MemoryResult(records)
+
+
+# collaboration_queries.py
+
+@transaction
+def get_collaborators(graph, imdb_name_id):
+    records = []
+    for node in graph.find_nodes('Person', imdbNameID=imdb_name_id):
+        for rel, other in graph.neighbours(node, 'WORKED_WITH', 'both', label='Person'):
+            records.append({'imdbNameID': other.props.get('imdbNameID'),
+                            'fullName': other.props.get('fullName'),
+                            'seasonsInCommon': rel.props.get('seasons_in_common'),
+                            'startDate': rel.props.get('startDate'),
+                            'endDate': rel.props.get('endDate')})
+    records.sort(key=lambda record: (-(record['seasonsInCommon'] or 0),
+                                     record['fullName'] or ''))
+    return MemoryResult(records)
+
+
+@transaction
+def get_ego_network(graph, imdb_name_id):
+    members = {}
+    for node in graph.find_nodes('Person', imdbNameID=imdb_name_id):
+        for _, other in graph.neighbours(node, 'WORKED_WITH', 'both', label='Person'):
+            members[other.id] = other
+    records = []
+    for member in members.values():
+        records.append({'imdbNameID': member.props.get('imdbNameID'),
+                        'fullName': member.props.get('fullName'),
+                        'workedWith': [other.props.get('imdbNameID') for _, other
+                                       in graph.neighbours(member, 'WORKED_WITH')
+                                       if other.id in members]})
+    records.sort(key=lambda record: record['imdbNameID'])
+    return MemoryResult(records)
+
+
+@transaction
+def get_shared_seasons(graph, imdb_name_id1, imdb_name_id2):
+    seasons = {}
+    for node1 in graph.find_nodes('Person', imdbNameID=imdb_name_id1):
+        for _, season in graph.neighbours(node1, 'WORKED_ON', label='Season'):
+            for _, node2 in graph.neighbours(season, 'WORKED_ON', 'in'):
+                if node2.props.get('imdbNameID') == imdb_name_id2:
+                    seasons[season.id] = season
+    return MemoryResult({'imdbSeasonID': season.props.get('imdbSeasonID'),
+                         'seasonTitle': season.props.get('seasonTitle'),
+                         'roughStart': season.props.get('roughStart')}
+                        for season in sorted(seasons.values(),
+                                             key=lambda se: se.props.get('roughStart') or date.min))
+
+
+@transaction
+def get_collaboration_path(graph, imdb_name_id1, imdb_name_id2, max_length):
+    starts = graph.find_nodes('Person', imdbNameID=imdb_name_id1)
+    goals = {node.id for node in graph.find_nodes('Person', imdbNameID=imdb_name_id2)}
+    if not starts or not goals:
+        return MemoryResult()
+    # Breadth-first search, like shortestPath
+    came_from = {starts[0].id: None}
+    frontier = [starts[0]]
+    for _ in range(max_length):
+        next_frontier = []
+        for node in frontier:
+            for _, other in graph.neighbours(node, 'WORKED_WITH', 'both', label='Person'):
+                if other.id not in came_from:
+                    came_from[other.id] = node.id
+                    next_frontier.append(other)
+        frontier = next_frontier
+        goal = next((node_id for node_id in goals if node_id in came_from), None)
+        if goal is not None:
+            names = []
+            while goal is not None:
+                names.append(graph.nodes[goal].props.get('fullName'))
+                goal = came_from[goal]
+            return MemoryResult([{'names': names[::-1]}])
+    return MemoryResult()
+
+
+@transaction
+def get_collaborators_in_years(graph, imdb_name_id, first_year, last_year):
+    years = defaultdict(list)
+    for node in graph.find_nodes('Person', imdbNameID=imdb_name_id):
+        for rel, other in graph.neighbours(node, 'WORKED_WITH_YEAR', 'both', label='Person'):
+            if first_year <= rel.props['year'] <= last_year:
+                years[other.id].append([rel.props['year'], rel.props.get('seasons_in_common')])
+    records = [{'imdbNameID': graph.nodes[other_id].props.get('imdbNameID'),
+                'fullName': graph.nodes[other_id].props.get('fullName'),
+                'years': sorted(other_years)}
+               for other_id, other_years in years.items()]
+    records.sort(key=lambda record: (-len(record['years']), record['fullName'] or ''))
+    return MemoryResult(records)
+
+
+@transaction
+def get_collaborations_in_years(graph, first_year, last_year, min_years):
+    pairs = defaultdict(lambda: [0, 0])
+    for rel in graph.relationships.values():
+        if rel.type == 'WORKED_WITH_YEAR' and first_year <= rel.props['year'] <= last_year:
+            pair = pairs[(graph.nodes[rel.start].props.get('imdbNameID'),
+                          graph.nodes[rel.end].props.get('imdbNameID'))]
+            pair[0] += 1
+            pair[1] += rel.props.get('seasons_in_common') or 0
+    return MemoryResult({'imdbNameID1': pair[0], 'imdbNameID2': pair[1],
+                         'years': years, 'seasonYears': season_years}
+                        for pair, (years, season_years) in sorted(pairs.items())
+                        if years >= min_years)
+
+
+@transaction
+def get_collaboration_years(graph, imdb_name_id1, imdb_name_id2):
+    records = []
+    for node1 in graph.find_nodes('Person', imdbNameID=imdb_name_id1):
+        for rel, node2 in graph.neighbours(node1, 'WORKED_WITH_YEAR', 'both'):
+            if node2.props.get('imdbNameID') == imdb_name_id2:
+                records.append({'year': rel.props['year'],
+                                'seasonsInCommon': rel.props.get('seasons_in_common')})
+    records.sort(key=lambda record: record['year'])
+    return MemoryResult(records)
+
+
+def check_transactions():
+    """Raises ImportError if a transaction function of TRANSACTION_MODULES has no in-memory
+    implementation, so a new or renamed one fails as soon as the memory graph is loaded
+    rather than partway through a run"""
+    missing = []
+    for module_name in TRANSACTION_MODULES:
+        module = importlib.import_module(module_name)
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if function.__module__ != module_name or name in TRANSACTIONS:
+                continue
+            if list(inspect.signature(function).parameters)[:1] == ['tx']:
+                missing.append(module_name + '.' + name)
+    if missing:
+        raise ImportError("No in-memory implementation of " + ", ".join(missing))
+
+
+check_transactions()
@@ -0,0 +1,292 @@
+import threading
+import imdb_to_neo4j as i2n
+
+# States of a prefetched page
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+# An episode the episode lookup can place, which is left to the credit to resolve
+LOOKUP = 'lookup'
+
+
+class _Entry(object):
+    """ A page the Prefetcher has fetched, is fetching, or has looked up in neo4j
+
+        DATA MEMBERS
+        state           [string]    PENDING, READY, FAILED or LOOKUP
+        value           the fetched Page for a name page, the Episode for an episode (filled
+                        in by its EpisodePage once fetched), the ShowPage for a title
+        needs_write     [bool]      for episodes, True if it came from a page fetched ahead
+                                    and hasn't been written to neo4j yet
+        taken           [int]       number of times it's been taken
+        needed_by       [int]       position in the crew list of the last person looked
+                                    ahead at who needs it
+        """
+    __slots__ = ('state', 'value', 'needs_write', 'taken', 'needed_by')
+
+    def __init__(self, state, value=None, needs_write=False, needed_by=0):
+        self.state = state
+        self.value = value
+        self.needs_write = needs_write
+        self.taken = 0
+        self.needed_by = needed_by
+
+
+class Prefetcher(object):
+    """ Looks a number of people ahead in a crew list while the current person is scraped,
+        so the pages they'll need are loaded before they're needed.
+
+        The name pages of the next `depth` people are fetched in the background. As they
+        arrive, the episodes and titles their credits link to are gathered across all of
+        them and deduplicated: episodes seen already, or placed by the episode lookup, are
+        left out, and the rest are looked up in neo4j in one query. The episode pages of
+        the misses, and the show pages of credits without episodes, are then fetched in
+        the background, so an episode shared by colleagues on the same show is only ever
+        fetched once. Credits with at least EPISODE_LIST_THRESHOLD misses are left alone,
+        since they're cheaper to resolve from the show's episode list pages.
+
+        NamePage and Credit take what they need with take_name_page, take_episode and
+        take_genres, waiting for it if it's still being fetched, and fall back to loading
+        it themselves if it was never prefetched or its fetch failed. Episodes and titles
+        are dropped once everyone looked ahead at who needs them has been scraped, so only
+        the window's pages are held. Everything runs on the main thread apart from the
+        fetches themselves, since neo4j sessions, the episode lookup and the credit cache
+        aren't thread safe.
+
+        DATA MEMBERS
+        crew_list       [list]      Person objects in the order they're scraped
+        depth           [int]       number of people looked ahead
+        fetch_pool      FetchPool the pages are fetched with
+        session         neo4j session the episodes are looked up with
+        episode_lookup  optional EpisodeLookup
+        credit_cache    optional CreditCache; people whose page it has aren't looked ahead
+        stats           [dict]      counts of what was prefetched and used, see report()
+        """
+    def __init__(self, crew_list, depth, fetch_pool, session, episode_lookup=None,
+                 credit_cache=None):
+        self.crew_list = crew_list
+        self.depth = depth
+        self.fetch_pool = fetch_pool
+        self.session = session
+        self.episode_lookup = episode_lookup
+        self.credit_cache = credit_cache
+        self.stats = {'name pages': 0, 'episode pages': 0, 'show pages': 0,
+                      'episodes in neo4j': 0, 'episodes shared': 0, 'waits': 0}
+        self._submitted = 0
+        self._name_pages = {}
+        self._episodes = {}
+        self._genres = {}
+        self._arrived = []
+        self._condition = threading.Condition()
+
+    def look_ahead(self, position):
+        """Call before scraping crew_list[position]: fetches the name pages of the people
+        after it, and schedules the pages needed by any that have arrived"""
+        self._evict(position)
+        self._submitted = max(self._submitted, position + 1)
+        while self._submitted < min(position + 1 + self.depth, len(self.crew_list)):
+            crew = self.crew_list[self._submitted]
+            self._submitted += 1
+            if crew.imdb_name_id in self._name_pages:
+                continue
+            self._name_pages[crew.imdb_name_id] = _Entry(PENDING)
+            self.fetch_pool.submit(i2n.fetch_name_page, crew,
+                                   self._finisher(self._name_pages[crew.imdb_name_id],
+                                                  self._submitted - 1))
+        self._schedule_arrived()
+
+    def _evict(self, position):
+        """Drops the episodes and titles no one from position on needs"""
+        for entries in (self._episodes, self._genres):
+            done = [key for key, entry in entries.items()
+                    if entry is not None and entry.state != PENDING and
+                    entry.needed_by < position]
+            for key in done:
+                del entries[key]
+
+    def _finisher(self, entry, position=None):
+        """Callback for FetchPool.submit, run on the fetching thread. Name pages, given
+        the position of their person, are also queued for _schedule_arrived"""
+        def finish(result, error):
+            with self._condition:
+                if error is not None or getattr(result, 'blocked', False):
+                    entry.state = FAILED
+                else:
+                    entry.state = READY
+                    # Episodes are filled in where they are
+                    if entry.value is None:
+                        entry.value = result
+                    if position is not None:
+                        self._arrived.append((position, result))
+                self._condition.notify_all()
+        return finish
+
+    def _schedule_arrived(self):
+        with self._condition:
+            pages, self._arrived = self._arrived, []
+        new_credits = []
+        for position, page in pages:
+            if self.credit_cache and self.credit_cache.has(page.imdb_id,
+                                                           page.filmography_fingerprint):
+                continue
+            for div in i2n.credit_divs(page.soup):
+                imdb_title_id, imdb_episode_ids = i2n.credit_references(div)
+                if not imdb_episode_ids:
+                    self._fetch_genres(imdb_title_id, position)
+                    continue
+                new_ids = []
+                for imdb_episode_id in imdb_episode_ids:
+                    entry = self._episodes.get(imdb_episode_id)
+                    if entry is None:
+                        new_ids.append(imdb_episode_id)
+                    else:
+                        entry.needed_by = max(entry.needed_by, position)
+                if new_ids:
+                    new_credits.append((imdb_title_id, new_ids, position))
+        if new_credits:
+            self._schedule_episodes(new_credits)
+
+    def _schedule_episodes(self, new_credits):
+        """Looks up the episodes of the credits in neo4j all at once, and fetches the pages
+        of those it doesn't have
+
+        :param new_credits:     list of (imdbTitleID, imdbEpisodeIDs, position of the person
+                                who needs them)"""
+        unknown = []
+        needed_by = {}
+        for imdb_title_id, imdb_episode_ids, position in new_credits:
+            for imdb_episode_id in imdb_episode_ids:
+                needed_by[imdb_episode_id] = max(needed_by.get(imdb_episode_id, 0), position)
+                if imdb_episode_id in self._episodes:
+                    continue
+                if self._in_lookup(imdb_episode_id):
+                    self._episodes[imdb_episode_id] = _Entry(LOOKUP,
+                                                             needed_by=position)
+                else:
+                    self._episodes[imdb_episode_id] = None
+                    unknown.append(imdb_episode_id)
+        records = self.session.read_transaction(i2n.get_episodes, unknown) if unknown else []
+        for record in records:
+            episode = i2n.Episode(imdb_episode_id=record['imdbEpisodeID'])
+            if record['seasonNum'] is not None:
+                episode.season_num = int(record['seasonNum'])
+            if record['episodeNum'] is not None:
+                episode.episode_num = int(record['episodeNum'])
+            if record['airDate'] is not None:
+                episode.airdate = record['airDate'].to_native()
+            if record['genres']:
+                episode.genre_list = record['genres']
+            self._episodes[record['imdbEpisodeID']] = _Entry(
+                READY, episode, needed_by=needed_by[record['imdbEpisodeID']])
+            self.stats['episodes in neo4j'] += 1
+
+        for imdb_title_id, imdb_episode_ids, position in new_credits:
+            misses = [imdb_episode_id for imdb_episode_id in imdb_episode_ids
+                      if imdb_episode_id in self._episodes and
+                      self._episodes[imdb_episode_id] is None]
+            if len(misses) >= i2n.EPISODE_LIST_THRESHOLD:
+                continue
+            for imdb_episode_id in misses:
+                episode = i2n.Episode(imdb_title_id=imdb_title_id,
+                                      imdb_episode_id=imdb_episode_id)
+                entry = self._episodes[imdb_episode_id] = _Entry(
+                    PENDING, episode, True, needed_by[imdb_episode_id])
+                self.fetch_pool.submit(i2n.fetch_episode_page, episode, self._finisher(entry))
+                self.stats['episode pages'] += 1
+        # Left to the credits, which may resolve them from episode list pages
+        for imdb_episode_id in unknown:
+            if self._episodes.get(imdb_episode_id, False) is None:
+                del self._episodes[imdb_episode_id]
+
+    def _in_lookup(self, imdb_episode_id):
+        if self.episode_lookup is None:
+            return False
+        record = self.episode_lookup.get(imdb_episode_id)
+        return record is not None and bool(record.season_num) and bool(record.year)
+
+    def _fetch_genres(self, imdb_title_id, position):
+        if imdb_title_id in self._genres:
+            entry = self._genres[imdb_title_id]
+            entry.needed_by = max(entry.needed_by, position)
+            return
+        entry = self._genres[imdb_title_id] = _Entry(PENDING, needed_by=position)
+        self.fetch_pool.submit(i2n.fetch_show_page, imdb_title_id, self._finisher(entry))
+        self.stats['show pages'] += 1
+
+    def _wait(self, entry):
+        with self._condition:
+            if entry.state == PENDING:
+                self.stats['waits'] += 1
+            while entry.state == PENDING:
+                self._condition.wait()
+
+    def take_name_page(self, imdb_name_id):
+        """:return:    the person's fetched name page (see fetch_name_page), or None"""
+        self._schedule_arrived()
+        entry = self._name_pages.pop(imdb_name_id, None)
+        if entry is None:
+            return None
+        self._wait(entry)
+        if entry.state != READY:
+            return None
+        self.stats['name pages'] += 1
+        return entry.value
+
+    def take_episode(self, episode):
+        """
+        Fills in an episode from the page fetched for it, or from neo4j or the episode
+        lookup.
+
+        :return:    None if the episode wasn't prefetched, otherwise True if it came from
+                    a page fetched ahead and still has to be written to neo4j
+        """
+        entry = self._episodes.get(episode.imdb_episode_id)
+        if entry is None:
+            return None
+        self._wait(entry)
+        if entry.state == FAILED:
+            del self._episodes[episode.imdb_episode_id]
+            return None
+        entry.taken += 1
+        if entry.taken == 2:
+            self.stats['episodes shared'] += 1
+        if entry.state == LOOKUP:
+            i2n.resolve_episode(episode, self.episode_lookup)
+            return False
+        # Everything but the job title, which is the credit's own
+        fetched = entry.value
+        episode.season_num = fetched.season_num
+        episode.episode_num = fetched.episode_num
+        episode.airdate = fetched.airdate
+        episode.episode_title = fetched.episode_title
+        episode.genre_list = fetched.genre_list
+        needs_write = entry.needs_write
+        entry.needs_write = False
+        return needs_write
+
+    def take_genres(self, imdb_title_id):
+        """:return:    the genre list of the title's show page, or None if it wasn't
+                       prefetched"""
+        entry = self._genres.get(imdb_title_id)
+        if entry is None:
+            return None
+        self._wait(entry)
+        if entry.state != READY:
+            del self._genres[imdb_title_id]
+            return None
+        return entry.value.genre_list
+
+    def remember(self, episode):
+        """Records an episode a credit has found and written to neo4j itself, so it isn't
+        fetched again for the people after"""
+        entry = self._episodes.get(episode.imdb_episode_id)
+        if entry is None or entry.state == FAILED:
+            # Kept for everyone looked ahead at so far, since which of them need it isn't
+            # known
+            self._episodes[episode.imdb_episode_id] = _Entry(READY, episode,
+                                                             needed_by=self._submitted - 1)
+
+    def report(self):
+        """Returns a printable summary of what was prefetched"""
+        return "Prefetched: " + ", ".join(name + " " + str(count)
+                                          for name, count in self.stats.items())
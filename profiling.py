@@ -0,0 +1,218 @@
+"""
+Opt-in sampling profiler for the scripts, which attributes samples to named stages.
+
+Code marks what it's doing with
+
+    with profiling.stage(profiling.FETCH):
+        ...
+
+and a script turns profiling on by calling profiling.start() first thing. Profiling is
+on if IMDB_TO_NEO4J_PROFILE names a directory for the output, or if the script was
+run with --profile (output to ./profiles). Otherwise start() does nothing and stage()
+returns a shared no-op, so the marks cost next to nothing.
+
+While profiling, a background thread samples the stack of every thread that's in a
+stage (and of the main thread whatever it's doing) every IMDB_TO_NEO4J_PROFILE_INTERVAL
+milliseconds, 10 by default. Each sample goes to the innermost stage its thread is in,
+so a page fetched while resolving a credit counts as FETCH, not RESOLVE. Sampling wall
+clock time rather than CPU time means waiting on IMDb or neo4j shows up too.
+
+At exit it writes, to the output directory, for a script such as scrape_name_list.py:
+
+    scrape_name_list.folded             every sample, with its stage as the root frame
+    scrape_name_list.<stage>.folded     the samples of each stage
+    scrape_name_list.txt                the hotspot summary, which is also printed
+
+The .folded files have one collapsed stack per line ('frame;frame;frame count'), as
+read by flamegraph.pl and speedscope.
+"""
+import atexit
+import collections
+import os
+import sys
+import threading
+import time
+
+PROFILE_VARIABLE = 'IMDB_TO_NEO4J_PROFILE'
+PROFILE_INTERVAL_VARIABLE = 'IMDB_TO_NEO4J_PROFILE_INTERVAL'
+PROFILE_FLAG = '--profile'
+DEFAULT_DIRECTORY = 'profiles'
+DEFAULT_INTERVAL_MS = 10
+
+# Functions listed in the hotspot summary
+TOP_N = 15
+
+# Stages
+FETCH = 'fetch'
+PARSE = 'parse'
+RESOLVE = 'resolve'
+WRITE = 'write'
+# Main thread samples outside any stage
+OTHER = 'other'
+
+_sampler = None
+
+
+class _Stage(object):
+    __slots__ = ('name', 'stages')
+
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = stages
+
+    def __enter__(self):
+        self.stages.setdefault(threading.get_ident(), []).append(self.name)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        thread_id = threading.get_ident()
+        names = self.stages[thread_id]
+        names.pop()
+        # Threads come and go (ie fetch workers), and a new one may reuse the id
+        if not names:
+            del self.stages[thread_id]
+
+
+class _NoStage(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name):
+    """Context manager marking the code it wraps as part of a stage"""
+    if _sampler is None:
+        return _NO_STAGE
+    return _Stage(name, _sampler.stages)
+
+
+class Sampler(object):
+    """ Samples the stacks of the threads that are in a stage from a background thread.
+
+        DATA MEMBERS
+        interval        [float]     seconds between samples
+        stages          [dict]      thread id -> list of the stages it's in, innermost last
+        samples         [Counter]   (stage, tuple of frame labels, outermost first) ->
+                                    number of samples
+        """
+    def __init__(self, interval):
+        self.interval = interval
+        self.stages = {}
+        self.samples = collections.Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._started = None
+        self._elapsed = 0.0
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._elapsed = time.monotonic() - self._started
+
+    def _run(self):
+        main_id = threading.main_thread().ident
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                try:
+                    name = self.stages[thread_id][-1]
+                except (KeyError, IndexError):
+                    if thread_id != main_id:
+                        continue
+                    name = OTHER
+                self.samples[(name, self._stack(frame))] += 1
+
+    def _stack(self, frame):
+        stack = []
+        labels = self._labels
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = (os.path.basename(code.co_filename) + ':' +
+                                        code.co_name)
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def write(self, directory, name):
+        """Writes the collapsed stacks and the summary.
+        :return:    the summary"""
+        os.makedirs(directory, exist_ok=True)
+        by_stage = collections.defaultdict(list)
+        for (stage_name, stack), count in self.samples.items():
+            by_stage[stage_name].append((stack, count))
+        with open(os.path.join(directory, name + '.folded'), 'w') as f:
+            for stage_name, stacks in sorted(by_stage.items()):
+                for stack, count in stacks:
+                    f.write(';'.join((stage_name,) + stack) + ' ' + str(count) + '\n')
+        for stage_name, stacks in by_stage.items():
+            with open(os.path.join(directory, name + '.' + stage_name + '.folded'), 'w') as f:
+                for stack, count in stacks:
+                    f.write(';'.join(stack) + ' ' + str(count) + '\n')
+        summary = self.summary()
+        with open(os.path.join(directory, name + '.txt'), 'w') as f:
+            f.write(summary + '\n')
+        return summary
+
+    def summary(self, top_n=TOP_N):
+        """The samples per stage, and the functions with the most samples of their own
+        (self) and including what they called (total)"""
+        total = sum(self.samples.values())
+        lines = ["Profile: %d samples every %.0f ms over %.1f s"
+                 % (total, self.interval * 1000, self._elapsed)]
+        if not total:
+            return "\n".join(lines)
+        per_stage = collections.Counter()
+        own = collections.Counter()
+        inclusive = collections.Counter()
+        for (stage_name, stack), count in self.samples.items():
+            per_stage[stage_name] += count
+            if stack:
+                own[stack[-1]] += count
+            for label in set(stack):
+                inclusive[label] += count
+        lines.append("\n%-10s %8s %7s" % ("stage", "samples", "share"))
+        for stage_name, count in per_stage.most_common():
+            lines.append("%-10s %8d %6.1f%%" % (stage_name, count, 100.0 * count / total))
+        for title, counter in (("self", own), ("total", inclusive)):
+            lines.append("\nTop %d functions by %s samples" % (top_n, title))
+            for label, count in counter.most_common(top_n):
+                lines.append("%8d %6.1f%%  %s" % (count, 100.0 * count / total, label))
+        return "\n".join(lines)
+
+
+def start():
+    """Turns profiling on if IMDB_TO_NEO4J_PROFILE is set or the script was run with
+    --profile, and has the results written when the script exits"""
+    global _sampler
+    directory = os.environ.get(PROFILE_VARIABLE)
+    if not directory and PROFILE_FLAG in sys.argv[1:]:
+        directory = DEFAULT_DIRECTORY
+    if not directory or _sampler is not None:
+        return
+    interval = float(os.environ.get(PROFILE_INTERVAL_VARIABLE) or DEFAULT_INTERVAL_MS) / 1000
+    _sampler = Sampler(interval)
+    _sampler.start()
+    name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'profile'
+    atexit.register(_finish, directory, name)
+
+
+def _finish(directory, name):
+    _sampler.stop()
+    print("\n" + _sampler.write(directory, name))
+    print("Collapsed stacks written to", os.path.join(directory, name + '*.folded'))
@@ -0,0 +1,76 @@
+import os
+from urllib.parse import urlsplit
+
+EMPTY_PAGE = '<html><head></head><body></body></html>'
+
+
+def url_to_path(directory, url):
+    """
+    Maps an IMDb URL to the file a saved copy of the page is kept in, ie
+        https://www.imdb.com/name/nm0003113/            -> name/nm0003113.html
+        https://www.imdb.com/title/tt13117230/episodes?season=1
+                                                        -> title/tt13117230/episodes@season=1.html
+    """
+    parts = urlsplit(url)
+    path = parts.path.strip('/') or 'index'
+    if parts.query:
+        path += '@' + parts.query.replace('/', '_')
+    return os.path.join(directory, *path.split('/')) + '.html'
+
+
+class ReplayDriver(object):
+    """ Serves saved pages in place of the Selenium driver, so scraping can run without
+        a browser or network access. Supports the parts of the webdriver interface used
+        by the Page classes: get(), page_source, current_url, refresh() and quit().
+
+        Pages that aren't in the directory are served as an empty page and listed in
+        missing_urls.
+
+        DATA MEMBERS
+        directory       [string]    directory of saved pages, laid out by url_to_path
+        page_source     [string]    source of the current page
+        current_url     [string]    URL of the current page
+        missing_urls    [str list]  URLs requested that had no saved page
+        """
+    def __init__(self, directory):
+        self.directory = directory
+        self.page_source = EMPTY_PAGE
+        self.current_url = None
+        self.missing_urls = []
+        self.pages_served = 0
+
+    def get(self, url):
+        self.current_url = url
+        try:
+            with open(url_to_path(self.directory, url), encoding='utf-8') as f:
+                self.page_source = f.read()
+            self.pages_served += 1
+        except FileNotFoundError:
+            self.page_source = EMPTY_PAGE
+            self.missing_urls.append(url)
+
+    def refresh(self):
+        pass
+
+    def quit(self):
+        print("Replayed", self.pages_served, "pages,", len(self.missing_urls), "missing")
+
+
+class RecordingDriver(object):
+    """ Wraps a Selenium driver and saves a copy of every page it loads, laid out by
+        url_to_path, so that a run can later be replayed with ReplayDriver. Everything
+        other than get() is passed through to the wrapped driver.
+        """
+    def __init__(self, driver, directory):
+        self.driver = driver
+        self.directory = directory
+
+    def get(self, url):
+        self.driver.get(url)
+        path = url_to_path(self.directory, url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.driver.page_source)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
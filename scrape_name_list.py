@@ -1,11 +1,18 @@
 import imdb_to_neo4j as i2n
+from write_behind import WriteBehindBuffer
+from concurrency import AdaptiveConcurrency, FetchPool
+import credit_records
+from credit_cache import CreditCache
+from prefetch import Prefetcher
+import profiling
 import csv
-import re
 
 
 def main():
+    profiling.start()
     driver = i2n.open_imdb_browser()
     neo_driver = i2n.open_neo4j_session()
+    episode_lookup = i2n.open_episode_lookup()
 
     # Get the filename for the CSV list of crew people to process
     while True:
@@ -24,6 +31,42 @@ def main():
         except FileNotFoundError:
             print("File not found")
 
+    # In a refresh run, credits that haven't changed since they were last scraped are skipped
+    refresh = input("Only scrape credits that changed since the last run? (y/n): ") == 'y'
+    binary = input("Also write a credit records file for add_worked_on? (y/n): ") == 'y'
+    browsers = int(input("Maximum number of browsers to scrape episodes with "
+                         "(1 to use only the main browser): ") or 1)
+
+    # People whose name page hasn't changed are written out from the cache instead of
+    # being parsed again. Refresh runs skip unchanged credits already, so don't use it
+    cache_path = input("File path of the parsed credit cache (blank for none): ")
+    credit_cache = CreditCache(cache_path) if cache_path and not refresh else None
+
+    # Which of a person's credits a refresh run scrapes isn't known until it gets to them,
+    # so refresh runs don't look ahead
+    depth = int(input("Number of people to look ahead and prefetch pages for "
+                      "(0 for none): ") or 0)
+    depth = depth if not refresh else 0
+
+    # Extra browsers fetch episode pages in parallel, as many at once as IMDb tolerates
+    fetch_pool = None
+    if browsers > 1:
+        fetch_pool = FetchPool(i2n.open_imdb_browser, AdaptiveConcurrency(max_workers=browsers))
+    # Looking ahead needs a browser of its own at least. Sharing the pool is fine, since
+    # its lookahead fetches only start when no episode page is waiting to be fetched
+    prefetch_pool = None
+    if depth:
+        prefetch_pool = fetch_pool or FetchPool(i2n.open_imdb_browser,
+                                                AdaptiveConcurrency(max_workers=1))
+
+    records = None
+    if binary:
+        records = credit_records.CreditRecordWriter(crew_csv[:-4] + '_results' +
+                                                    credit_records.EXTENSION)
+
+    fingerprint_writer = credit_records.FingerprintWriter(
+        credit_records.fingerprints_path(crew_csv[:-4] + '_results.csv'))
+
     with open(crew_csv[:-4] + '_results.csv', mode='w') as results_file:
         fieldnames = ['name', 'name_id', 'job_class', 'job_title',
                       'first_year', 'last_year', 'show_title', 'title_id',
@@ -31,47 +74,58 @@ def main():
         csvwriter = csv.writer(results_file)
         csvwriter.writerow(fieldnames)
 
-        with neo_driver.session() as session:
-            for crew in crew_list:
+        def write_row(row):
+            csvwriter.writerow(row)
+            if records:
+                records.write(credit_records.typed_row(row))
+
+        # New episodes are written in the background while scraping continues
+        with neo_driver.session() as session, WriteBehindBuffer(neo_driver) as writer:
+            prefetcher = None
+            if depth:
+                prefetcher = Prefetcher(crew_list, depth, prefetch_pool, session,
+                                        episode_lookup, credit_cache)
+            for position, crew in enumerate(crew_list):
+                if prefetcher:
+                    prefetcher.look_ahead(position)
                 print("\nNow processing", crew.full_name)
-                name_page = i2n.NamePage(driver, session, crew)
+                known_fingerprints = None
+                if refresh:
+                    results = session.read_transaction(i2n.get_filmography_fingerprint,
+                                                       crew.imdb_name_id)
+                    known_fingerprints = i2n.read_credit_fingerprints(results)
+                name_page = i2n.NamePage(driver, session, crew, writer, known_fingerprints,
+                                         fetch_pool, episode_lookup, credit_cache, prefetcher)
+                if name_page.from_cache:
+                    print("Unchanged since it was cached, using the cached credits")
+                if name_page.unchanged_count:
+                    print("Skipped", name_page.unchanged_count, "unchanged credits")
                 for credit in name_page:
-                    if re.match("TV", credit.show_type) and re.search("Series", credit.show_type):
-                        if credit.season_list:
-                            for season in credit.season_list:
-                                if ((credit.first_year and credit.last_year) or
-                                   season.first_airdate and season.last_airdate):
-                                    for job in season.job_title_list:
-                                        row = [
-                                            crew.full_name,
-                                            crew.imdb_name_id,
-                                            i2n.to_caps(credit.job_class),
-                                            i2n.to_caps(job),
-                                            credit.first_year,
-                                            credit.last_year,
-                                            credit.title,
-                                            credit.imdb_title_id,
-                                            str(season.season_num),
-                                            credit.show_type,
-                                            season.genre_list,
-                                        ]
-                                        csvwriter.writerow(row)
-                                else:
-                                    row = [
-                                        crew.full_name,
-                                        crew.imdb_name_id,
-                                        i2n.to_caps(credit.job_class),
-                                        i2n.to_caps(credit.job_title),
-                                        credit.first_year,
-                                        credit.last_year,
-                                        credit.title,
-                                        credit.imdb_title_id,
-                                        None,
-                                        credit.show_type,
-                                        credit.genre_list,
-                                    ]
-                                    csvwriter.writerow(row)
+                    for row in credit_records.credit_rows(crew, credit):
+                        write_row(row)
+                # Stored by add_worked_on.py once the rows are loaded, so the next refresh
+                # run can skip what was scraped
+                if name_page.fingerprints:
+                    results_file.flush()
+                    fingerprint_writer.write(crew, name_page.filmography_fingerprint,
+                                             name_page.fingerprints)
+            if prefetcher:
+                print(prefetcher.report())
         session.close()
+    fingerprint_writer.close()
+    if records:
+        records.close()
+    if credit_cache:
+        print("Credit cache: %d people from the cache, %d parsed"
+              % (credit_cache.hits, credit_cache.misses))
+        credit_cache.close()
+    if fetch_pool:
+        fetch_pool.close()
+        print(fetch_pool.controller.report())
+    elif prefetch_pool:
+        prefetch_pool.close()
+    if episode_lookup:
+        episode_lookup.close()
     driver.quit()
 
 
@@ -0,0 +1,83 @@
+import imdb_to_neo4j as i2n
+from write_behind import WriteBehindBuffer
+import credit_records
+import csv
+
+
+def main():
+    driver = i2n.open_imdb_browser()
+    neo_driver = i2n.open_neo4j_session()
+
+    # Get the filename for the CSV list of shows to process
+    while True:
+        try:
+            title_csv = input("File path of the Title List: ")
+            skip = int(input("Number of rows to skip: "))
+            with open(title_csv) as f:
+                reader = csv.reader(f)
+                for i in range(skip):
+                    next(reader)
+                title_list = [(imdb_title_id, show_title) for imdb_title_id, show_title in reader]
+            break
+        except FileNotFoundError:
+            print("File not found")
+
+    binary = input("Also write a credit records file for add_worked_on? (y/n): ") == 'y'
+
+    records = None
+    if binary:
+        records = credit_records.CreditRecordWriter(title_csv[:-4] + '_results' +
+                                                    credit_records.EXTENSION)
+
+    # Same layout as the results of scrape_name_list.py, so add_worked_on.py can load it
+    with open(title_csv[:-4] + '_results.csv', mode='w') as results_file:
+        csvwriter = csv.writer(results_file)
+        csvwriter.writerow(credit_records.FIELDS)
+
+        with WriteBehindBuffer(neo_driver) as writer:
+            for imdb_title_id, show_title in title_list:
+                print("\nNow processing", show_title)
+                show_page = i2n.ShowPage(driver, imdb_title_id)
+                if not credit_records.is_tv_series(show_page.show_type):
+                    # Its crew would be loaded as working on a Show, as scrape_name_list.py
+                    # leaves out credits like these too
+                    if show_page.blocked:
+                        print("Skipped, the title page looks blocked")
+                    else:
+                        print("Skipped, not a TV series:", show_page.show_type)
+                        writer.write((i2n.set_crew_scraped, imdb_title_id))
+                    continue
+                credits_page = i2n.FullCreditsPage(driver, imdb_title_id)
+                people = set()
+                for credit in credits_page.crew_credits:
+                    # Crew found here may not be in neo4j yet, and WORKED_ON needs them
+                    if credit.person.imdb_name_id not in people:
+                        people.add(credit.person.imdb_name_id)
+                        writer.write((i2n.add_person, credit.person))
+                    for job in credit.job_title_list:
+                        # No season: add_worked_on.py finds the seasons from the years
+                        row = [
+                            credit.person.full_name,
+                            credit.person.imdb_name_id,
+                            i2n.to_caps(credit.job_class),
+                            i2n.to_caps(job),
+                            credit.first_year,
+                            credit.last_year,
+                            show_title,
+                            imdb_title_id,
+                            None,
+                            show_page.show_type,
+                            show_page.genre_list,
+                        ]
+                        csvwriter.writerow(row)
+                        if records:
+                            records.write(credit_records.typed_row(row))
+                # Tells crawl.py the show's crew has been scraped
+                writer.write((i2n.set_crew_scraped, imdb_title_id))
+                print("Found", len(people), "crew in", len(credits_page.crew_credits), "credits")
+    if records:
+        records.close()
+    driver.quit()
+
+
+main()
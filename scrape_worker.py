@@ -0,0 +1,115 @@
+import imdb_to_neo4j as i2n
+from write_behind import WriteBehindBuffer
+import job_queue
+import credit_records
+import csv
+import time
+
+# Seconds to wait for other workers' jobs when there's nothing left to lease
+POLL_SECONDS = 30
+
+
+def scrape_person(driver, session, writer, job):
+    """:return:    (results csv rows of the person's credits, the Person, the NamePage)"""
+    crew = i2n.Person(job.key, job.payload['full_name'])
+    print("\nNow processing", crew.full_name, "(attempt", str(job.attempts) + ")")
+    name_page = i2n.NamePage(driver, session, crew, writer)
+    if name_page.blocked:
+        raise RuntimeError("Name page of " + crew.imdb_name_id + " looks blocked")
+    rows = []
+    for credit in name_page:
+        rows.extend(credit_records.credit_rows(crew, credit))
+    return rows, crew, name_page
+
+
+def scrape_show(driver, writer, job):
+    show = i2n.Show(job.key, job.payload['show_title'])
+    print("\nNow processing", show.show_title, "(attempt", str(job.attempts) + ")")
+    i2n.process_imdb_title_id(driver, writer, show)
+
+
+def lease_next(queue):
+    # People first, since their credits are what the results csv is made of
+    return queue.lease(job_queue.PERSON) or queue.lease(job_queue.SHOW)
+
+
+def main():
+    queue_path = input("File path of the job queue: ")
+    queue = job_queue.JobQueue(queue_path)
+
+    crew_csv = input("Crew List to add to the queue (blank for none): ")
+    if crew_csv:
+        skip = int(input("Number of rows to skip: "))
+        print("Queued", queue.add_crew_list(crew_csv, skip), "people")
+    title_csv = input("Title List to add to the queue (blank for none): ")
+    if title_csv:
+        skip = int(input("Number of rows to skip: "))
+        print("Queued", queue.add_title_list(title_csv, skip), "shows")
+
+    results_csv = input("File path of this worker's results csv "
+                        "(blank for one named after the worker): ")
+    results_csv = results_csv or queue_path + '_' + queue.worker + '_results.csv'
+
+    driver = i2n.open_imdb_browser()
+    neo_driver = i2n.open_neo4j_session()
+    done = failed = 0
+
+    # Fingerprints are stored by add_worked_on.py once the results are loaded
+    fingerprint_writer = credit_records.FingerprintWriter(
+        credit_records.fingerprints_path(results_csv))
+
+    with open(results_csv, mode='w') as results_file:
+        csvwriter = csv.writer(results_file)
+        csvwriter.writerow(credit_records.FIELDS)
+        with neo_driver.session() as session:
+            while True:
+                job = lease_next(queue)
+                if job is None:
+                    # Jobs leased by other workers come back if those workers die
+                    leased = (queue.counts(job_queue.PERSON)[job_queue.LEASED] +
+                              queue.counts(job_queue.SHOW)[job_queue.LEASED])
+                    if not leased:
+                        break
+                    print("Waiting for", leased, "jobs leased by other workers")
+                    time.sleep(POLL_SECONDS)
+                    continue
+
+                rows = []
+                name_page = None
+                with job_queue.Heartbeat(queue, job) as heartbeat:
+                    try:
+                        # A buffer per job, since a buffer stops writing after a failed
+                        # write, which would otherwise fail every job after this one
+                        with WriteBehindBuffer(neo_driver) as writer:
+                            if job.kind == job_queue.PERSON:
+                                rows, crew, name_page = scrape_person(driver, session, writer, job)
+                            else:
+                                scrape_show(driver, writer, job)
+                    except Exception as e:
+                        print("Failed:", job.kind, job.key, repr(e))
+                        queue.fail(job, repr(e))
+                        failed += 1
+                        continue
+                if heartbeat.lost:
+                    # Another worker has the job now and will write its rows
+                    print("Lost the lease on", job.key)
+                    continue
+                for row in rows:
+                    csvwriter.writerow(row)
+                results_file.flush()
+                if name_page is not None and name_page.fingerprints:
+                    fingerprint_writer.write(crew, name_page.filmography_fingerprint,
+                                             name_page.fingerprints)
+                queue.complete(job)
+                done += 1
+        session.close()
+    fingerprint_writer.close()
+
+    print("\nThis worker finished", done, "jobs,", failed, "failed attempts")
+    for kind in (job_queue.PERSON, job_queue.SHOW):
+        print(kind, queue.counts(kind))
+    queue.close()
+    driver.quit()
+
+
+main()
@@ -0,0 +1,180 @@
+from array import array
+from collections import Counter, deque
+
+
+class CollaborationGraph(object):
+    """ In-process collaboration analytics over a graph snapshot (see graph_snapshot.py).
+
+        People are connected when they worked on the same season. By default the
+        connections are derived from the snapshot's WORKED_ON edges; pass
+        source='worked_with' to use its WORKED_WITH relationships instead.
+
+        Adjacency is held in compressed sparse row form: the neighbours of item i
+        are targets[offsets[i]:offsets[i + 1]].
+
+        DATA MEMBERS
+        snapshot        Snapshot object
+        source          [string]    'worked_on' or 'worked_with'
+        """
+    def __init__(self, snapshot, source='worked_on'):
+        if source not in ('worked_on', 'worked_with'):
+            raise ValueError("source must be 'worked_on' or 'worked_with'")
+        self.snapshot = snapshot
+        self.source = source
+        num_people = len(snapshot.people)
+        num_seasons = len(snapshot.seasons)
+        people = snapshot.column('worked_on_season_person')
+        seasons = snapshot.column('worked_on_season_season')
+        # Person -> seasons and season -> people, for paths and shared seasons
+        self._person_seasons = _csr(num_people, people, seasons)
+        self._season_people = _csr(num_seasons, seasons, people)
+        if source == 'worked_with':
+            person1 = snapshot.column('worked_with_person1')
+            person2 = snapshot.column('worked_with_person2')
+            # WORKED_WITH is stored in one direction only, so index it both ways
+            self._person_people = _csr(num_people,
+                                       array('i', person1) + array('i', person2),
+                                       array('i', person2) + array('i', person1))
+        else:
+            self._person_people = None
+
+    def _person(self, imdb_name_id):
+        person = self.snapshot.person_index(imdb_name_id)
+        if person < 0:
+            raise KeyError("Person not in snapshot: " + imdb_name_id)
+        return person
+
+    def seasons_of(self, person):
+        offsets, targets = self._person_seasons
+        return targets[offsets[person]:offsets[person + 1]]
+
+    def people_on(self, season):
+        offsets, targets = self._season_people
+        return targets[offsets[season]:offsets[season + 1]]
+
+    def neighbours(self, person):
+        """Returns the set of people (by index) who worked with the given person"""
+        if self._person_people is not None:
+            offsets, targets = self._person_people
+            neighbours = set(targets[offsets[person]:offsets[person + 1]])
+        else:
+            neighbours = set()
+            for season in self.seasons_of(person):
+                neighbours.update(self.people_on(season))
+        neighbours.discard(person)
+        return neighbours
+
+    def degree_distribution(self):
+        """Returns a Counter mapping number of collaborators -> number of people"""
+        return Counter(len(self.neighbours(person))
+                       for person in range(len(self.snapshot.people)))
+
+    def connected_components(self):
+        """Returns a list of components, largest first, each a list of person indexes.
+        People with no collaborators form components of their own"""
+        parent = list(range(len(self.snapshot.people)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i, j):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_j] = root_i
+
+        if self._person_people is not None:
+            offsets, targets = self._person_people
+            for person in range(len(parent)):
+                for other in targets[offsets[person]:offsets[person + 1]]:
+                    union(person, other)
+        else:
+            # Everyone on a season is in the same component as its first crew member
+            for season in range(len(self.snapshot.seasons)):
+                crew = self.people_on(season)
+                for other in crew[1:]:
+                    union(crew[0], other)
+
+        components = {}
+        for person in range(len(parent)):
+            components.setdefault(find(person), []).append(person)
+        return sorted(components.values(), key=len, reverse=True)
+
+    def ego_network(self, imdb_name_id, radius=1):
+        """
+        Returns the people within radius collaboration steps of a person, and the
+        collaborations between them.
+
+        :return:    (set of imdbNameIDs, set of (imdbNameID, imdbNameID) pairs)
+        """
+        centre = self._person(imdb_name_id)
+        members = {centre}
+        frontier = {centre}
+        for _ in range(radius):
+            next_frontier = set()
+            for person in frontier:
+                next_frontier.update(self.neighbours(person))
+            frontier = next_frontier - members
+            members.update(frontier)
+        people = self.snapshot.people
+        edges = set()
+        for person in members:
+            for other in self.neighbours(person):
+                if other in members and person < other:
+                    edges.add((people[person], people[other]))
+        return {people[person] for person in members}, edges
+
+    def shared_seasons(self, imdb_name_id1, imdb_name_id2):
+        """Returns the titles of the seasons two people both worked on"""
+        seasons = (set(self.seasons_of(self._person(imdb_name_id1))) &
+                   set(self.seasons_of(self._person(imdb_name_id2))))
+        return sorted(self.snapshot.season_titles[season] for season in seasons)
+
+    def shortest_path(self, imdb_name_id1, imdb_name_id2):
+        """
+        Finds a shortest collaboration path between two people by breadth-first
+        search through the seasons they worked on.
+
+        :return:    list alternating person full names and the season titles that link
+                    them, ie ['A', 'Show S1', 'B', 'Show S4', 'C'], or None if there
+                    is no path
+        """
+        start = self._person(imdb_name_id1)
+        goal = self._person(imdb_name_id2)
+        # came_from maps person -> (previous person, linking season)
+        came_from = {start: None}
+        queue = deque([start])
+        while queue and goal not in came_from:
+            person = queue.popleft()
+            for season in self.seasons_of(person):
+                for other in self.people_on(season):
+                    if other not in came_from:
+                        came_from[other] = (person, season)
+                        queue.append(other)
+        if goal not in came_from:
+            return None
+        path = [self.snapshot.person_names[goal]]
+        person = goal
+        while came_from[person] is not None:
+            person, season = came_from[person]
+            path.append(self.snapshot.season_titles[season])
+            path.append(self.snapshot.person_names[person])
+        path.reverse()
+        return path
+
+
+def _csr(size, sources, targets):
+    """Builds (offsets, targets) arrays grouping targets by source index"""
+    offsets = array('l', [0]) * (size + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    position = array('l', offsets)
+    grouped = array('i', [0]) * len(sources)
+    for source, target in zip(sources, targets):
+        grouped[position[source]] = target
+        position[source] += 1
+    return offsets, grouped
@@ -0,0 +1,42 @@
+import graph_snapshot
+import snapshot_analytics
+
+
+def main():
+    while True:
+        try:
+            snapshot = graph_snapshot.Snapshot(input("Snapshot directory: "))
+            break
+        except FileNotFoundError:
+            print("Snapshot not found")
+
+    with snapshot:
+        graph = snapshot_analytics.CollaborationGraph(snapshot)
+        print("People:", len(snapshot.people), " Seasons:", len(snapshot.seasons),
+              " Shows:", len(snapshot.shows))
+
+        print("\nDegree distribution (collaborators: people)")
+        for degree, count in sorted(graph.degree_distribution().items()):
+            print(f"{degree:>6}: {count}")
+
+        components = graph.connected_components()
+        print("\nConnected components:", len(components))
+        print("Largest components:", [len(component) for component in components[:10]])
+
+        while True:
+            imdb_name_ids = input("\nTwo IMDb name IDs for a collaboration path "
+                                  "(blank to quit): ").split()
+            if len(imdb_name_ids) != 2:
+                break
+            try:
+                path = graph.shortest_path(*imdb_name_ids)
+            except KeyError as e:
+                print(e.args[0])
+                continue
+            if path:
+                print(" -> ".join(path))
+            else:
+                print("No collaboration path")
+
+
+main()
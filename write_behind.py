@@ -0,0 +1,117 @@
+import queue
+import threading
+import profiling
+
+
+class WriteBehindError(Exception):
+    """Raised in the calling thread when a queued write failed in the background"""
+    pass
+
+
+class WriteBehindBuffer(object):
+    """ Bounded write-behind buffer for neo4j writes.
+
+        Callers enqueue transaction functions (the same add_* functions that are
+        normally passed to session.write_transaction) and carry on scraping while a
+        background thread commits them on its own session.
+
+        Writes are committed strictly in the order they were enqueued, so a write
+        that depends on an earlier one (a SEASON_OF after its season, a HAS_GENRE
+        after its episode) can simply be enqueued after it. Writes passed together
+        in one call to write() are committed in a single transaction.
+
+        DATA MEMBERS
+        neo_driver      neo4j driver the background session is opened from
+        max_pending     [int]   maximum number of queued writes before write() blocks
+        """
+    _STOP = object()
+
+    def __init__(self, neo_driver, max_pending=1000):
+        self.neo_driver = neo_driver
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._failed_write = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._drain, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def write(self, *transactions):
+        """
+        Enqueues one or more writes to be committed together in a single transaction.
+
+        :param transactions:    tuples of (transaction function, arg, arg, ...)
+                                ie (add_episode, episode)
+        """
+        self._raise_if_failed()
+        if self._closed:
+            raise WriteBehindError("write() called on a closed WriteBehindBuffer")
+        if transactions:
+            self._queue.put(transactions)
+
+    def flush(self):
+        """Blocks until every write enqueued so far has been committed"""
+        self._queue.join()
+        self._raise_if_failed()
+
+    def close(self):
+        """Flushes outstanding writes and stops the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._raise_if_failed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't mask the original exception with a write error
+            try:
+                self.close()
+            except WriteBehindError:
+                pass
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise WriteBehindError("Background write failed: " +
+                                   _describe(self._failed_write)) from self._error
+
+    def _drain(self):
+        session = None
+        try:
+            session = self.neo_driver.session()
+        except Exception as e:
+            self._error = e
+        while True:
+            transactions = self._queue.get()
+            try:
+                if transactions is self._STOP:
+                    break
+                # Once a write has failed, later writes may depend on it, so
+                # the buffer stops committing and every later call raises
+                if self._error is None:
+                    with profiling.stage(profiling.WRITE):
+                        session.write_transaction(_run_transactions, transactions)
+            except Exception as e:
+                self._error = e
+                self._failed_write = transactions
+            finally:
+                self._queue.task_done()
+        if session is not None:
+            session.close()
+
+
+def _run_transactions(tx, transactions):
+    for transaction in transactions:
+        transaction[0](tx, *transaction[1:])
+
+
+def _describe(transactions):
+    if not transactions:
+        return ''
+    return ", ".join(transaction[0].__name__ for transaction in transactions)